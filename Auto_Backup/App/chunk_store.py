@@ -0,0 +1,224 @@
+import os
+import json
+import zlib
+import hashlib
+import datetime
+
+#Content-defined chunking (FastCDC style): a boundary is placed where a rolling "gear" hash of the last bytes matches a mask,
+#so inserting or removing bytes in a file only changes the chunks around the edit and the rest are found again in the store
+MIN_CHUNK_SIZE = 16 * 1024
+AVG_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+READ_SIZE = 4 * 1024 * 1024
+
+HASH_MASK = (1 << 64) - 1
+#Stricter mask before the average size and looser after it (normalized chunking), so chunk sizes stay close to the average
+MASK_SMALL = 0x0003590703530000
+MASK_LARGE = 0x0000D90003530000
+
+#The gear table must never change between runs, otherwise the same data would be cut differently and nothing would be deduplicated
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "big") for i in range(256)]
+
+#Return the length of the next chunk at the beginning of data[start:end]
+def find_boundary(data, start, end):
+    size = end - start
+    if size <= MIN_CHUNK_SIZE:
+        return size
+
+    gear = GEAR
+    h = 0
+    i = start + MIN_CHUNK_SIZE
+    normal = start + min(AVG_CHUNK_SIZE, size)
+    limit = start + min(MAX_CHUNK_SIZE, size)
+
+    while i < normal:
+        h = ((h << 1) + gear[data[i]]) & HASH_MASK
+        if not h & MASK_SMALL:
+            return i - start + 1
+        i = i + 1
+
+    while i < limit:
+        h = ((h << 1) + gear[data[i]]) & HASH_MASK
+        if not h & MASK_LARGE:
+            return i - start + 1
+        i = i + 1
+
+    return limit - start
+
+#Read a file and yield its content-defined chunks. Only READ_SIZE + MAX_CHUNK_SIZE bytes are held in memory at a time
+def iter_chunks(file_path):
+    with open(file_path, "rb") as file:
+        buffer = b""
+        eof = False
+        while True:
+            if not eof and len(buffer) < MAX_CHUNK_SIZE:
+                block = file.read(READ_SIZE)
+                eof = not block
+                buffer = buffer + block
+            if not buffer:
+                return
+
+            start = 0
+            #Keep at least one full chunk of look-ahead unless the file is over
+            while len(buffer) - start >= MAX_CHUNK_SIZE or (eof and start < len(buffer)):
+                length = find_boundary(buffer, start, len(buffer))
+                yield buffer[start:start + length]
+                start = start + length
+            buffer = buffer[start:]
+
+def chunk_path(store_folder, chunk_id):
+    return os.path.join(store_folder, "chunks", chunk_id[:2], chunk_id)
+
+#Store a chunk once. The name is the SHA-256 of the uncompressed data so identical chunks always share the same file
+def store_chunk(store_folder, data):
+    chunk_id = hashlib.sha256(data).hexdigest()
+    path = chunk_path(store_folder, chunk_id)
+    if os.path.exists(path):
+        return chunk_id, 0
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(data, 6)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(compressed)
+    os.replace(temporary_path, path)
+    return chunk_id, len(compressed)
+
+def snapshots_folder(store_folder):
+    return os.path.join(store_folder, "snapshots")
+
+def load_snapshot(store_folder, snapshot_name):
+    with open(os.path.join(snapshots_folder(store_folder), snapshot_name), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+#Snapshot names sort by date because they use the same timestamp format as the ZIP backups
+def list_snapshot_names(store_folder):
+    folder = snapshots_folder(store_folder)
+    if not os.path.exists(folder):
+        return []
+    return sorted(name for name in os.listdir(folder) if name.endswith(".json"))
+
+#Find the newest snapshot of the same origin to reuse the chunk lists of files that did not change
+def latest_snapshot(store_folder, origin_folder):
+    for name in reversed(list_snapshot_names(store_folder)):
+        snapshot = load_snapshot(store_folder, name)
+        if snapshot.get("origin") == os.path.abspath(origin_folder):
+            return snapshot
+    return None
+
+#Create a snapshot of origin_folder in the chunk store. Files with the same size and mtime as in the previous snapshot
+#are not read again, the rest are chunked and only chunks missing from the store are written
+def create_snapshot(origin_folder, store_folder, snapshot_name):
+    if not os.path.exists(origin_folder):
+        print (f"Error: The origin folder {origin_folder} do not exist.")
+        return None
+
+    os.makedirs(snapshots_folder(store_folder), exist_ok=True)
+    previous = latest_snapshot(store_folder, origin_folder)
+    previous_files = previous["files"] if previous else {}
+
+    files = {}
+    total_bytes = 0
+    new_chunks = 0
+    stored_bytes = 0
+    reused_files = 0
+
+    for actual_folder, subfolders, file_names in os.walk(origin_folder):
+        for file in file_names:
+            file_path = os.path.join(actual_folder, file)
+            relative_path = os.path.relpath(file_path, os.path.dirname(origin_folder)).replace(os.sep, "/")
+            stat = os.stat(file_path)
+            total_bytes = total_bytes + stat.st_size
+
+            old_entry = previous_files.get(relative_path)
+            if old_entry and old_entry["size"] == stat.st_size and old_entry["mtime"] == stat.st_mtime_ns:
+                files[relative_path] = old_entry
+                reused_files = reused_files + 1
+                continue
+
+            chunks = []
+            for data in iter_chunks(file_path):
+                chunk_id, written = store_chunk(store_folder, data)
+                chunks.append(chunk_id)
+                if written:
+                    new_chunks = new_chunks + 1
+                    stored_bytes = stored_bytes + written
+
+            files[relative_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "chunks": chunks}
+
+    snapshot = {
+        "origin": os.path.abspath(origin_folder),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "files": files,
+    }
+
+    snapshot_path = os.path.join(snapshots_folder(store_folder), snapshot_name)
+    temporary_path = snapshot_path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(snapshot, file)
+    os.replace(temporary_path, snapshot_path)
+
+    print (f"Snapshot Completed: {snapshot_path}")
+    print (f"{len(files)} files ({total_bytes / (1024*1024):.2f} MB), {reused_files} unchanged since the last snapshot.")
+    print (f"{new_chunks} new chunks stored ({stored_bytes / (1024*1024):.2f} MB written to the store).")
+    return snapshot_path
+
+#Print every snapshot of the store with its number of files and logical size
+def list_snapshots(store_folder):
+    names = list_snapshot_names(store_folder)
+    if not names:
+        print ("There are no snapshots in this store.")
+        return []
+
+    print (f"\n=== SNAPSHOTS ({len(names)}) ===")
+    for name in names:
+        snapshot = load_snapshot(store_folder, name)
+        size = sum(entry["size"] for entry in snapshot["files"].values())
+        print (f"{name}: {len(snapshot['files'])} files, {size / (1024*1024):.2f} MB, origin '{snapshot['origin']}'")
+    return names
+
+#Rebuild the files of a snapshot in target_folder by joining their chunks
+def restore_snapshot(store_folder, snapshot_name, target_folder):
+    snapshot = load_snapshot(store_folder, snapshot_name)
+    restored = 0
+
+    for relative_path, entry in snapshot["files"].items():
+        file_path = os.path.join(target_folder, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        with open(file_path, "wb") as file:
+            for chunk_id in entry["chunks"]:
+                with open(chunk_path(store_folder, chunk_id), "rb") as chunk:
+                    file.write(zlib.decompress(chunk.read()))
+        os.utime(file_path, ns=(entry["mtime"], entry["mtime"]))
+        restored = restored + 1
+
+    print (f"Restored {restored} files from snapshot '{snapshot_name}' into '{target_folder}'")
+    return restored
+
+def delete_snapshot(store_folder, snapshot_name):
+    os.remove(os.path.join(snapshots_folder(store_folder), snapshot_name))
+    print (f"Snapshot '{snapshot_name}' deleted. Run the garbage collector to free its chunks.")
+
+#Mark every chunk referenced by a snapshot and delete the rest (mark and sweep)
+def garbage_collect(store_folder):
+    referenced = set()
+    for name in list_snapshot_names(store_folder):
+        for entry in load_snapshot(store_folder, name)["files"].values():
+            referenced.update(entry["chunks"])
+
+    removed = 0
+    freed_bytes = 0
+    chunks_folder = os.path.join(store_folder, "chunks")
+    if os.path.exists(chunks_folder):
+        for prefix in os.listdir(chunks_folder):
+            prefix_folder = os.path.join(chunks_folder, prefix)
+            for entry in os.scandir(prefix_folder):
+                #Leftover .tmp files come from interrupted writes and are never referenced
+                if entry.name not in referenced:
+                    freed_bytes = freed_bytes + entry.stat().st_size
+                    os.remove(entry.path)
+                    removed = removed + 1
+
+    print (f"Garbage collection removed {removed} chunks ({freed_bytes / (1024*1024):.2f} MB freed).")
+    return removed
@@ -0,0 +1,100 @@
+import os
+import time
+import zlib
+import zipfile
+
+#Formats that are already compressed: DEFLATE only burns CPU on them for no size gain
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst",
+    ".xlsx", ".docx", ".pptx", ".odt", ".ods", ".odp", ".jar", ".apk",
+    ".mp3", ".aac", ".ogg", ".flac", ".mp4", ".m4v", ".mov", ".mkv", ".avi", ".webm",
+}
+
+CODECS = {
+    "stored": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+#Size of the first block used to probe if a file is worth compressing
+PROBE_SIZE = 64 * 1024
+#If the fast probe cannot shrink the first block below this ratio, the file is stored
+PROBE_RATIO = 0.95
+#Files smaller than this are not probed: the probe would cost as much as compressing them
+MIN_PROBE_FILE_SIZE = 256 * 1024
+
+#Decides how every file is compressed: stored by extension, stored after a quick compressibility probe of its first block,
+#or compressed with a codec chosen per extension (e.g. {".csv": ("lzma", None), ".log": ("bzip2", 9)}).
+#It also keeps the counters used to show how much time the policy saved
+class CompressionPolicy:
+    def __init__(self, stored_extensions=STORED_EXTENSIONS, codecs=None, probe=True, default_level=None):
+        self.stored_extensions = {extension.lower() for extension in stored_extensions}
+        self.codecs = {extension.lower(): (CODECS[codec], level) for extension, (codec, level) in (codecs or {}).items()}
+        self.probe = probe
+        self.default_level = default_level
+
+        self.stored_by_extension = 0
+        self.stored_by_probe = 0
+        self.stored_bytes = 0
+        self.probe_time = 0.0
+        self.codec_counts = {}
+        self._seconds_per_byte = None
+
+    #Return (compress_type, compresslevel, probe_time, reason) for a file
+    def choose(self, file_path, size):
+        extension = os.path.splitext(file_path)[1].lower()
+
+        if extension in self.stored_extensions:
+            return zipfile.ZIP_STORED, None, 0.0, "extension"
+        if extension in self.codecs:
+            compress_type, level = self.codecs[extension]
+            return compress_type, level, 0.0, "codec"
+
+        if self.probe and size >= MIN_PROBE_FILE_SIZE:
+            start = time.perf_counter()
+            with open(file_path, "rb") as file:
+                block = file.read(PROBE_SIZE)
+            ratio = len(zlib.compress(block, 1)) / max(len(block), 1)
+            probe_time = time.perf_counter() - start
+            if ratio > PROBE_RATIO:
+                return zipfile.ZIP_STORED, None, probe_time, "probe"
+            return zipfile.ZIP_DEFLATED, self.default_level, probe_time, "default"
+
+        return zipfile.ZIP_DEFLATED, self.default_level, 0.0, "default"
+
+    #Update the counters with a decision (it may have been taken in a worker process)
+    def record(self, compress_type, size, probe_time, reason):
+        self.probe_time = self.probe_time + probe_time
+        if reason == "extension":
+            self.stored_by_extension = self.stored_by_extension + 1
+        elif reason == "probe":
+            self.stored_by_probe = self.stored_by_probe + 1
+        if compress_type == zipfile.ZIP_STORED:
+            self.stored_bytes = self.stored_bytes + size
+        else:
+            self.codec_counts[compress_type] = self.codec_counts.get(compress_type, 0) + 1
+
+    #Measure once how long DEFLATE takes per byte on data it cannot shrink, to estimate the time the stored files saved
+    def seconds_per_byte(self):
+        if self._seconds_per_byte is None:
+            sample = os.urandom(1024 * 1024)
+            start = time.perf_counter()
+            zlib.compress(sample, 6 if self.default_level is None else self.default_level)
+            self._seconds_per_byte = (time.perf_counter() - start) / len(sample)
+        return self._seconds_per_byte
+
+    def saved_time(self):
+        if not self.stored_bytes:
+            return -self.probe_time
+        return self.stored_bytes * self.seconds_per_byte() - self.probe_time
+
+    def print_summary(self):
+        names = {value: name for name, value in CODECS.items()}
+        stored = self.stored_by_extension + self.stored_by_probe
+        print (f"Compression policy: {stored} files stored without compression ({self.stored_bytes / (1024*1024):.2f} MB), "
+               f"{self.stored_by_extension} by extension and {self.stored_by_probe} by probe.")
+        for compress_type, count in sorted(self.codec_counts.items()):
+            print (f"  {names[compress_type]}: {count} files")
+        print (f"Estimated compression time saved by the policy: {self.saved_time():.2f} s (probes took {self.probe_time:.2f} s)")
@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+
+from volumes import backup_exists, open_backup, volume_base
+
+#Name of the manifest kept next to the backups and of the copy stored inside every archive
+MANIFEST_FILE = "backup_manifest.json"
+MANIFEST_ENTRY = "__backup_manifest__.json"
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+#Compute the SHA-256 of a file reading it in blocks so memory stays bounded
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+#Load the manifest of the previous run, only if it belongs to the same origin folder and its archive still exists
+def load_manifest(destination_folder, origin_folder):
+    manifest_path = os.path.join(destination_folder, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as e:
+        print (f"Warning: The manifest '{manifest_path}' could not be read ({e}), a full backup will be created.")
+        return None
+
+    if manifest.get("origin") != os.path.abspath(origin_folder):
+        return None
+    if not backup_exists(os.path.join(destination_folder, manifest.get("archive", ""))):
+        return None
+    return manifest
+
+#Write the manifest to a temporary file first so an interrupted run never leaves a broken manifest behind
+def save_manifest(destination_folder, manifest):
+    manifest_path = os.path.join(destination_folder, MANIFEST_FILE)
+    temporary_path = manifest_path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(temporary_path, manifest_path)
+
+#Compare the files found in the origin folder with the previous manifest.
+#Files with the same size and mtime are trusted without reading them, files with the same size but a new mtime are hashed
+#to find out if the content really changed, and files with a new size are always considered changed.
+#Returns (changed, deleted, entries) where entries is the new manifest (hash None for files still to be written)
+def diff_files(files, previous_entries):
+    changed = []
+    entries = {}
+
+    for file_path, relative_path in files:
+        key = relative_path.replace(os.sep, "/")
+        stat = os.stat(file_path)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": None}
+        old_entry = previous_entries.get(key)
+
+        if old_entry and old_entry["size"] == entry["size"]:
+            if old_entry["mtime"] == entry["mtime"]:
+                entry["sha256"] = old_entry["sha256"]
+            else:
+                sha256 = hash_file(file_path)
+                if sha256 == old_entry["sha256"]:
+                    entry["sha256"] = sha256
+                else:
+                    changed.append((file_path, relative_path))
+        else:
+            changed.append((file_path, relative_path))
+
+        entries[key] = entry
+
+    deleted = sorted(set(previous_entries) - set(entries))
+    return changed, deleted, entries
+
+#Read the manifest stored inside an archive. Archives created before manifests existed are treated as full backups
+def read_archive_manifest(archive_path):
+    with open_backup(archive_path) as zip_file:
+        try:
+            with zip_file.open(MANIFEST_ENTRY) as file:
+                return json.load(file)
+        except KeyError:
+            names = [name for name in zip_file.namelist() if not name.endswith("/")]
+            return {"base": None, "deleted": [], "files": {name: None for name in names}}
+
+#Follow the "base" links from an archive back to its full backup. Returns the chain ordered from the full backup to the given archive
+def resolve_chain(archive_path):
+    folder = os.path.dirname(archive_path)
+    chain = []
+    current = archive_path
+
+    while current:
+        if current in (path for path, _ in chain):
+            raise ValueError(f"The backup chain of '{archive_path}' contains a loop")
+        if not backup_exists(current):
+            raise FileNotFoundError(f"The base backup '{current}' is missing")
+
+        manifest = read_archive_manifest(current)
+        chain.append((current, manifest))
+        current = os.path.join(folder, manifest["base"]) if manifest.get("base") else None
+
+    chain.reverse()
+    return chain
+
+#Rebuild the full snapshot of an archive into target_folder using its base backup and every increment in between.
+#Every file is extracted only once, from the newest archive of the chain that contains it
+def restore_backup(archive_path, target_folder):
+    if not backup_exists(archive_path):
+        print (f"Error: The backup {archive_path} do not exist.")
+        return 0
+
+    archive_path = volume_base(archive_path)
+    chain = resolve_chain(archive_path)
+    snapshot = chain[-1][1]["files"]
+
+    #Decide which archive provides each file before opening any of them for extraction
+    sources = {}
+    for path, _ in chain:
+        with open_backup(path) as zip_file:
+            for name in zip_file.namelist():
+                if name in snapshot:
+                    sources[name] = path
+
+    missing = set(snapshot) - set(sources)
+    if missing:
+        print (f"Warning: {len(missing)} files of the snapshot were not found in the backup chain.")
+
+    by_archive = {}
+    for name, path in sources.items():
+        by_archive.setdefault(path, []).append(name)
+
+    if not os.path.exists(target_folder):
+        os.makedirs(target_folder)
+
+    restored = 0
+    for path, _ in chain:
+        names = by_archive.get(path)
+        if not names:
+            continue
+        with open_backup(path) as zip_file:
+            for name in names:
+                zip_file.extract(name, target_folder)
+                restored = restored + 1
+
+    print (f"Restored {restored} files from {len(chain)} archives into '{target_folder}'")
+    return restored
@@ -1,14 +1,128 @@
 import os
+import re
+import sys
+import argparse
+import fnmatch
 import datetime
+import hashlib
+import json
+import time
 import zipfile
 
-#To create a backup name we'll use the current date and time
-def create_backup_name():
+from incremental import MANIFEST_ENTRY, load_manifest, save_manifest, diff_files, restore_backup
+from parallel import write_files_parallel
+from compression_policy import CODECS, CompressionPolicy
+from volumes import VolumeWriter, backup_size
+from verify import write_sidecar, verify_backup, compare_with_source
+from retention import prune_backups, run_scheduler
+from progress import ProgressReporter, BackupMetrics, TimedWriter
+from chunk_store import create_snapshot, list_snapshots, restore_snapshot, delete_snapshot, garbage_collect
+
+COPY_BLOCK_SIZE = 1024 * 1024
+#Files at least this big always get ZIP64 headers, so they can grow while being read without breaking the archive
+ZIP64_FILE_SIZE = 1024 * 1024 * 1024
+
+#To create a backup name we'll use the current date and time. Incremental backups get an extra suffix
+def create_backup_name(kind=None):
     date = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    if kind:
+        return f"backup_{date}_{kind}.zip"
     return f"backup_{date}.zip"
 
-#If the origin path do not exist print an error but if the destination folder do not exist, create it
-def create_backup(origin_folder, destination_folder):
+#Compile a list of glob patterns into a single regular expression, so every path is checked with one match
+def compile_globs(patterns):
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns))
+
+#Walk the origin folder and return (file_path, relative_path) for every file found.
+#include/exclude are glob patterns (e.g. "*.py", "build/*", ".git") matched against the path inside the origin folder
+#and against the file name. Excluded folders are not walked at all
+def collect_files(origin_folder, include=None, exclude=None):
+    include_pattern = compile_globs(include)
+    exclude_pattern = compile_globs(exclude)
+    files = []
+
+    for actual_folder, subfolders, file_names in os.walk(origin_folder):
+        inner_folder = os.path.relpath(actual_folder, origin_folder).replace(os.sep, "/")
+        inner_folder = "" if inner_folder == "." else inner_folder + "/"
+
+        if exclude_pattern:
+            subfolders[:] = [folder for folder in subfolders
+                             if not exclude_pattern.match(inner_folder + folder) and not exclude_pattern.match(folder)]
+
+        for file in file_names:
+            if include_pattern and not include_pattern.match(inner_folder + file) and not include_pattern.match(file):
+                continue
+            if exclude_pattern and (exclude_pattern.match(inner_folder + file) or exclude_pattern.match(file)):
+                continue
+            file_path = os.path.join(actual_folder, file)
+            #Save route in its respective ZIP
+            relative_path = os.path.relpath(file_path, os.path.dirname(origin_folder))
+            files.append((file_path, relative_path))
+    return files
+
+#Add a file to the ZIP and hash it in the same read, so the manifest does not need a second pass over the data.
+#The file is streamed in blocks of chunk_size bytes, so memory does not depend on its size.
+#The compression policy (if any) decides the codec of the file. The time spent reading the file and compressing it
+#(feeding the ZIP writer minus its disk writes) is added to metrics. Returns the manifest entry of the file
+def write_file(zip_file, file_path, relative_path, policy=None, chunk_size=COPY_BLOCK_SIZE, metrics=None):
+    metrics = metrics or BackupMetrics()
+    stat = os.stat(file_path)
+    zinfo = zipfile.ZipInfo.from_file(file_path, relative_path)
+    zinfo.compress_type = zip_file.compression
+    if policy:
+        compress_type, compresslevel, probe_time, reason = policy.choose(file_path, stat.st_size)
+        zinfo.compress_type = compress_type
+        zinfo._compresslevel = compresslevel
+        policy.record(compress_type, stat.st_size, probe_time, reason)
+    digest = hashlib.sha256()
+
+    force_zip64 = stat.st_size >= ZIP64_FILE_SIZE
+    with open(file_path, "rb") as src, zip_file.open(zinfo, "w", force_zip64=force_zip64) as dest:
+        while True:
+            started = time.perf_counter()
+            block = src.read(chunk_size)
+            read_done = time.perf_counter()
+            metrics.add("read", read_done - started)
+            if not block:
+                break
+
+            written_before = metrics.phases["write"]
+            digest.update(block)
+            dest.write(block)
+            metrics.add("compress", time.perf_counter() - read_done - (metrics.phases["write"] - written_before))
+
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+#Compress the files one after another in this process
+def write_files(zip_file, files, policy=None, chunk_size=COPY_BLOCK_SIZE, metrics=None):
+    for file_path, relative_path in files:
+        yield (file_path, relative_path, write_file(zip_file, file_path, relative_path, policy, chunk_size, metrics))
+
+#Peak resident memory in MB of this process and of its finished worker processes, or None where the resource module
+#does not exist (Windows). ru_maxrss is in bytes on macOS and in KB on Linux
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return own / (1024*1024), children / (1024*1024)
+
+#If the origin path do not exist print an error but if the destination folder do not exist, create it.
+#With incremental=True only new or changed files (and the list of deleted ones) are stored, based on the manifest of the previous run.
+#With workers set, the files are compressed in that many processes and this process only writes the ZIP.
+#policy is a CompressionPolicy (stores already compressed files, picks codecs per extension); None uses the default policy.
+#Files are streamed in blocks of chunk_size bytes and, with max_volume_size set, the archive is split into numbered volumes.
+#include/exclude are glob patterns to choose the files. A throttled progress line replaces the per-file output
+#(progress=False hides it) and, with metrics_path set, the time spent in every phase is saved as JSON
+def create_backup(origin_folder, destination_folder, incremental=False, workers=None, policy=None,
+                  chunk_size=COPY_BLOCK_SIZE, max_volume_size=None, include=None, exclude=None,
+                  progress=True, metrics_path=None):
     if not os.path.exists(origin_folder):
         print (f"Error: The origin folder {origin_folder} do not exist.")
         return None
@@ -17,52 +131,352 @@ def create_backup(origin_folder, destination_folder):
         print (f"Creating destination folder: '{destination_folder}'...")
         os.makedirs(destination_folder)
 
+    metrics = BackupMetrics()
+    start = time.perf_counter()
+    files = collect_files(origin_folder, include, exclude)
+
+    previous = load_manifest(destination_folder, origin_folder) if incremental else None
+    if previous:
+        files, deleted, entries = diff_files(files, previous["files"])
+    else:
+        deleted = []
+        entries = {}
+        if incremental:
+            print ("No previous backup found for this folder, creating a full backup.")
+
+    size_to_write = sum(os.path.getsize(file_path) for file_path, _ in files)
+    metrics.add("walk", time.perf_counter() - start)
+
     #Creating backup file name
-    backup_name = create_backup_name()
+    backup_name = create_backup_name("incr" if previous else None)
     path_backup = os.path.join(destination_folder, backup_name)
 
     #Creating ZIP file
     print (f"Creating backup in '{path_backup}'...")
 
-    with zipfile.ZipFile(path_backup, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for actual_folder, subfolders, files in os.walk(origin_folder):
-            for file in files:
-                file_path = os.path.join(actual_folder, file)
-                #Save route in its respective ZIP
-                relative_path = os.path.relpath(file_path, os.path.dirname(origin_folder))
-                zip_file.write(file_path, relative_path)
-                print (f"Added: {relative_path}")
-    
+    if policy is None:
+        policy = CompressionPolicy()
+
+    total_bytes = 0
+    archived = {}
+    reporter = ProgressReporter(len(files), size_to_write) if progress else None
+
+    output = VolumeWriter(path_backup, max_volume_size) if max_volume_size else open(path_backup, "wb")
+
+    with TimedWriter(output, metrics) as timed_output, zipfile.ZipFile(timed_output, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zip_file:
+        if workers and workers > 1:
+            print (f"Compressing with {workers} worker processes...")
+            large_file_writer = lambda path, name: write_file(zip_file, path, name, policy, chunk_size, metrics)
+            written = write_files_parallel(zip_file, files, workers, large_file_writer, policy, metrics)
+        else:
+            written = write_files(zip_file, files, policy, chunk_size, metrics)
+
+        for file_path, relative_path, entry in written:
+            entries[relative_path.replace(os.sep, "/")] = entry
+            archived[relative_path.replace(os.sep, "/")] = entry
+            total_bytes = total_bytes + entry["size"]
+            if reporter:
+                reporter.update(1, entry["size"])
+
+        #Every archive carries the full snapshot manifest so it can be restored without the manifest file
+        manifest = {
+            "origin": os.path.abspath(origin_folder),
+            "archive": backup_name,
+            "base": previous["archive"] if previous else None,
+            "deleted": deleted,
+            "files": entries,
+        }
+        zip_file.writestr(MANIFEST_ENTRY, json.dumps(manifest))
+
+    save_manifest(destination_folder, manifest)
+    write_sidecar(path_backup, archived)
+    elapsed = time.perf_counter() - start
+    if reporter:
+        reporter.finish()
+
+    if previous:
+        print (f"Incremental backup: {len(files)} new or changed files, {len(deleted)} deleted files.")
     print (f"Backup Completed: {path_backup}")
+    if max_volume_size:
+        print (f"The backup was split into {len(output.volume_paths)} volumes ({os.path.basename(path_backup)}.001 ...)")
+    policy.print_summary()
+    print (f"Throughput: {total_bytes / (1024*1024) / max(elapsed, 1e-9):.2f} MB/s ({total_bytes / (1024*1024):.2f} MB in {elapsed:.2f} s)")
+
+    peak_memory = peak_memory_mb()
+    if peak_memory:
+        print (f"Peak memory: {peak_memory[0]:.1f} MB (worker processes: {peak_memory[1]:.1f} MB)")
+
+    if metrics_path:
+        metrics.save(metrics_path, archive=path_backup, files=len(archived), bytes=total_bytes,
+                     elapsed=round(elapsed, 6), throughput_mb_s=round(total_bytes / (1024*1024) / max(elapsed, 1e-9), 3),
+                     workers=workers or 1, peak_memory_mb=peak_memory[0] if peak_memory else None)
+        print (f"Metrics saved in '{metrics_path}'")
     return path_backup
 
 
+#Parse "--codec .csv=lzma" or "--codec .log=bzip2:9" into the codecs of a CompressionPolicy
+def parse_codecs(values):
+    codecs = {}
+    for value in values or []:
+        extension, _, codec = value.partition("=")
+        codec, _, level = codec.partition(":")
+        if not extension or codec not in CODECS:
+            raise argparse.ArgumentTypeError(f"Invalid codec '{value}', use EXTENSION=CODEC[:LEVEL] with CODEC one of {', '.join(CODECS)}")
+        codecs[extension if extension.startswith(".") else "." + extension] = (codec, int(level) if level else None)
+    return codecs
+
+def add_retention_arguments(parser):
+    parser.add_argument("--hourly", type=int, default=24, help="hourly backups to keep (default 24)")
+    parser.add_argument("--daily", type=int, default=7, help="daily backups to keep (default 7)")
+    parser.add_argument("--weekly", type=int, default=4, help="weekly backups to keep (default 4)")
+    parser.add_argument("--monthly", type=int, default=12, help="monthly backups to keep (default 12)")
+
+def add_backup_arguments(parser):
+    parser.add_argument("origin", help="folder to back up")
+    parser.add_argument("-d", "--destination", default="./backups", help="folder where the backups are saved (default ./backups)")
+    parser.add_argument("-i", "--incremental", action="store_true", help="store only new or changed files")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="compression processes (default 1)")
+    parser.add_argument("--include", action="append", metavar="GLOB", help="only back up matching files (repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="GLOB", help="skip matching files and folders (repeatable)")
+    parser.add_argument("--volume-size", type=float, metavar="MB", help="split the backup into volumes of this size")
+    parser.add_argument("--chunk-size", type=int, default=COPY_BLOCK_SIZE // 1024, metavar="KB", help="read block size (default 1024)")
+    parser.add_argument("--codec", action="append", metavar="EXT=CODEC[:LEVEL]", help="codec for a file type, e.g. .csv=lzma (repeatable)")
+    parser.add_argument("--no-policy", action="store_true", help="compress every file with DEFLATE")
+    parser.add_argument("--metrics", metavar="FILE", help="save the time spent in walk, read, compress and write as JSON")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not show the progress line")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Auto Backup. Run it without arguments to use the interactive menu.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup = commands.add_parser("backup", help="create a ZIP backup")
+    add_backup_arguments(backup)
+    backup.add_argument("--verify", action="store_true", help="verify the backup after creating it")
+
+    restore = commands.add_parser("restore", help="restore a backup and its chain of incremental backups")
+    restore.add_argument("archive")
+    restore.add_argument("target")
+
+    verify = commands.add_parser("verify", help="check the CRC32 and SHA-256 of every entry of a backup")
+    verify.add_argument("archive")
+    verify.add_argument("-w", "--workers", type=int, help="parallel readers")
+    verify.add_argument("--compare", nargs="?", const="", metavar="SOURCE", help="also compare with the source folder")
+
+    prune = commands.add_parser("prune", help="remove old backups")
+    prune.add_argument("destination")
+    add_retention_arguments(prune)
+    prune.add_argument("--dry-run", action="store_true", help="only show what would be removed")
+
+    schedule = commands.add_parser("schedule", help="run backups on an interval, skipping unchanged folders")
+    add_backup_arguments(schedule)
+    schedule.add_argument("--interval", type=float, default=60, metavar="MINUTES", help="minutes between backups (default 60)")
+    add_retention_arguments(schedule)
+
+    snapshot = commands.add_parser("snapshot", help="create a deduplicated snapshot in a chunk store")
+    snapshot.add_argument("origin")
+    snapshot.add_argument("-s", "--store", default="./backup_store")
+
+    snapshots = commands.add_parser("snapshots", help="list the snapshots of a chunk store")
+    snapshots.add_argument("-s", "--store", default="./backup_store")
+
+    restore_snapshot_parser = commands.add_parser("restore-snapshot", help="restore a snapshot from a chunk store")
+    restore_snapshot_parser.add_argument("snapshot")
+    restore_snapshot_parser.add_argument("target")
+    restore_snapshot_parser.add_argument("-s", "--store", default="./backup_store")
+
+    delete_snapshot_parser = commands.add_parser("delete-snapshot", help="delete a snapshot from a chunk store")
+    delete_snapshot_parser.add_argument("snapshot")
+    delete_snapshot_parser.add_argument("-s", "--store", default="./backup_store")
+
+    gc = commands.add_parser("gc", help="remove the chunks no snapshot uses")
+    gc.add_argument("-s", "--store", default="./backup_store")
+
+    return parser
+
+#Options of create_backup taken from the backup/schedule arguments
+def backup_options(args):
+    if args.no_policy:
+        policy = CompressionPolicy(stored_extensions=(), probe=False)
+    else:
+        policy = CompressionPolicy(codecs=parse_codecs(args.codec))
+    return {
+        "incremental": args.incremental,
+        "workers": args.workers,
+        "policy": policy,
+        "chunk_size": args.chunk_size * 1024,
+        "max_volume_size": int(args.volume_size * 1024 * 1024) if args.volume_size else None,
+        "include": args.include,
+        "exclude": args.exclude,
+        "progress": not args.quiet,
+        "metrics_path": args.metrics,
+    }
+
+#Non-interactive entry point. Returns the exit code (0 when everything went well)
+def run_cli(argv):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "backup":
+            path_backup = create_backup(args.origin, args.destination, **backup_options(args))
+            if not path_backup:
+                return 1
+            print (f"Backup size: {backup_size(path_backup) / (1024*1024):.2f} MB")
+            return 0 if not args.verify or verify_backup(path_backup) else 1
+
+        if args.command == "restore":
+            return 0 if restore_backup(args.archive, args.target) else 1
+
+        if args.command == "verify":
+            ok = verify_backup(args.archive, args.workers)
+            if args.compare is not None:
+                ok = compare_with_source(args.archive, args.compare or None) is not None and ok
+            return 0 if ok else 1
+
+        if args.command == "prune":
+            prune_backups(args.destination, args.hourly, args.daily, args.weekly, args.monthly, args.dry_run)
+            return 0
+
+        if args.command == "schedule":
+            options = backup_options(args)
+            retention = {"hourly": args.hourly, "daily": args.daily, "weekly": args.weekly, "monthly": args.monthly}
+            run_scheduler(args.origin, args.destination, args.interval * 60,
+                          lambda: create_backup(args.origin, args.destination, **options), retention)
+            return 0
+
+        if args.command == "snapshot":
+            snapshot_name = os.path.splitext(create_backup_name())[0] + ".json"
+            return 0 if create_snapshot(args.origin, args.store, snapshot_name) else 1
+        if args.command == "snapshots":
+            list_snapshots(args.store)
+        elif args.command == "restore-snapshot":
+            restore_snapshot(args.store, args.snapshot, args.target)
+        elif args.command == "delete-snapshot":
+            delete_snapshot(args.store, args.snapshot)
+        elif args.command == "gc":
+            garbage_collect(args.store)
+        return 0
+
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print (f"Error: {e}")
+        return 1
+
+#With arguments the script runs as a command line tool (python main.py backup ./my_project), without them it shows the menu
 def main():
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    interactive_menu()
+
+def interactive_menu():
     print ("=== AUTO BACKUP ===")
-    
+
+    print ("\nOptions:")
+    print ("1. Full backup")
+    print ("2. Incremental backup (only new or changed files)")
+    print ("3. Restore a backup")
+    print ("4. Deduplicated backup (chunk store)")
+    print ("5. List the snapshots of a chunk store")
+    print ("6. Restore a snapshot from a chunk store")
+    print ("7. Delete a snapshot from a chunk store")
+    print ("8. Garbage-collect a chunk store")
+    print ("9. Verify a backup")
+    print ("10. Remove old backups (retention)")
+    print ("11. Run backups on a schedule")
+
+    option = input("Select your option (1-11) [default 1]: ").strip() or "1"
+
+    if option in ("10", "11"):
+        destination_folder = input("Insert the backup folder (leave it empty to use './backups' as default): ") or "./backups"
+        retention = {}
+        for period, default in (("hourly", 24), ("daily", 7), ("weekly", 4), ("monthly", 12)):
+            value = input(f"Number of {period} backups to keep [default {default}]: ").strip()
+            retention[period] = int(value) if value.isdigit() else default
+
+        if option == "10":
+            if not os.path.exists(destination_folder):
+                print (f"Error: The backup folder {destination_folder} do not exist.")
+                return
+            prune_backups(destination_folder, **retention)
+            return
+
+        origin_folder = input("Insert the origin folder you want to backup: ")
+        if not os.path.exists(origin_folder):
+            print (f"Error: The origin folder {origin_folder} do not exist.")
+            return
+        interval = input("Insert the interval between backups in minutes [default 60]: ").strip()
+        interval = float(interval) * 60 if interval else 3600
+        incremental = input("Use incremental backups? (y/n): ").lower() == "y"
+
+        run_scheduler(origin_folder, destination_folder, interval,
+                      lambda: create_backup(origin_folder, destination_folder, incremental=incremental), retention)
+        return
+
+    if option == "9":
+        archive_path = input("Insert the path of the backup you want to verify: ")
+        try:
+            verify_backup(archive_path)
+            if input("Compare the backup with the source folder? (y/n): ").lower() == "y":
+                compare_with_source(archive_path, input("Insert the source folder (leave it empty to use the original one): ") or None)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print (f"Error verifying the backup: {e}")
+        return
+
+    if option in ("4", "5", "6", "7", "8"):
+        store_folder = input("Insert the chunk store folder (leave it empty to use './backup_store' as default): ") or "./backup_store"
+        try:
+            if option == "4":
+                origin_folder = input("Insert the origin folder you want to backup: ")
+                snapshot_name = os.path.splitext(create_backup_name())[0] + ".json"
+                create_snapshot(origin_folder, store_folder, snapshot_name)
+            elif option == "5":
+                list_snapshots(store_folder)
+            elif option == "6":
+                if list_snapshots(store_folder):
+                    snapshot_name = input("Insert the name of the snapshot you want to restore: ")
+                    target_folder = input("Insert the folder where the files will be restored: ")
+                    restore_snapshot(store_folder, snapshot_name, target_folder)
+            elif option == "7":
+                if list_snapshots(store_folder):
+                    delete_snapshot(store_folder, input("Insert the name of the snapshot you want to delete: "))
+            else:
+                garbage_collect(store_folder)
+        except (OSError, ValueError) as e:
+            print (f"Error using the chunk store: {e}")
+        return
+
+    if option == "3":
+        archive_path = input("Insert the path of the backup you want to restore: ")
+        target_folder = input("Insert the folder where the files will be restored: ")
+        try:
+            restore_backup(archive_path, target_folder)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print (f"Error restoring the backup: {e}")
+        return
+
+    if option not in ("1", "2"):
+        print ("Invalid option.")
+        return
+
     origin_folder = input("Insert the origin folder you want to backup: ")
     destination_folder = input("Insert the destination folder where you want to save the backup (leave it empty to use './backups' as default): ")
 
     if not destination_folder:
         destination_folder = "./backups"
+
+    workers = input(f"Insert the number of compression processes (leave it empty to use 1, this computer has {os.cpu_count()} cores): ").strip()
+    workers = int(workers) if workers.isdigit() else 1
+
+    max_volume_size = input("Insert the maximum size of every volume in MB to split the backup (leave it empty to create a single file): ").strip()
+    max_volume_size = int(float(max_volume_size) * 1024 * 1024) if max_volume_size else None
     
     #Creating backup
-    path_backup = create_backup(origin_folder, destination_folder)
+    path_backup = create_backup(origin_folder, destination_folder, incremental=(option == "2"), workers=workers,
+                                max_volume_size=max_volume_size)
 
     #If the path of the backup exists then we will obtain the size of the backup by bytes and convert it to MB using the following code:
     if path_backup:
-        print (f"\nBackup size: {os.path.getsize(path_backup) / (1024*1024):.2f} MB")
+        print (f"\nBackup size: {backup_size(path_backup) / (1024*1024):.2f} MB")
         print ("\nBackup completed succesfully!")
 
 if __name__ == "__main__":
     main()
-
-    
-
-
-
-
-
-
-
-
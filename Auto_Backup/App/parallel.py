@@ -0,0 +1,119 @@
+import os
+import time
+import zlib
+import hashlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+#Files bigger than this are not sent to the workers: their compressed data would have to travel back through a pipe
+#and be held in memory, so the writer streams them itself while the workers keep compressing the small ones
+LARGE_FILE_SIZE = 32 * 1024 * 1024
+
+#Compress one file in a worker process. Returns everything the writer needs to add the entry without touching the data again
+def compress_entry(file_path, relative_path, compresslevel=None, policy=None):
+    stat = os.stat(file_path)
+    zinfo = zipfile.ZipInfo.from_file(file_path, relative_path)
+
+    compress_type, probe_time, reason = zipfile.ZIP_DEFLATED, 0.0, "default"
+    if policy:
+        compress_type, level, probe_time, reason = policy.choose(file_path, stat.st_size)
+        if level is not None:
+            compresslevel = level
+
+    started = time.perf_counter()
+    with open(file_path, "rb") as file:
+        data = file.read()
+    read_done = time.perf_counter()
+
+    #Same compressors zipfile itself uses, so every codec produces the exact stream a ZIP reader expects
+    compressor = zipfile._get_compressor(compress_type, compresslevel)
+    compressed = compressor.compress(data) + compressor.flush() if compressor else data
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    return {
+        "filename": zinfo.filename,
+        "date_time": zinfo.date_time,
+        "external_attr": zinfo.external_attr,
+        "file_size": len(data),
+        "CRC": zlib.crc32(data),
+        "compress_type": compress_type,
+        "compressed": compressed,
+        "policy": (compress_type, stat.st_size, probe_time, reason),
+        "entry": {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": sha256},
+        "times": {"read": read_done - started, "compress": time.perf_counter() - read_done},
+    }
+
+#Append an entry whose data is already compressed. This does what ZipFile.write does after compressing,
+#so the result is a standard ZIP that zipfile (or any other tool) can read
+def write_compressed(zip_file, result):
+    zinfo = zipfile.ZipInfo(result["filename"], result["date_time"])
+    zinfo.external_attr = result["external_attr"]
+    zinfo.compress_type = result["compress_type"]
+    if zinfo.compress_type == zipfile.ZIP_LZMA:
+        #The LZMA stream ends with an end-of-stream marker, flagged in the header like zipfile does
+        zinfo.flag_bits |= 0x02
+    zinfo.file_size = result["file_size"]
+    zinfo.compress_size = len(result["compressed"])
+    zinfo.CRC = result["CRC"]
+
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+
+    if zip_file._seekable:
+        zip_file.fp.seek(zip_file.start_dir)
+    zinfo.header_offset = zip_file.fp.tell()
+    zip_file._writecheck(zinfo)
+    zip_file._didModify = True
+
+    zip_file.fp.write(zinfo.FileHeader(zip64))
+    zip_file.fp.write(result["compressed"])
+    zip_file.start_dir = zip_file.fp.tell()
+
+    zip_file.filelist.append(zinfo)
+    zip_file.NameToInfo[zinfo.filename] = zinfo
+
+#Compress the files in a process pool and let this process be the only writer of the ZIP.
+#At most workers * 4 results are in flight so memory stays bounded. large_file_writer(file_path, relative_path)
+#is used for the big files and must return their manifest entry. The decisions of the compression policy, taken in the workers,
+#are recorded here, and so are the read and compress times of the workers (added up, so they can exceed the elapsed time).
+#Yields (file_path, relative_path, entry) as soon as every entry is written, in completion order
+def write_files_parallel(zip_file, files, workers, large_file_writer, policy=None, metrics=None):
+    max_pending = workers * 4
+    pending = {}
+    large_files = []
+
+    def write_result(future):
+        result = future.result()
+        write_compressed(zip_file, result)
+        if policy:
+            policy.record(*result["policy"])
+        if metrics:
+            for phase, seconds in result["times"].items():
+                metrics.add(phase, seconds)
+        return pending.pop(future) + (result["entry"],)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_path, relative_path in files:
+            if os.path.getsize(file_path) > LARGE_FILE_SIZE:
+                large_files.append((file_path, relative_path))
+                continue
+
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield write_result(future)
+
+            future = executor.submit(compress_entry, file_path, relative_path, zip_file.compresslevel, policy)
+            pending[future] = (file_path, relative_path)
+
+        #The workers finish the queued small files while the big ones are streamed here
+        for file_path, relative_path in large_files:
+            yield (file_path, relative_path, large_file_writer(file_path, relative_path))
+
+            done = [future for future in pending if future.done()]
+            for future in done:
+                yield write_result(future)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield write_result(future)
@@ -0,0 +1,87 @@
+import sys
+import json
+import time
+
+#Shows how a backup is going without printing one line per file: the line is refreshed at most every interval seconds
+#(every 5 seconds, on new lines, when the output is not a terminal, e.g. in a cron log)
+class ProgressReporter:
+    def __init__(self, total_files, total_bytes, interval=0.5, stream=None):
+        self.stream = stream or sys.stdout
+        self.interactive = self.stream.isatty()
+        self.interval = interval if self.interactive else max(interval, 5.0)
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+        self.last_report = self.start
+
+    def update(self, files=1, size=0):
+        self.files = self.files + files
+        self.bytes = self.bytes + size
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now=None):
+        elapsed = max((now or time.monotonic()) - self.start, 1e-9)
+        files_per_second = self.files / elapsed
+        bytes_per_second = self.bytes / elapsed
+        remaining = max(self.total_bytes - self.bytes, 0)
+        eta = remaining / bytes_per_second if bytes_per_second else 0
+
+        line = (f"{self.files}/{self.total_files} files, {self.bytes / (1024*1024):.1f}/{self.total_bytes / (1024*1024):.1f} MB, "
+                f"{files_per_second:.0f} files/s, {bytes_per_second / (1024*1024):.2f} MB/s, ETA {format_duration(eta)}")
+        if self.interactive:
+            self.stream.write("\r" + line.ljust(100))
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        self.report()
+        if self.interactive:
+            self.stream.write("\n")
+            self.stream.flush()
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+#Time spent in every phase of a backup (walk, read, compress, write), saved as JSON when a metrics file is requested
+class BackupMetrics:
+    def __init__(self):
+        self.phases = {"walk": 0.0, "read": 0.0, "compress": 0.0, "write": 0.0}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases[phase] + seconds
+
+    def save(self, metrics_path, **values):
+        data = dict(values)
+        data["phases"] = {phase: round(seconds, 6) for phase, seconds in self.phases.items()}
+        with open(metrics_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+#Wraps the output file of the ZIP to measure the time spent writing to disk. Whatever the ZIP writer spends outside
+#these writes, while it is being fed data, is compression time
+class TimedWriter:
+    def __init__(self, file, metrics):
+        self.file = file
+        self.metrics = metrics
+
+    def write(self, data):
+        start = time.perf_counter()
+        written = self.file.write(data)
+        self.metrics.add("write", time.perf_counter() - start)
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.file.close()
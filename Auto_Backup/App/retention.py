@@ -0,0 +1,136 @@
+import os
+import re
+import time
+import hashlib
+import datetime
+
+from verify import SIDECAR_SUFFIX
+
+#backup_20250917_143022.zip, backup_20250917_143022_incr.zip, their volumes (.001, .002...) and their SHA-256 sidecar
+BACKUP_NAME = re.compile(r"^(backup_(\d{8}_\d{6})(?:_([a-z]+))?\.zip)(\.\d{3}|" + re.escape(SIDECAR_SUFFIX) + r")?$")
+FINGERPRINT_FILE = ".backup_fingerprint"
+
+#Group the files of a backup folder by archive using only their names: no archive is opened.
+#Returns a list of (date, kind, archive_name, file_names) sorted from the oldest to the newest
+def find_backups(destination_folder):
+    backups = {}
+    for file_name in os.listdir(destination_folder):
+        match = BACKUP_NAME.match(file_name)
+        if not match:
+            continue
+        archive_name, date, kind = match.group(1), match.group(2), match.group(3)
+        if archive_name not in backups:
+            backups[archive_name] = (datetime.datetime.strptime(date, "%Y%m%d_%H%M%S"), kind, archive_name, [])
+        backups[archive_name][3].append(file_name)
+    return sorted(backups.values(), key=lambda backup: (backup[0], backup[2]))
+
+#Periods used by every retention rule: a backup is kept if it is the newest one of one of the last N periods
+PERIODS = {
+    "hourly": lambda date: (date.year, date.month, date.day, date.hour),
+    "daily": lambda date: (date.year, date.month, date.day),
+    "weekly": lambda date: tuple(date.isocalendar()[:2]),
+    "monthly": lambda date: (date.year, date.month),
+}
+
+#Decide which backups to keep with one pass over the list for every rule.
+#An incremental backup needs every archive back to its full backup, so the whole chain of a kept increment is kept too
+def select_backups_to_keep(backups, hourly=24, daily=7, weekly=4, monthly=12):
+    limits = {"hourly": hourly, "daily": daily, "weekly": weekly, "monthly": monthly}
+    keep = set()
+    if backups:
+        keep.add(len(backups) - 1)
+
+    for period, limit in limits.items():
+        if not limit:
+            continue
+        seen = set()
+        #Newest first, so the first backup found in a period is the newest of that period
+        for index in range(len(backups) - 1, -1, -1):
+            key = PERIODS[period](backups[index][0])
+            if key in seen:
+                continue
+            seen.add(key)
+            keep.add(index)
+            if len(seen) >= limit:
+                break
+
+    #Walk forward remembering where the current chain started, and keep the chain of every kept increment
+    chain_start = 0
+    for index, (_, kind, _, _) in enumerate(backups):
+        if kind != "incr":
+            chain_start = index
+        elif index in keep:
+            keep.update(range(chain_start, index))
+
+    return keep
+
+#Delete the backups that no retention rule keeps. Returns the names of the removed archives
+def prune_backups(destination_folder, hourly=24, daily=7, weekly=4, monthly=12, dry_run=False):
+    backups = find_backups(destination_folder)
+    keep = select_backups_to_keep(backups, hourly, daily, weekly, monthly)
+
+    removed = []
+    for index, (_, _, archive_name, file_names) in enumerate(backups):
+        if index in keep:
+            continue
+        if not dry_run:
+            for file_name in file_names:
+                os.remove(os.path.join(destination_folder, file_name))
+        removed.append(archive_name)
+
+    action = "Would remove" if dry_run else "Removed"
+    print (f"Retention: {len(backups) - len(removed)} backups kept, {action.lower()} {len(removed)}.")
+    for archive_name in removed:
+        print (f"{action}: {archive_name}")
+    return removed
+
+#Cheap fingerprint of a folder built only from names, sizes and mtimes (no file is read).
+#Folders in exclude (e.g. a destination inside the origin) are skipped
+def tree_fingerprint(folder, exclude=()):
+    digest = hashlib.sha256()
+    excluded = {os.path.abspath(path) for path in exclude}
+    pending = [folder]
+
+    while pending:
+        current = pending.pop()
+        with os.scandir(current) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) not in excluded:
+                        pending.append(entry.path)
+                    digest.update(f"D{entry.path}\0".encode("utf-8", "surrogateescape"))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    digest.update(f"F{entry.path}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8", "surrogateescape"))
+
+    return digest.hexdigest()
+
+#Run backup() every interval seconds, skipping the runs where the fingerprint of the origin folder did not change,
+#and apply the retention rules after every backup. The last fingerprint is saved in the destination folder so a
+#restarted scheduler does not repeat a backup. Stop it with Ctrl+C
+def run_scheduler(origin_folder, destination_folder, interval, backup, retention=None):
+    fingerprint_path = os.path.join(destination_folder, FINGERPRINT_FILE)
+    last_fingerprint = None
+    if os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r", encoding="utf-8") as file:
+            last_fingerprint = file.read().strip()
+
+    print (f"Scheduler started: backing up '{origin_folder}' every {interval} s (press Ctrl+C to stop).")
+    try:
+        while True:
+            start = time.monotonic()
+            fingerprint = tree_fingerprint(origin_folder, exclude=[destination_folder])
+
+            if fingerprint == last_fingerprint:
+                print (f"[{datetime.datetime.now():%Y-%m-%d %H:%M:%S}] No changes since the last backup, skipping.")
+            elif backup():
+                last_fingerprint = fingerprint
+                os.makedirs(destination_folder, exist_ok=True)
+                with open(fingerprint_path, "w", encoding="utf-8") as file:
+                    file.write(fingerprint)
+                if retention is not None:
+                    prune_backups(destination_folder, **retention)
+
+            time.sleep(max(0, interval - (time.monotonic() - start)))
+    except KeyboardInterrupt:
+        print ("\nScheduler stopped.")
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from incremental import MANIFEST_ENTRY, hash_file, read_archive_manifest
+from volumes import open_backup, volume_base
+
+#The sidecar lists the SHA-256 of every file stored in an archive: backup_X.zip -> backup_X.zip.sha256.json
+SIDECAR_SUFFIX = ".sha256.json"
+READ_BLOCK_SIZE = 1024 * 1024
+
+def sidecar_path(archive_path):
+    return volume_base(archive_path) + SIDECAR_SUFFIX
+
+def write_sidecar(archive_path, entries):
+    path = sidecar_path(archive_path)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump({"archive": os.path.basename(volume_base(archive_path)), "files": entries}, file)
+    os.replace(temporary_path, path)
+
+def load_sidecar(archive_path):
+    path = sidecar_path(archive_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)["files"]
+
+#Read a group of entries with its own handle on the archive. Reading an entry to the end makes zipfile check its CRC32,
+#and the SHA-256 is computed on the same data. zlib and hashlib release the GIL, so the threads really run in parallel.
+#Returns a list of (name, error) for the entries that failed
+def check_entries(archive_path, names, hashes):
+    errors = []
+    with open_backup(archive_path) as zip_file:
+        for name in names:
+            digest = hashlib.sha256()
+            try:
+                with zip_file.open(name) as entry:
+                    for block in iter(lambda: entry.read(READ_BLOCK_SIZE), b""):
+                        digest.update(block)
+            except (zipfile.BadZipFile, OSError, EOFError) as e:
+                errors.append((name, str(e)))
+                continue
+
+            expected = hashes.get(name)
+            if expected and expected["sha256"] and expected["sha256"] != digest.hexdigest():
+                errors.append((name, "SHA-256 does not match the sidecar"))
+    return errors
+
+#Split the entries into groups of similar compressed size, one per reader
+def balance_groups(infos, workers):
+    groups = [[] for _ in range(workers)]
+    sizes = [0] * workers
+    for info in sorted(infos, key=lambda info: info.compress_size, reverse=True):
+        index = sizes.index(min(sizes))
+        groups[index].append(info.filename)
+        sizes[index] = sizes[index] + info.compress_size
+    return [group for group in groups if group]
+
+#Check the CRC32 and the SHA-256 of every entry of a backup without extracting anything to disk.
+#Returns True if every entry is correct
+def verify_backup(archive_path, workers=None):
+    workers = workers or min(8, os.cpu_count() or 1)
+    hashes = load_sidecar(archive_path)
+    if not hashes:
+        print ("Warning: No SHA-256 sidecar found for this backup, only the CRC32 of the entries will be checked.")
+
+    start = time.perf_counter()
+    with open_backup(archive_path) as zip_file:
+        infos = [info for info in zip_file.infolist() if not info.is_dir()]
+
+    total_bytes = sum(info.file_size for info in infos)
+    missing = sorted(set(hashes) - {info.filename for info in infos})
+
+    errors = [(name, "listed in the sidecar but missing from the archive") for name in missing]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(check_entries, archive_path, group, hashes) for group in balance_groups(infos, workers)]
+        for future in futures:
+            errors.extend(future.result())
+
+    elapsed = time.perf_counter() - start
+    for name, error in errors:
+        print (f"FAILED: {name} ({error})")
+
+    print (f"Verified {len(infos)} entries ({total_bytes / (1024*1024):.2f} MB) in {elapsed:.2f} s "
+           f"({total_bytes / (1024*1024) / max(elapsed, 1e-9):.2f} MB/s) with {workers} readers.")
+    if errors:
+        print (f"Verification FAILED: {len(errors)} entries are damaged or missing.")
+    else:
+        print ("Verification OK: every entry matches its CRC32 and SHA-256.")
+    return not errors
+
+#Compare the snapshot of a backup with the live source tree. Files with the same size and mtime are not read;
+#only files whose mtime changed but kept their size are hashed to find out if their content changed.
+#Returns a dict with the lists of unchanged, touched (new mtime, same content), modified, new and deleted files
+def compare_with_source(archive_path, source_folder=None):
+    manifest = read_archive_manifest(archive_path)
+    snapshot = {name: entry for name, entry in manifest["files"].items() if name != MANIFEST_ENTRY}
+    source_folder = source_folder or manifest.get("origin")
+    if not source_folder or not os.path.exists(source_folder):
+        print (f"Error: The source folder {source_folder} do not exist.")
+        return None
+
+    result = {"unchanged": [], "touched": [], "modified": [], "new": [], "deleted": []}
+    seen = set()
+
+    for actual_folder, subfolders, file_names in os.walk(source_folder):
+        for file in file_names:
+            file_path = os.path.join(actual_folder, file)
+            name = os.path.relpath(file_path, os.path.dirname(source_folder)).replace(os.sep, "/")
+            seen.add(name)
+
+            if name not in snapshot:
+                result["new"].append(name)
+                continue
+
+            entry = snapshot[name]
+            stat = os.stat(file_path)
+            if not entry or entry["size"] != stat.st_size:
+                result["modified"].append(name)
+            elif entry["mtime"] == stat.st_mtime_ns:
+                result["unchanged"].append(name)
+            elif entry["sha256"] == hash_file(file_path):
+                result["touched"].append(name)
+            else:
+                result["modified"].append(name)
+
+    result["deleted"] = sorted(set(snapshot) - seen)
+
+    print (f"\n=== SOURCE COMPARISON '{source_folder}' ===")
+    for state, names in result.items():
+        print (f"{state.capitalize()}: {len(names)}")
+        for name in names[:10] if state != "unchanged" else []:
+            print (f"    {name}")
+    return result
@@ -0,0 +1,163 @@
+import io
+import os
+import bisect
+import zipfile
+
+#Split archives are written as numbered volumes (backup_X.zip.001, backup_X.zip.002, ...).
+#Joined in order they are exactly the original ZIP, so they can also be restored with: cat backup_X.zip.* > backup_X.zip
+VOLUME_SUFFIX = ".{:03d}"
+READ_BUFFER_SIZE = 1024 * 1024
+
+def volume_path(base_path, number):
+    return base_path + VOLUME_SUFFIX.format(number)
+
+#Accept both "backup_X.zip" and "backup_X.zip.001" as the name of a split archive
+def volume_base(path):
+    if path.endswith(VOLUME_SUFFIX.format(1)):
+        return path[:-len(VOLUME_SUFFIX.format(1))]
+    return path
+
+def list_volumes(base_path):
+    volumes = []
+    number = 1
+    while os.path.exists(volume_path(base_path, number)):
+        volumes.append(volume_path(base_path, number))
+        number = number + 1
+    return volumes
+
+def backup_exists(path):
+    return os.path.exists(path) or os.path.exists(volume_path(volume_base(path), 1))
+
+#Size on disk of a backup, adding up all its volumes if it was split
+def backup_size(path):
+    if os.path.exists(path) and not path.endswith(VOLUME_SUFFIX.format(1)):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(volume) for volume in list_volumes(volume_base(path)))
+
+#File-like object that writes a stream of bytes into volumes of at most max_volume_size bytes.
+#It can tell its position but not seek, so zipfile writes every entry in one forward pass using data descriptors
+class VolumeWriter(io.RawIOBase):
+    def __init__(self, base_path, max_volume_size):
+        if max_volume_size <= 0:
+            raise ValueError("The maximum volume size must be greater than 0")
+        self.base_path = base_path
+        self.max_volume_size = max_volume_size
+        self.volume_paths = []
+        self.position = 0
+        self.current = None
+        self.current_size = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        raise io.UnsupportedOperation("Split archives are written sequentially")
+
+    def tell(self):
+        return self.position
+
+    def _next_volume(self):
+        if self.current:
+            self.current.close()
+        path = volume_path(self.base_path, len(self.volume_paths) + 1)
+        self.current = open(path, "wb")
+        self.current_size = 0
+        self.volume_paths.append(path)
+
+    def write(self, data):
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            if self.current is None or self.current_size >= self.max_volume_size:
+                self._next_volume()
+            space = self.max_volume_size - self.current_size
+            piece = view[written:written + space]
+            self.current.write(piece)
+            self.current_size = self.current_size + len(piece)
+            written = written + len(piece)
+        self.position = self.position + written
+        return written
+
+    def flush(self):
+        if self.current:
+            self.current.flush()
+
+    def close(self):
+        if self.current:
+            self.current.close()
+            self.current = None
+        super().close()
+
+#Read-only, seekable file-like object that presents a set of volumes as one continuous file
+class VolumeReader(io.RawIOBase):
+    def __init__(self, base_path):
+        self.volume_paths = list_volumes(base_path)
+        if not self.volume_paths:
+            raise FileNotFoundError(f"No volumes found for '{base_path}'")
+        #Offset where every volume starts, to find the volume of any position with a binary search
+        self.starts = []
+        total = 0
+        for path in self.volume_paths:
+            self.starts.append(total)
+            total = total + os.path.getsize(path)
+        self.size = total
+        self.position = 0
+        self.current = None
+        self.current_index = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position = self.position + offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size:
+            return 0
+        index = bisect.bisect_right(self.starts, self.position) - 1
+        if index != self.current_index:
+            if self.current:
+                self.current.close()
+            self.current = open(self.volume_paths[index], "rb")
+            self.current_index = index
+        self.current.seek(self.position - self.starts[index])
+        read = self.current.readinto(buffer)
+        self.position = self.position + read
+        return read
+
+    def close(self):
+        if self.current:
+            self.current.close()
+            self.current = None
+        super().close()
+
+#ZipFile reading a set of volumes. zipfile does not close file objects it did not open, so the volumes are closed here
+class VolumeZipFile(zipfile.ZipFile):
+    def __init__(self, base_path):
+        self.volumes = io.BufferedReader(VolumeReader(base_path), READ_BUFFER_SIZE)
+        super().__init__(self.volumes, "r")
+
+    def close(self):
+        super().close()
+        self.volumes.close()
+
+#Open a backup for reading whether it is a single ZIP or a set of volumes
+def open_backup(path):
+    if os.path.exists(path) and not path.endswith(VOLUME_SUFFIX.format(1)):
+        return zipfile.ZipFile(path, "r")
+    return VolumeZipFile(volume_base(path))
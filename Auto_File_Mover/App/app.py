@@ -2,38 +2,313 @@
 # First, we create a new folder if it does not already exist.
 # Second, we define the source folder (the one containing the files we want to copy) and store its path in a variable.
 # Then, we read the files from the source path and copy them into the destination path (stored in our variable).
-# Finally, by using the shutil library, we can move files from one folder to another.
+# Finally, we move every file: with an atomic rename when both folders are on the same disk, or with a zero-copy
+# transfer in a pool of threads when they are on different disks.
 
 import os
+import re
+import sys
+import errno
+import time
 import shutil
+import argparse
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from watcher import watch_folder
+from rules import RuleSet, print_plan
+from journal import JOURNAL_FILE, Journal, run_journaled, replay, undo
+from dedupe import (HASH_CACHE_FILE, POLICIES, HashCache, dedupe_moves, resolve_collisions, move_with_links,
+                    partial_path, is_partial_copy)
+
+#Maximum bytes asked to the kernel in every copy_file_range/sendfile call
+ZERO_COPY_CHUNK = 64 * 1024 * 1024
+#Errors that mean "this kernel/filesystem cannot do a zero-copy transfer here", so we fall back to a normal copy
+ZERO_COPY_ERRORS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EPERM, errno.EBADF,
+                    errno.ENOTSOCK}
+#sendfile can only write to a regular file on Linux (on macOS and the BSDs the destination must be a socket)
+SENDFILE_TO_FILES = sys.platform.startswith("linux") and hasattr(os, "sendfile")
+
+MAIN_FOLDER = "/Users/aitor/Documents/Python/Automation_Python/Files"
+WORKERS = 8
 
 #Format strftime (year/month/day)
-date = datetime.now().strftime("%Y-%m-%d")
+def create_folder_name():
+    date = datetime.now().strftime("%Y-%m-%d")
+    return f"{date}_Files"
+
+#Copy the data between two open files inside the kernel (copy_file_range, or sendfile on older Linux kernels)
+#so the bytes never travel through Python. Returns False if the platform cannot do it
+def zero_copy(source_fd, destination_fd, size):
+    copy = getattr(os, "copy_file_range", None)
+    use_sendfile = copy is None
+    if use_sendfile and not SENDFILE_TO_FILES:
+        return False
+
+    offset = 0
+    while offset < size:
+        try:
+            if use_sendfile:
+                copied = os.sendfile(destination_fd, source_fd, offset, min(ZERO_COPY_CHUNK, size - offset))
+            else:
+                copied = copy(source_fd, destination_fd, min(ZERO_COPY_CHUNK, size - offset), offset)
+        except OSError as e:
+            if offset == 0 and e.errno in ZERO_COPY_ERRORS:
+                #copy_file_range is not supported between these filesystems, sendfile may still be
+                if not use_sendfile and SENDFILE_TO_FILES:
+                    use_sendfile = True
+                    continue
+                return False
+            raise
+        if copied == 0:
+            break
+        offset = offset + copied
+    return True
+
+#Copy a file to another filesystem and delete the original. The copy goes to a temporary file that is renamed
+#(atomically) only when it is complete, with the same permissions and dates as the original
+def copy_across_devices(origin, destination):
+    partial = partial_path(destination)
+    size = os.path.getsize(origin)
+
+    with open(origin, "rb") as source, open(partial, "wb") as target:
+        if not zero_copy(source.fileno(), target.fileno(), size):
+            shutil.copyfileobj(source, target, 1024 * 1024)
+
+    shutil.copystat(origin, partial)
+    os.replace(partial, destination)
+    os.remove(origin)
+
+#True if the destination already holds a complete copy of origin (same size and modification time).
+#This happens when a previous run was interrupted after the copy was renamed but before the original was deleted
+def already_copied(origin, destination):
+    try:
+        origin_stat = os.stat(origin)
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        return False
+    return origin_stat.st_size == destination_stat.st_size and origin_stat.st_mtime_ns == destination_stat.st_mtime_ns
+
+#True if a move across devices was interrupted after its copy was complete, so only the original is left to delete.
+#On the same device a move is a single rename, and a destination that looks the same is another file
+def finished_copy(origin, destination):
+    try:
+        origin_device = os.stat(os.path.dirname(os.path.abspath(origin))).st_dev
+        destination_device = os.stat(os.path.dirname(os.path.abspath(destination))).st_dev
+    except OSError:
+        return False
+    return origin_device != destination_device and already_copied(origin, destination)
+
+#Remove the temporary copies left by an interrupted run: their originals are still in the source folder and will be
+#copied again. Only files named like partial_path() are removed
+def clean_partial_copies(new_folder):
+    removed = 0
+    for entry in os.scandir(new_folder):
+        if is_partial_copy(entry.name) and entry.is_file(follow_symlinks=False):
+            os.remove(entry.path)
+            removed = removed + 1
+    if removed:
+        print (f"Resuming: {removed} incomplete copies from an interrupted run were removed")
+    return removed
+
+#Move one entry to another filesystem (runs in the thread pool)
+def move_across_devices(origin, destination):
+    if already_copied(origin, destination):
+        os.remove(origin)
+    elif os.path.isdir(origin):
+        shutil.move(origin, destination)
+    else:
+        copy_across_devices(origin, destination)
+
+#Move every file of main_folder into new_folder. With extension set, only the files ending with it are moved.
+#Returns the number of moved files
+def move_files(main_folder, new_folder, workers=WORKERS, extension=None, journal=None, dedupe=None, cache=None):
+    file_names = [file_name for file_name in os.listdir(main_folder) if not extension or file_name.endswith(extension)]
+    return move_batch(main_folder, new_folder, file_names, workers, journal, dedupe, cache)
+
+#List of (origin, destination) to move the given files of main_folder into new_folder (created if needed)
+def plan_moves(main_folder, new_folder, file_names, journal=None):
+    if not os.path.exists(new_folder):
+        os.makedirs(new_folder)
+        print (f"Folder '{new_folder}' has been created")
+
+    clean_partial_copies(new_folder)
+    #The destination folder and the journal may be inside the source folder: never move them
+    skip = {os.path.abspath(new_folder)}
+    if journal:
+        skip.add(os.path.abspath(journal.path))
+
+    moves = []
+    for file_name in file_names:
+        origin = os.path.join(main_folder, file_name)
+        #Temporary copies of the mover itself (e.g. left by an interrupted undo) are never moved
+        if os.path.abspath(origin) in skip or is_partial_copy(file_name):
+            continue
+        moves.append((origin, os.path.join(new_folder, file_name)))
+    return moves
+
+#Do the moves. When the origin and destination folders are on the same device each move is a single atomic
+#os.rename; if not, the copies run in a pool of workers threads (the kernel does the copying, so the threads do not
+#compete for the GIL). Returns the indexes of the moves that failed
+def run_moves(moves, workers=WORKERS):
+    devices = {}
+    def device(path):
+        folder = os.path.dirname(os.path.abspath(path))
+        if folder not in devices:
+            devices[folder] = os.stat(folder).st_dev
+        return devices[folder]
+
+    failed = []
+    across_devices = []
+    for index, (origin, destination) in enumerate(moves):
+        try:
+            if device(origin) != device(destination):
+                across_devices.append(index)
+                continue
+            os.rename(origin, destination)
+        except OSError as e:
+            print (f"Error moving '{origin}': {e}")
+            failed.append(index)
+
+    if across_devices:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(move_across_devices, *moves[index]): index for index in across_devices}
+            for future, index in futures.items():
+                try:
+                    future.result()
+                except OSError as e:
+                    print (f"Error moving '{moves[index][0]}': {e}")
+                    failed.append(index)
+    return sorted(failed)
+
+#Do the moves as one batch of the journal (if there is one). A file whose name is taken in the destination gets a new
+#name instead of overwriting it, and with dedupe set ("hardlink", "skip" or "rename") files whose content is already
+#there are handled with that policy. Returns the number of moved files
+def execute_moves(moves, workers=WORKERS, journal=None, dedupe=None, cache=None):
+    #The complete copy of an interrupted move is not a collision (nor a duplicate): the move keeps its destination and
+    #only deletes the original (see move_across_devices)
+    finished = [move for move in moves if finished_copy(*move)]
+    if finished:
+        done = set(finished)
+        moves = [move for move in moves if move not in done]
+
+    links = {}
+    if dedupe:
+        moves, links = dedupe_moves(moves, dedupe, cache, workers)
+        if cache:
+            cache.save()
+    else:
+        moves = resolve_collisions(moves)
+    #At the end, so the indexes of links still match
+    moves = moves + finished
+
+    def run(pairs):
+        return move_with_links(pairs, links, lambda normal: run_moves(normal, workers))
+
+    if journal:
+        return run_journaled(journal, moves, run, links=links)
+    return len(moves) - len(run(moves))
+
+#Move the given files of main_folder into new_folder. Returns the number of moved files
+def move_batch(main_folder, new_folder, file_names, workers=WORKERS, journal=None, dedupe=None, cache=None):
+    return execute_moves(plan_moves(main_folder, new_folder, file_names, journal), workers, journal, dedupe, cache)
+
+#Move the files of main_folder to the folders chosen by the rules (all of them, or only file_names).
+#With dry_run nothing is moved: only the routing of every rule is reported. Returns the number of moved files
+def move_by_rules(main_folder, rules, workers=WORKERS, dry_run=False, file_names=None, journal=None, dedupe=None, cache=None):
+    start = time.perf_counter()
+    plan, stats = rules.plan(main_folder, file_names, measure=dry_run)
+    elapsed = time.perf_counter() - start
+
+    if dry_run:
+        print_plan(plan, stats, elapsed)
+        return 0
+
+    #Every folder of the plan goes in the same batch, so a single undo reverses the whole run
+    moves = []
+    for new_folder, names in plan.items():
+        moves.extend(plan_moves(main_folder, new_folder, names, journal))
+    return execute_moves(moves, workers, journal, dedupe, cache)
+
+#Watch mode: move files as soon as they finish arriving, every batch into the folder of the current date
+#(or into the folders chosen by the rules)
+def watch(main_folder, settle=2.0, poll_interval=2.0, workers=WORKERS, use_inotify=True, rules=None, journal=None,
+          dedupe=None, cache=None):
+    def move(file_names):
+        if rules:
+            cont = move_by_rules(main_folder, rules, workers, file_names=file_names, journal=journal, dedupe=dedupe, cache=cache)
+            print (f"[{datetime.now():%H:%M:%S}] {cont} files has been moved")
+            return
+        new_folder = create_folder_name()
+        cont = move_batch(main_folder, new_folder, file_names, workers, journal, dedupe, cache)
+        print (f"[{datetime.now():%H:%M:%S}] {cont} files has been moved into the folder {new_folder}")
+
+    watch_folder(main_folder, move, settle, poll_interval, use_inotify=use_inotify)
+
+def main():
+    parser = argparse.ArgumentParser(description="Move the files of a folder into a folder named with today's date.")
+    parser.add_argument("--source", default=MAIN_FOLDER, help="folder to empty (default: MAIN_FOLDER)")
+    parser.add_argument("--watch", action="store_true", help="keep running and move new files as they arrive")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds a file must stay unchanged before it is moved (watch mode)")
+    parser.add_argument("--poll", type=float, default=2.0, help="polling interval when inotify is not available (watch mode)")
+    parser.add_argument("--no-inotify", action="store_true", help="always poll instead of using inotify (watch mode)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="threads used to copy files to another disk")
+    parser.add_argument("--rules", help="JSON file with the rules that choose the destination folder of every file")
+    parser.add_argument("--dry-run", action="store_true", help="only show where the rules would move every file")
+    parser.add_argument("--journal", default=JOURNAL_FILE, help=f"journal of the moves (default: {JOURNAL_FILE})")
+    parser.add_argument("--no-journal", action="store_true", help="do not keep a journal (no resume or undo)")
+    parser.add_argument("--undo", nargs="?", type=int, const=-1, metavar="BATCH", help="move back the files of a batch (default: the last one)")
+    parser.add_argument("--dedupe", choices=POLICIES, help="what to do with files whose content is already in the destination")
+    parser.add_argument("--hash-cache", default=HASH_CACHE_FILE, help=f"cache of file hashes used by --dedupe (default: {HASH_CACHE_FILE})")
+    args = parser.parse_args()
+
+    cache = HashCache(args.hash_cache) if args.dedupe else None
+
+    journal = None
+    if not args.no_journal and not args.dry_run:
+        journal = Journal(args.journal)
+        #Finish whatever an interrupted run left half done before anything else
+        replay(journal, lambda pairs: run_moves(pairs, args.workers))
 
-new_folder = f"{date}_Files"
+    if args.undo is not None:
+        if journal:
+            undo(journal, lambda pairs: run_moves(pairs, args.workers), None if args.undo == -1 else args.undo)
+            journal.close()
+        else:
+            print ("Error: undo needs the journal")
+        return
 
-if not os.path.exists(new_folder):
-    os.makedirs(new_folder)
-    print (f"Folder '{new_folder}' has been created")
+    rules = None
+    if args.rules:
+        try:
+            rules = RuleSet.from_file(args.rules)
+        except (OSError, ValueError, re.error) as e:
+            print (f"Error: unable to load the rules '{args.rules}': {e}")
+            return
 
-main_folder = "/Users/aitor/Documents/Python/Automation_Python/Files"
+    if args.watch:
+        watch(args.source, args.settle, args.poll, args.workers, not args.no_inotify, rules, journal, args.dedupe, cache)
+        if journal:
+            journal.close()
+        return
 
-cont = 0
+    if rules:
+        cont = move_by_rules(args.source, rules, args.workers, args.dry_run, journal=journal, dedupe=args.dedupe, cache=cache)
+        if not args.dry_run:
+            print (f"{cont} files has been moved")
+        if journal:
+            journal.close()
+        return
 
-for file_name in os.listdir(main_folder):
-    origin = os.path.join(main_folder, file_name)
-    destination = os.path.join(new_folder, file_name)
-    shutil.move(origin, destination)
-    cont = cont + 1
+    new_folder = create_folder_name()
 
-print (f"{cont} files has been moved into the folder {new_folder}")
+    #If we want to move only ONE type of file, we can use the extension filter:
+    ## cont = move_files(args.source, new_folder, extension=".txt")
+    cont = move_files(args.source, new_folder, args.workers, journal=journal, dedupe=args.dedupe, cache=cache)
+    if journal:
+        journal.close()
 
+    print (f"{cont} files has been moved into the folder {new_folder}")
 
-#If we want to move only ONE type of file, we can use the following code:
-## for file_name in os.listdir(main_folder):
-##     if file_name.endswith(".txt"):
-##         origin = os.path.join(main_folder, file_name)
-##         destination = os.path.join(new_folder, file_name)
-##         shutil.move(origin, destination)
-##         cont = cont + 1
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#Duplicate detection for a batch of moves. The files being moved are compared with each other and with the files that
+#are already in their destination folders in three steps, each one only for the files that survived the previous one:
+#same size, same hash of the first and last blocks, and finally same SHA-256 of the whole file (in a pool of threads).
+#The hashes are saved in a cache keyed by device, inode, size and mtime, so a file is never read twice.
+
+import os
+import json
+import hashlib
+from stat import S_ISREG
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_CACHE_FILE = "file_mover_hashes.json"
+PARTIAL_BLOCK = 64 * 1024
+READ_BLOCK = 1024 * 1024
+POLICIES = ("hardlink", "skip", "rename")
+#Incomplete copies are written to a hidden ".<name>.filemover-tmp" file and renamed when they are complete, so an
+#interrupted run never leaves a half-copied file with the final name. The suffix is only used by this tool, so
+#cleaning up never touches the user's own files (e.g. ".part" downloads)
+PART_SUFFIX = ".filemover-tmp"
+
+#Hashes already computed, valid while the file keeps its inode, size and mtime (a rename on the same disk keeps them)
+class HashCache:
+    def __init__(self, cache_path=HASH_CACHE_FILE):
+        self.path = cache_path
+        self.entries = {}
+        self.changed = False
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                print (f"Error: the hash cache '{cache_path}' could not be read, starting a new one")
+
+    def get(self, stat, kind):
+        entry = self.entries.get(f"{stat.st_dev}:{stat.st_ino}")
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry.get(kind)
+        return None
+
+    def put(self, stat, kind, value):
+        key = f"{stat.st_dev}:{stat.st_ino}"
+        entry = self.entries.get(key)
+        if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            self.entries[key] = entry
+        entry[kind] = value
+        self.changed = True
+
+    #Written to a temporary file and renamed, so a crash never leaves a half-written cache
+    def save(self):
+        if not self.path or not self.changed:
+            return
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file)
+        os.replace(temporary, self.path)
+        self.changed = False
+
+#Hash of the first and last PARTIAL_BLOCK bytes (the whole file if it is smaller than two blocks)
+def partial_hash(path, size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        digest.update(file.read(PARTIAL_BLOCK))
+        if size > 2 * PARTIAL_BLOCK:
+            file.seek(size - PARTIAL_BLOCK)
+        digest.update(file.read(PARTIAL_BLOCK))
+    return digest.hexdigest()
+
+def full_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+#Keep only the groups with more than one file and at least one file being moved
+def useful_groups(groups):
+    return [group for group in groups.values() if len(group) > 1 and any(index is not None for _, _, index in group)]
+
+#Hash the files of every group with hash_function (through the cache) and split the groups by the result
+def split_groups(groups, kind, hash_function, cache, workers):
+    pending = {}
+    values = {}
+    for group in groups:
+        for path, stat, _ in group:
+            value = cache.get(stat, kind) if cache else None
+            if value:
+                values[path] = value
+            else:
+                pending[path] = stat
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(hash_function, path, stat): path for path, stat in pending.items()}
+            for future, path in futures.items():
+                try:
+                    values[path] = future.result()
+                except OSError as e:
+                    print (f"Error reading '{path}': {e}")
+                    continue
+                if cache:
+                    cache.put(pending[path], kind, values[path])
+
+    result = {}
+    for group in groups:
+        for member in group:
+            if member[0] in values:
+                result.setdefault((kind, values[member[0]]), []).append(member)
+    return useful_groups(result)
+
+#Find the moves whose file already exists (same content) in a destination folder or earlier in the batch.
+#Returns {index of the move: (path, index)} of the copy it duplicates: a file already in a destination folder
+#(path, None) if there is one, or else the first move of the batch (None, its index), whose final destination is only
+#known once the collisions are resolved
+def find_duplicates(moves, cache=None, workers=8):
+    files = []
+    for index, (origin, _) in enumerate(moves):
+        try:
+            stat = os.lstat(origin)
+        except FileNotFoundError:
+            continue
+        if S_ISREG(stat.st_mode) and stat.st_size:
+            files.append((origin, stat, index))
+
+    for folder in {os.path.dirname(destination) for _, destination in moves}:
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and not is_partial_copy(entry.name):
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_size:
+                        files.append((entry.path, stat, None))
+
+    by_size = {}
+    for member in files:
+        by_size.setdefault(member[1].st_size, []).append(member)
+    groups = useful_groups(by_size)
+    if not groups:
+        return {}
+
+    groups = split_groups(groups, "partial", lambda path, stat: partial_hash(path, stat.st_size), cache, workers)
+    #Files of up to two blocks were read whole by the partial hash: their partial hash is their content
+    large = [group for group in groups if group[0][1].st_size > 2 * PARTIAL_BLOCK]
+    small = [group for group in groups if group[0][1].st_size <= 2 * PARTIAL_BLOCK]
+    groups = small + split_groups(large, "sha256", lambda path, stat: full_hash(path), cache, workers)
+
+    duplicates = {}
+    for group in groups:
+        #Files already in a destination folder first, then the files of the batch in order
+        group.sort(key=lambda member: -1 if member[2] is None else member[2])
+        keeper_path, _, keeper_index = group[0]
+        for _, _, index in group[1:]:
+            duplicates[index] = (keeper_path if keeper_index is None else None, keeper_index)
+    return duplicates
+
+#Temporary path of an incomplete copy: ".<name>.filemover-tmp" next to the destination
+def partial_path(destination):
+    folder, file_name = os.path.split(destination)
+    return os.path.join(folder, f".{file_name}{PART_SUFFIX}")
+
+#True if a file name is the temporary copy of partial_path()
+def is_partial_copy(file_name):
+    return file_name.startswith(".") and file_name.endswith(PART_SUFFIX)
+
+#"name (1).ext", "name (2).ext"... for a destination that exists or is already used by another move of the batch
+def unique_destination(destination, taken):
+    if destination not in taken and not os.path.lexists(destination):
+        return destination
+    root, extension = os.path.splitext(destination)
+    cont = 1
+    while True:
+        candidate = f"{root} ({cont}){extension}"
+        if candidate not in taken and not os.path.lexists(candidate):
+            return candidate
+        cont = cont + 1
+
+#Give every move a destination that does not overwrite anything
+def resolve_collisions(moves):
+    taken = set()
+    resolved = []
+    for origin, destination in moves:
+        destination = unique_destination(destination, taken)
+        taken.add(destination)
+        resolved.append((origin, destination))
+    return resolved
+
+#Apply the duplicate policy to a batch of moves:
+# - hardlink: the duplicate is moved as a hard link to the kept copy, so its data is stored once
+# - skip: the duplicate is not moved (it stays in the source folder)
+# - rename: the duplicate is moved anyway, under a name that does not overwrite the kept copy
+#Returns (moves, links) where links is {index of the move: path to link}
+def dedupe_moves(moves, policy, cache=None, workers=8):
+    duplicates = find_duplicates(moves, cache, workers)
+    if duplicates:
+        size = sum(os.lstat(moves[index][0]).st_size for index in duplicates)
+        action = {"hardlink": "hardlinked", "skip": "skipped", "rename": "moved with a new name"}[policy]
+        print (f"{len(duplicates)} duplicate files ({size / (1024*1024):.2f} MB) {action}")
+
+    if policy == "skip":
+        moves = [move for index, move in enumerate(moves) if index not in duplicates]
+        return resolve_collisions(moves), {}
+
+    moves = resolve_collisions(moves)
+    if policy == "hardlink":
+        #A kept file of the batch is found at its destination once its move is done, and that destination may have
+        #been renamed by resolve_collisions: take it from the resolved moves
+        links = {}
+        for index, (keeper_path, keeper_index) in duplicates.items():
+            links[index] = keeper_path if keeper_index is None else moves[keeper_index][1]
+        return moves, links
+    return moves, {}
+
+#Do the moves, making the ones in links as hard links to the kept copy (after the normal moves, because the kept copy
+#may be part of the same batch). A link that cannot be made (e.g. another disk) becomes a normal move.
+#run_moves(pairs) moves a list of pairs and returns the indexes that failed. Returns the indexes of the moves that failed
+def move_with_links(moves, links, run_moves):
+    normal = [index for index in range(len(moves)) if index not in links]
+    failed = [normal[position] for position in run_moves([moves[index] for index in normal])]
+
+    fallback = []
+    for index, keeper in links.items():
+        origin, destination = moves[index]
+        try:
+            os.link(keeper, destination)
+        except OSError:
+            fallback.append(index)
+            continue
+        os.remove(origin)
+    if fallback:
+        failed.extend(fallback[position] for position in run_moves([moves[index] for index in fallback]))
+    return sorted(failed)
@@ -0,0 +1,189 @@
+#Journal of moves: every batch of moves is written to an append-only JSON Lines file before any file is touched
+#("plan", with one fsync per batch), and marked as finished when the batch ends ("commit"). If the process dies in the
+#middle, the next run only has to look at the batches that were never committed, and a finished batch can be undone.
+#
+#   {"op": "plan", "batch": 3, "time": "2025-09-17 14:30:22", "moves": [["Files/a.txt", "2025-09-17_Files/a.txt"], ...]}
+#   {"op": "commit", "batch": 3, "moved": 41, "failed": [7]}
+#
+#The moves of a batch that are made as hard links to a kept copy (--dedupe hardlink) are listed in a "link" record, and
+#the moves of an undo that must copy the file back instead of moving the link in a "copy" record:
+#
+#   {"op": "link", "batch": 3, "moves": [12, 30]}
+#   {"op": "copy", "batch": 4, "moves": [5, 9]}
+
+import os
+import json
+import shutil
+from datetime import datetime
+
+from dedupe import partial_path
+
+JOURNAL_FILE = "file_mover_journal.jsonl"
+
+class Journal:
+    def __init__(self, journal_path=JOURNAL_FILE):
+        self.path = journal_path
+        self.torn = False
+        self.batches = self.load()
+        self.next_batch = max(self.batches, default=0) + 1
+        self.file = None
+
+    #Read the batches of the journal: {batch: {"moves", "committed", "undoes", "time", "links", "copies"}}.
+    #A line cut by a crash while it was being written is ignored (its moves never started)
+    def load(self):
+        batches = {}
+        if not os.path.exists(self.path):
+            return batches
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                #The last line has no newline when the process died while writing it
+                self.torn = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record["op"] == "plan":
+                    batches[record["batch"]] = {"moves": record["moves"], "committed": False,
+                                                "undoes": record.get("undoes"), "time": record.get("time"),
+                                                "links": set(), "copies": set()}
+                elif record["op"] == "commit" and record["batch"] in batches:
+                    batches[record["batch"]]["committed"] = True
+                elif record["op"] in ("link", "copy") and record["batch"] in batches:
+                    batches[record["batch"]]["links" if record["op"] == "link" else "copies"].update(record["moves"])
+        return batches
+
+    def write(self, record, sync=False):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+            if self.torn:
+                self.file.write("\n")
+                self.torn = False
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    #Save the plan of a batch (and its link or copy moves) before moving anything. This is the only fsync of the batch:
+    #if the commit is lost, the next run finds every move already done and just commits it again
+    def begin(self, moves, undoes=None, links=(), copies=()):
+        batch = self.next_batch
+        self.next_batch = self.next_batch + 1
+        record = {"op": "plan", "batch": batch, "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "moves": moves}
+        if undoes is not None:
+            record["undoes"] = undoes
+        self.write(record, sync=not links and not copies)
+        if links:
+            self.write({"op": "link", "batch": batch, "moves": sorted(links)}, sync=not copies)
+        if copies:
+            self.write({"op": "copy", "batch": batch, "moves": sorted(copies)}, sync=True)
+        self.batches[batch] = {"moves": moves, "committed": False, "undoes": undoes, "time": record["time"],
+                               "links": set(links), "copies": set(copies)}
+        return batch
+
+    def commit(self, batch, moved, failed=()):
+        self.write({"op": "commit", "batch": batch, "moved": moved, "failed": list(failed)})
+        self.batches[batch]["committed"] = True
+
+    def pending(self):
+        return [batch for batch, data in self.batches.items() if not data["committed"]]
+
+    #Newest committed batch that is not an undo and was not undone yet
+    def last_undoable(self):
+        undone = {data["undoes"] for data in self.batches.values() if data["undoes"] is not None}
+        for batch in sorted(self.batches, reverse=True):
+            data = self.batches[batch]
+            if data["committed"] and data["undoes"] is None and batch not in undone:
+                return batch
+        return None
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+#Do the moves as a new batch of the journal. run_moves(pairs) does the moving and returns the indexes of the pairs that failed.
+#links are the indexes of the moves made as hard links, copies the ones that copy_back does
+def run_journaled(journal, moves, run_moves, undoes=None, links=(), copies=()):
+    if not moves:
+        return 0
+    batch = journal.begin([list(move) for move in moves], undoes, links, copies)
+    failed = run_moves(moves)
+    journal.commit(batch, len(moves) - len(failed), failed)
+    return len(moves) - len(failed)
+
+#Move back files that were moved as hard links: the original gets a copy of its own (moving the link back would leave
+#it sharing its data with the kept copy, so editing one would change the other) and the link is removed.
+#Returns the indexes of the moves that failed
+def copy_back(moves):
+    failed = []
+    for index, (link, original) in enumerate(moves):
+        try:
+            partial = partial_path(original)
+            shutil.copy2(link, partial)
+            os.replace(partial, original)
+            os.remove(link)
+        except OSError as e:
+            print (f"Error copying back '{link}': {e}")
+            failed.append(index)
+            if os.path.exists(partial):
+                os.remove(partial)
+    return failed
+
+#Do a list of moves with run_moves, except the indexes in copies, done with copy_back. Returns the indexes that failed
+def run_with_copies(moves, copies, run_moves):
+    normal = [index for index in range(len(moves)) if index not in copies]
+    copied = [index for index in range(len(moves)) if index in copies]
+    failed = [normal[position] for position in run_moves([moves[index] for index in normal])] if normal else []
+    if copied:
+        failed.extend(copied[position] for position in copy_back([moves[index] for index in copied]))
+    return sorted(failed)
+
+#Finish the batches that were interrupted. Only their remaining moves are done: a move whose origin no longer exists
+#already happened. Returns the number of files moved
+def replay(journal, run_moves):
+    cont = 0
+    for batch in journal.pending():
+        moves = journal.batches[batch]["moves"]
+        copies = journal.batches[batch]["copies"]
+        remaining = [index for index, (origin, _) in enumerate(moves) if os.path.lexists(origin)]
+        remaining_copies = {position for position, index in enumerate(remaining) if index in copies}
+        remaining = [tuple(moves[index]) for index in remaining]
+        failed = run_with_copies(remaining, remaining_copies, run_moves) if remaining else []
+        journal.commit(batch, len(remaining) - len(failed), failed)
+        print (f"Resuming batch {batch}: {len(moves) - len(remaining)} of {len(moves)} files were already moved, {len(remaining) - len(failed)} moved now")
+        cont = cont + len(remaining) - len(failed)
+    return cont
+
+#Move back every file of a batch (the last one by default) as a new journaled batch, so an interrupted undo is
+#finished by replay too. Files that are no longer in their destination, or whose original name is taken again, are left alone.
+#Files that were moved as hard links are copied back (see copy_back)
+def undo(journal, run_moves, batch=None):
+    if batch is None:
+        batch = journal.last_undoable()
+    if batch is None or batch not in journal.batches:
+        print ("Error: there is no batch to undo")
+        return 0
+    if not journal.batches[batch]["committed"]:
+        print (f"Error: batch {batch} was not finished, run the mover again to resume it first")
+        return 0
+
+    moves = journal.batches[batch]["moves"]
+    links = journal.batches[batch]["links"]
+    reverse, copies = [], set()
+    for index, (origin, destination) in enumerate(moves):
+        if os.path.lexists(destination) and not os.path.lexists(origin):
+            if index in links:
+                copies.add(len(reverse))
+            reverse.append((destination, origin))
+    cont = run_journaled(journal, reverse, lambda pairs: run_with_copies(pairs, copies, run_moves), undoes=batch,
+                         copies=copies)
+
+    #Remove the destination folders that the batch left empty
+    for folder in {os.path.dirname(destination) for _, destination in moves}:
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
+
+    print (f"Batch {batch} ({journal.batches[batch]['time']}) undone: {cont} of {len(moves)} files moved back")
+    return cont
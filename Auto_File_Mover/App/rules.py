@@ -0,0 +1,199 @@
+#Rule engine: a JSON file describes where every file goes, and it is compiled once into a matcher that routes each
+#file in a single pass. Example rules file:
+#
+#   {
+#       "default": "{date}_Files",
+#       "rules": [
+#           {"name": "images", "destination": "Images/{date}", "extensions": [".jpg", ".png"]},
+#           {"name": "reports", "destination": "Reports", "glob": "report_*.pdf"},
+#           {"name": "invoices", "destination": "Invoices", "regex": "^INV-\\d+"},
+#           {"name": "big files", "destination": "Big", "min_size": 104857600},
+#           {"name": "old files", "destination": "Archive", "min_age_days": 30}
+#       ]
+#   }
+#
+#Rules are checked in order and the first one whose conditions all match wins. Files that match no rule go to
+#"default" (or stay where they are if it is null). "{date}" is replaced with today's date.
+
+import os
+import re
+import json
+import time
+import fnmatch
+from datetime import datetime
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+#Conditions that need the size or the dates of the file (one stat per file, cached by os.scandir entries)
+STAT_CONDITIONS = ("min_size", "max_size", "min_age_days", "max_age_days")
+
+class Rule:
+    def __init__(self, index, data):
+        if "destination" not in data:
+            raise ValueError(f"Rule {index + 1} has no destination")
+        self.index = index
+        self.name = data.get("name") or f"rule {index + 1}"
+        self.destination = data["destination"]
+        self.extensions = {extension.lower() if extension.startswith(".") else "." + extension.lower()
+                           for extension in data.get("extensions", [])}
+        self.min_size = data.get("min_size")
+        self.max_size = data.get("max_size")
+        self.min_age = data["min_age_days"] * SECONDS_PER_DAY if data.get("min_age_days") is not None else None
+        self.max_age = data["max_age_days"] * SECONDS_PER_DAY if data.get("max_age_days") is not None else None
+        self.needs_stat = any(data.get(condition) is not None for condition in STAT_CONDITIONS)
+
+        #The glob and the regex are joined into one pattern with lookaheads: glob matches the whole name, regex searches it
+        parts = []
+        if data.get("glob"):
+            parts.append(f"(?={fnmatch.translate(data['glob'])})")
+        if data.get("regex"):
+            re.compile(data["regex"])
+            parts.append(f"(?=.*?(?:{data['regex']}))")
+        self.pattern_source = "".join(parts) or None
+        self.pattern = re.compile(self.pattern_source, re.DOTALL) if self.pattern_source else None
+
+    #Size and age conditions. stat is only called when a rule needs it
+    def stat_matches(self, entry, now):
+        if not self.needs_stat:
+            return True
+        stat = entry.stat()
+        if self.min_size is not None and stat.st_size < self.min_size:
+            return False
+        if self.max_size is not None and stat.st_size > self.max_size:
+            return False
+        age = now - stat.st_mtime
+        if self.min_age is not None and age < self.min_age:
+            return False
+        if self.max_age is not None and age > self.max_age:
+            return False
+        return True
+
+#Object with the same interface as an os.scandir entry, for files known only by their name (watch mode)
+class PathEntry:
+    def __init__(self, folder, name):
+        self.name = name
+        self.path = os.path.join(folder, name)
+        self._stat = None
+
+    def is_file(self):
+        return os.path.isfile(self.path)
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+#The compiled rules. Rules with extensions are found with one dictionary lookup, rules with a glob or regex with
+#one match of a single alternation of all their patterns, and only the rules left (size/age only) are tried one by one
+class RuleSet:
+    def __init__(self, rules, default=None):
+        self.rules = [Rule(index, data) for index, data in enumerate(rules)]
+        self.default = default
+
+        self.by_extension = {}
+        pattern_rules = []
+        self.generic_rules = []
+        for rule in self.rules:
+            if rule.extensions:
+                for extension in rule.extensions:
+                    self.by_extension.setdefault(extension, []).append(rule)
+            elif rule.pattern:
+                pattern_rules.append(rule)
+            else:
+                self.generic_rules.append(rule)
+
+        self.pattern_rules = pattern_rules
+        self.combined = None
+        if pattern_rules:
+            try:
+                self.combined = re.compile("|".join(f"(?P<r{rule.index}>{rule.pattern_source})" for rule in pattern_rules), re.DOTALL)
+            except re.error:
+                #Some regexes cannot be joined (numbered backreferences, repeated group names...): match them one by one
+                self.combined = None
+
+    @classmethod
+    def from_file(cls, rules_path):
+        with open(rules_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data.get("rules", []), data.get("default"))
+
+    #Return the first rule that matches the entry (an os.scandir entry), or None
+    def route(self, entry, now=None):
+        now = now or time.time()
+        name = entry.name
+        best = None
+
+        for rule in self.by_extension.get(os.path.splitext(name)[1].lower(), ()):
+            if (not rule.pattern or rule.pattern.match(name)) and rule.stat_matches(entry, now):
+                best = rule
+                break
+
+        if self.pattern_rules:
+            first = 0
+            if self.combined:
+                match = self.combined.match(name)
+                if not match:
+                    first = len(self.pattern_rules)
+                else:
+                    index = int(match.lastgroup[1:])
+                    first = next(position for position, rule in enumerate(self.pattern_rules) if rule.index == index)
+            for rule in self.pattern_rules[first:]:
+                if best and rule.index > best.index:
+                    break
+                if rule.pattern.match(name) and rule.stat_matches(entry, now):
+                    best = rule
+                    break
+
+        for rule in self.generic_rules:
+            if best and rule.index > best.index:
+                break
+            if rule.stat_matches(entry, now):
+                best = rule
+                break
+
+        return best
+
+    #Route every file of the folder with one os.scandir pass. Returns (plan, stats) where plan maps every destination
+    #folder to its file names and stats has the number of files, bytes and routing time of every rule.
+    #Sizes are only read for the rules that need them, unless measure is set (dry run)
+    def plan(self, main_folder, names=None, measure=False):
+        today = datetime.now().strftime("%Y-%m-%d")
+        now = time.time()
+        plan = {}
+        stats = {}
+
+        if names is None:
+            entries = os.scandir(main_folder)
+        else:
+            entries = [PathEntry(main_folder, name) for name in names]
+
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            started = time.perf_counter()
+            rule = self.route(entry, now)
+            elapsed = time.perf_counter() - started
+
+            destination = rule.destination if rule else self.default
+            label = rule.name if rule else ("(default)" if self.default else "(no match)")
+            rule_stats = stats.setdefault(label, {"files": 0, "bytes": 0, "seconds": 0.0})
+            rule_stats["files"] = rule_stats["files"] + 1
+            rule_stats["seconds"] = rule_stats["seconds"] + elapsed
+            if measure or (rule and rule.needs_stat):
+                rule_stats["bytes"] = rule_stats["bytes"] + entry.stat().st_size
+
+            if destination:
+                plan.setdefault(destination.replace("{date}", today), []).append(entry.name)
+
+        if names is None:
+            entries.close()
+        return plan, stats
+
+def print_plan(plan, stats, elapsed):
+    total_files = sum(rule_stats["files"] for rule_stats in stats.values())
+    print (f"\n=== ROUTING ({total_files} files in {elapsed * 1000:.1f} ms, {total_files / max(elapsed, 1e-9):.0f} files/s) ===")
+    for label, rule_stats in stats.items():
+        size = f", {rule_stats['bytes'] / (1024*1024):.2f} MB" if rule_stats["bytes"] else ""
+        print (f"{label}: {rule_stats['files']} files{size}, {rule_stats['seconds'] * 1000:.2f} ms")
+    for destination, file_names in plan.items():
+        print (f"-> {destination}: {len(file_names)} files")
@@ -0,0 +1,188 @@
+#Watch mode: instead of sweeping the folder every minute from cron, the process waits for the kernel to report new files
+#(inotify on Linux) and moves them as soon as they stop changing. Where inotify does not exist (macOS, Windows) the
+#folder is polled with os.scandir instead.
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from stat import S_ISREG
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+#Minimal inotify wrapper with ctypes, so watch mode does not need any external library
+class Inotify:
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available on this system")
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"Unable to watch '{folder}'")
+
+    #Wait up to timeout seconds (forever with None) and return a list of (mask, name) events
+    def read_events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        events = []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset = offset + EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset = offset + length
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+#(size, mtime) of every file in the folder, used by the polling fallback and to check that a file stopped changing
+def scan_files(folder):
+    files = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                continue
+    return files
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+#Keeps the files that are still being written. A file is ready when nothing happened to it for settle seconds
+#and its size and mtime did not change in the meantime
+class Debouncer:
+    def __init__(self, folder, settle):
+        self.folder = folder
+        self.settle = settle
+        self.pending = {}
+
+    #signature is the (size, mtime) of the file if the caller already knows it, so it can be ready after a single settle period
+    def touch(self, name, now, signature=None):
+        self.pending[name] = (now, signature)
+
+    def forget(self, name):
+        self.pending.pop(name, None)
+
+    #Seconds until the next file may be ready (None if there is nothing pending, so the caller can sleep until an event)
+    def next_timeout(self, now):
+        if not self.pending:
+            return None
+        return max(0.0, min(changed for changed, _ in self.pending.values()) + self.settle - now)
+
+    def ready(self, now):
+        ready = []
+        for name, (changed, signature) in list(self.pending.items()):
+            if now - changed < self.settle:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                self.forget(name)
+                continue
+            if not S_ISREG(stat.st_mode):
+                self.forget(name)
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if signature == current:
+                ready.append(name)
+                self.forget(name)
+            else:
+                #First check, or it changed without an event: wait one more settle period
+                self.pending[name] = (now, current)
+        return ready
+
+#Watch folder and call move(file_names) with batches of files that finished arriving. Files that are already in the
+#folder when the watch starts are handled too. batch_window gives files arriving together the chance to be moved
+#in the same batch. Stop it with Ctrl+C
+def watch_folder(folder, move, settle=2.0, poll_interval=2.0, batch_window=0.5, use_inotify=True):
+    debouncer = Debouncer(folder, settle)
+    now = time.monotonic()
+    for name, signature in scan_files(folder).items():
+        debouncer.touch(name, now, signature)
+
+    inotify = None
+    if use_inotify:
+        try:
+            inotify = Inotify(folder)
+            print (f"Watching '{folder}' with inotify (press Ctrl+C to stop)")
+        except OSError as e:
+            print (f"inotify is not available ({e}), polling every {poll_interval} s instead")
+    if not inotify:
+        print (f"Watching '{folder}' by polling every {poll_interval} s (press Ctrl+C to stop)")
+        known = scan_files(folder)
+
+    try:
+        while True:
+            now = time.monotonic()
+            timeout = debouncer.next_timeout(now)
+
+            if inotify:
+                for mask, name in inotify.read_events(timeout):
+                    if mask & IN_Q_OVERFLOW:
+                        #Too many events were lost: look at the whole folder once
+                        for file_name, signature in scan_files(folder).items():
+                            debouncer.touch(file_name, time.monotonic(), signature)
+                    elif mask & (IN_MOVED_FROM | IN_DELETE):
+                        debouncer.forget(name)
+                    elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and name:
+                        #The writer closed the file (or it was moved in complete): remember how it looks now
+                        debouncer.touch(name, time.monotonic(), file_signature(os.path.join(folder, name)))
+                    elif name:
+                        debouncer.touch(name, time.monotonic())
+            else:
+                time.sleep(poll_interval if timeout is None else min(poll_interval, timeout))
+                current = scan_files(folder)
+                for name, signature in current.items():
+                    if known.get(name) != signature:
+                        debouncer.touch(name, time.monotonic(), signature)
+                for name in known.keys() - current.keys():
+                    debouncer.forget(name)
+                known = current
+
+            ready = debouncer.ready(time.monotonic())
+            if ready:
+                #Let files that arrive together end up in the same batch
+                time.sleep(batch_window)
+                ready.extend(debouncer.ready(time.monotonic()))
+                move(ready)
+                if not inotify:
+                    known = scan_files(folder)
+    except KeyboardInterrupt:
+        print ("\nWatch stopped.")
+    finally:
+        if inotify:
+            inotify.close()
@@ -0,0 +1,123 @@
+#Tests of the duplicate handling of a batch of moves (dedupe.py). Run from the Auto_File_Mover folder with:
+#   python -m unittest discover tests
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "App"))
+
+from app import execute_moves, run_moves
+from journal import Journal, undo
+
+
+def write(path, content):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+class HardlinkDedupeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.source = os.path.join(self.folder, "src")
+        self.destination = os.path.join(self.folder, "dst")
+        os.makedirs(self.source)
+        os.makedirs(self.destination)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def moves(self, *names):
+        return [(os.path.join(self.source, name), os.path.join(self.destination, name)) for name in names]
+
+    #The kept copy is renamed because its name is taken in the destination by an unrelated file: its duplicates must
+    #be linked to the renamed copy, never to the unrelated file
+    def test_keeper_renamed_by_collision(self):
+        write(os.path.join(self.destination, "a.txt"), "OLD-EXISTING")
+        write(os.path.join(self.source, "a.txt"), "NEWCONTENT")
+        write(os.path.join(self.source, "b.txt"), "NEWCONTENT")
+
+        moved = execute_moves(self.moves("a.txt", "b.txt"), workers=1, dedupe="hardlink")
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(read(os.path.join(self.destination, "a.txt")), "OLD-EXISTING")
+        self.assertEqual(read(os.path.join(self.destination, "a (1).txt")), "NEWCONTENT")
+        self.assertEqual(read(os.path.join(self.destination, "b.txt")), "NEWCONTENT")
+        self.assertTrue(os.path.samefile(os.path.join(self.destination, "a (1).txt"),
+                                         os.path.join(self.destination, "b.txt")))
+        self.assertEqual(os.listdir(self.source), [])
+
+    #A file whose content is already in the destination is linked to that file
+    def test_duplicate_of_existing_file(self):
+        write(os.path.join(self.destination, "old.txt"), "SAME")
+        write(os.path.join(self.source, "new.txt"), "SAME")
+
+        execute_moves(self.moves("new.txt"), workers=1, dedupe="hardlink")
+
+        self.assertTrue(os.path.samefile(os.path.join(self.destination, "old.txt"),
+                                         os.path.join(self.destination, "new.txt")))
+
+    #Undoing a batch gives every restored file its own data: the files that were moved as hard links are copied back
+    def test_undo_restores_independent_files(self):
+        write(os.path.join(self.source, "a.txt"), "SAME")
+        write(os.path.join(self.source, "b.txt"), "SAME")
+        journal = Journal(os.path.join(self.folder, "journal.jsonl"))
+
+        execute_moves(self.moves("a.txt", "b.txt"), workers=1, journal=journal, dedupe="hardlink")
+        self.assertTrue(os.path.samefile(os.path.join(self.destination, "a.txt"),
+                                         os.path.join(self.destination, "b.txt")))
+        self.assertEqual(undo(journal, run_moves), 2)
+        journal.close()
+
+        self.assertFalse(os.path.exists(self.destination))
+        self.assertFalse(os.path.samefile(os.path.join(self.source, "a.txt"), os.path.join(self.source, "b.txt")))
+        write(os.path.join(self.source, "a.txt"), "EDITED")
+        self.assertEqual(read(os.path.join(self.source, "b.txt")), "SAME")
+        #The link record is read back from the journal file too
+        self.assertEqual(Journal(journal.path).batches[1]["links"], {1})
+
+
+#A second filesystem for moves across devices (tmpfs on Linux), or None
+def other_device_folder(folder):
+    if os.path.isdir("/dev/shm") and os.stat("/dev/shm").st_dev != os.stat(folder).st_dev:
+        return tempfile.mkdtemp(dir="/dev/shm")
+    return None
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.destination = tempfile.mkdtemp()
+        self.source = other_device_folder(self.destination)
+        if not self.source:
+            shutil.rmtree(self.destination)
+            self.skipTest("needs two filesystems")
+
+    def tearDown(self):
+        shutil.rmtree(self.source)
+        shutil.rmtree(self.destination)
+
+    #A move across devices interrupted after its copy was complete only deletes the original on the next run,
+    #with every duplicate policy, instead of copying it again under a new name
+    def test_complete_copy_is_not_a_collision(self):
+        for dedupe in (None, "hardlink", "skip", "rename"):
+            origin = os.path.join(self.source, "a.txt")
+            destination = os.path.join(self.destination, "a.txt")
+            write(origin, "DATA")
+            shutil.copy2(origin, destination)
+
+            moved = execute_moves([(origin, destination)], workers=1, dedupe=dedupe)
+
+            self.assertEqual(moved, 1)
+            self.assertEqual(os.listdir(self.source), [])
+            self.assertEqual(os.listdir(self.destination), ["a.txt"])
+            os.remove(destination)
+
+
+if __name__ == "__main__":
+    unittest.main()
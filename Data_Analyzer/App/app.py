@@ -1,18 +1,43 @@
 import os
-import csv
 import statistics
 import matplotlib.pyplot as plt
 
-def load_data_csv(file_path):
+from columnar import RowsView
+from parallel_csv import load_table_parallel
+from stats import column_statistics, profile
+from streaming import stream_statistics
+from cache import load_cached, save_cache
+from query import as_expression, filter_table
+from charts import group_averages, draw_chart, FIGURE_SIZE
+from profiling import build_report, write_report
+
+# Files larger than this are analyzed in streaming mode instead of being loaded
+STREAMING_THRESHOLD = 1024 * 1024 * 1024
+
+def load_data_csv(file_path, use_cache=True, where=None):
     """
     Load data from a CSV file.
 
+    The file is loaded by columns (see columnar.py): numbers are stored in
+    NumPy arrays and text as dictionary-encoded categories. Files of 32 MB or
+    more are parsed in parallel by a pool of processes. The typed columns
+    are cached next to the file (see cache.py), so the next loads of the same
+    unchanged file only memory-map them.
+
+    With a filter (see query.py) only the matching rows are kept. On a cached
+    file the filter reads its own columns from the memory-mapped cache and
+    the other columns are only read for the rows that match.
+
     Args:
         file_path (str): Path to the CSV file.
+        use_cache (bool, optional): Read and write the binary cache. Defaults to True.
+        where (str or Expression, optional): Filter of the rows, e.g.
+            '`Workout Type` == "Yoga" and Age > 30'. Defaults to None.
     
     Returns:
         tuple: (headers, data) where headers is a list of column names 
-               and data is a list of dictionaries containing the rows.
+               and data is a RowsView, a list-like of row dictionaries
+               built from the columns (data.table has the columns).
     """
 
     try:
@@ -21,42 +46,79 @@ def load_data_csv(file_path):
             print(f"Error: The file {file_path} does not exist.")
             return None, None  # Tuple
 
-        # Initialize containers
-        headers = []
-        data = []
-
-        # Open and read the CSV file
-        with open(file_path, 'r', newline='', encoding='utf-8') as file_csv:
-            reader = csv.reader(file_csv)
-
-            # First row is the header
-            headers = next(reader)
-
-            # Process rows
-            for row in reader:
-                # Create a dictionary only if row length matches headers
-                if len(row) == len(headers):
-                    row_dict = {}
-                    for i, value in enumerate(row):
-                        try:
-                            # Try converting to int
-                            row_dict[headers[i]] = int(value)
-                        except ValueError:
-                            try:
-                                # If not int, try converting to float
-                                row_dict[headers[i]] = float(value)
-                            except ValueError:
-                                # Otherwise, keep as string
-                                row_dict[headers[i]] = value
-                    data.append(row_dict)
-
-            print(f"{len(data)} rows loaded with {len(headers)} columns.")
-            return headers, data
+        where = as_expression(where)
+        table = load_cached(file_path) if use_cache else None
+        if table is not None:
+            table = filter_table(table, where)
+            print(f"{table.rows} rows loaded with {len(table.headers)} columns (from cache).")
+            return table.headers, RowsView(table)
+
+        # Large files are parsed by all the cores (see parallel_csv.py)
+        table = load_table_parallel(file_path)
+        if use_cache:
+            # The cache keeps every row, so other filters can be applied later
+            save_cache(file_path, table)
+        table = filter_table(table, where)
+
+        print(f"{table.rows} rows loaded with {len(table.headers)} columns.")
+        return table.headers, RowsView(table)
 
     except Exception as e:
         print(f"Error loading CSV file: {e}")
         return None, None  # Tuple
 
+def analyze_csv_streaming(file_path, columns=None, where=None):
+    """
+    Analyze the numeric columns of a CSV file in a single pass without
+    loading it, so files larger than memory can be analyzed.
+
+    Median and percentiles are estimates (t-digest); the rest is exact.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        columns (list, optional): Columns to analyze. Defaults to all of them.
+        where (str or Expression, optional): Filter of the rows, evaluated
+            chunk by chunk before the other cells are parsed.
+
+    Returns:
+        list: Statistics dictionaries, as returned by analyze_numerical_column.
+    """
+
+    try:
+        rows, statistics = stream_statistics(file_path, columns, where=as_expression(where))
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        return []
+
+    print(f"{rows} rows analyzed in streaming mode{' (filtered)' if where else ''}.")
+    for statistic in statistics:
+        display_statistic(statistic)
+    return statistics
+
+def filter_data(data, where):
+    """
+    Keep the rows of a dataset that match a filter.
+
+    Example:
+        filter_data(data, '`Workout Type` == "Yoga" and Age > 30')
+        filter_data(data, (col("Workout Type") == "Yoga") & (col("Age") > 30))
+
+    Args:
+        data (RowsView): Dataset returned by load_data_csv.
+        where (str or Expression): The filter (see query.py).
+
+    Returns:
+        RowsView: The matching rows.
+
+    Raises:
+        ValueError: If the filter is not valid or the data has no columns.
+    """
+
+    table = getattr(data, "table", None)
+    if table is None:
+        raise ValueError("Filters need data loaded with load_data_csv.")
+    return RowsView(filter_table(table, where))
+
 def display_data_summary(headers, data):
     """
     Display a summary of the loaded dataset.
@@ -74,23 +136,44 @@ def display_data_summary(headers, data):
     print(f"Rows: {len(data)}")
     print(f"Columns: {', '.join(headers)}")
 
+    # Column types and memory used by the columnar loader
+    table = getattr(data, "table", None)
+    if table is not None:
+        print(f"Types: {', '.join(f'{name} ({table[name].kind})' for name in headers)}")
+        print(f"Memory: {table.nbytes() / (1024*1024):.2f} MB")
+
     # Display the first 5 rows
     print("\nFirst 5 rows:")
     for i, row in enumerate(data[:5]):
         print(f"Row {i+1}: {row}")
 
-def analyze_numerical_column(data, column):
+def analyze_numerical_column(data, column, where=None):
     """
     Perform a statistical analysis of a numerical column.
 
     Args:
         data (list): List of dictionaries containing the dataset.
         column (str): Name of the column to analyze.
+        where (str or Expression, optional): Analyze only the rows that match.
     
     Returns:
         dict: Dictionary with column statistics, or None if no numeric values are found.
     """
 
+    # Columnar data: one vectorized pass over the typed column (see stats.py),
+    # which also gives percentiles, variance, null count and a histogram
+    table = getattr(data, "table", None)
+    if table is not None and column in table:
+        # Only the filtered rows of this column are gathered
+        statistic = column_statistics(filter_table(table, where, [column]), column)
+        if not statistic:
+            print(f"No numeric values found in column '{column}'.")
+        return statistic
+
+    if where is not None:
+        print("Filters need data loaded with load_data_csv.")
+        return None
+
     # Extract values from the column, filtering only numeric values
     values = []
     for row in data:
@@ -136,7 +219,84 @@ def display_statistic(statistic):
     print (f"Median: {statistic['median']:.2f}")
     print (f"Standard deviation: {statistic['standard_deviation']:.2f}")
 
-def calculate_group_average(data, column_x, column_y):
+    # Extra statistics of the vectorized engine
+    if 'variance' in statistic:
+        print (f"Variance: {statistic['variance']:.2f}")
+        print (f"Empty values: {statistic['null_values']}")
+        print ("Percentiles: " + ", ".join(f"P{p}={value:.2f}" for p, value in statistic['percentiles'].items()))
+
+    # The streaming statistics have no histogram
+    if 'histogram' in statistic:
+        print ("Histogram:")
+        counts = statistic['histogram']['counts']
+        edges = statistic['histogram']['edges']
+        widest = max(counts) or 1
+        for i, count in enumerate(counts):
+            bar = "#" * round(30 * count / widest)
+            print (f"  [{edges[i]:>10.2f}, {edges[i + 1]:>10.2f}) {count:>8} {bar}")
+
+def display_profile(data, where=None):
+    """
+    Display the statistics of every numeric column, computed all at once.
+
+    Args:
+        data (RowsView): Dataset returned by load_data_csv.
+        where (str or Expression, optional): Profile only the rows that match.
+    """
+
+    table = getattr(data, "table", None)
+    if table is None:
+        print("The profile needs data loaded with load_data_csv.")
+        return
+
+    statistics = profile(filter_table(table, where))
+    if not statistics:
+        print("No numeric columns found.")
+        return
+
+    print ("\n=== PROFILE ===")
+    print (f"{'Column':<28}{'Count':>9}{'Empty':>7}{'Min':>11}{'Max':>11}{'Average':>11}{'Median':>11}{'Std dev':>11}")
+    for statistic in statistics:
+        print (f"{statistic['column'][:27]:<28}{statistic['total_values']:>9}{statistic['null_values']:>7}"
+               f"{statistic['minimum']:>11.2f}{statistic['maximum']:>11.2f}{statistic['average']:>11.2f}"
+               f"{statistic['median']:>11.2f}{statistic['standard_deviation']:>11.2f}")
+
+def create_report(data, output, source=None):
+    """
+    Write a profiling report of the dataset: statistics of every numeric
+    column, Pearson and Spearman correlation matrices and the most frequent
+    values of every text column (see profiling.py).
+
+    Args:
+        data (RowsView): Dataset returned by load_data_csv (or filter_data).
+        output (str): Report file, .html or .json.
+        source (str, optional): Name of the dataset shown in the report.
+
+    Returns:
+        bool: True if the report was written, False otherwise.
+    """
+
+    table = getattr(data, "table", None)
+    if table is None:
+        print("The report needs data loaded with load_data_csv.")
+        return False
+
+    try:
+        report = build_report(table, source=source)
+        write_report(report, output)
+    except (OSError, ValueError) as e:
+        print(f"Error writing the report: {e}")
+        return False
+
+    strongest = report["correlation"]["pearson_strongest"]
+    if strongest:
+        print("\nStrongest correlations (Pearson):")
+        for pair in strongest[:5]:
+            print(f"  {pair['columns'][0]} / {pair['columns'][1]}: {pair['correlation']:.3f}")
+    print(f"Report written to {output}")
+    return True
+
+def calculate_group_average(data, column_x, column_y, where=None):
     """
     Group the dataset by the values of column_x and calculate the average 
     of column_y for each group.
@@ -145,6 +305,7 @@ def calculate_group_average(data, column_x, column_y):
         data (list): List of dictionaries containing the dataset.
         column_x (str): Name of the column to group by (X-axis).
         column_y (str): Name of the column to average (Y-axis).
+        where (str or Expression, optional): Use only the rows that match.
 
     Returns:
         tuple: (values_x, averages_y), where:
@@ -152,6 +313,15 @@ def calculate_group_average(data, column_x, column_y):
             - averages_y is a list of averages of column_y for each group.
     """
 
+    # Columnar data: hash aggregation with running sums and counts (see groupby.py)
+    table = getattr(data, "table", None)
+    if table is not None and column_x in table and column_y in table:
+        # Groups without numeric Y values are left out, as before
+        return group_averages(table, column_x, column_y, where)
+
+    if where is not None:
+        raise ValueError("Filters need data loaded with load_data_csv.")
+
     # Group data by X values and collect Y values
     groups_x = {}
 
@@ -180,7 +350,7 @@ def calculate_group_average(data, column_x, column_y):
 
     return values_x, averages_y
 
-def generate_bars_graphic(data, column_x, column_y, title=None):
+def generate_bars_graphic(data, column_x, column_y, title=None, where=None, output=None):
     """
     Generate a bar chart showing the average of Y values for each X value.
 
@@ -189,36 +359,30 @@ def generate_bars_graphic(data, column_x, column_y, title=None):
         column_x (str): Name of the column for the X axis.
         column_y (str): Name of the column for the Y axis.
         title (str, optional): Title of the chart. Defaults to None.
+        where (str or Expression, optional): Chart only the rows that match.
+        output (str, optional): Save the chart to this file (PNG, SVG...) instead of displaying it.
 
     Returns:
         bool: True if the chart was generated successfully, False otherwise.
     """
 
     try:
-        values_x, averages_y = calculate_group_average(data, column_x, column_y)
+        values_x, averages_y = calculate_group_average(data, column_x, column_y, where)
         
         if len(values_x) < 2:
             print("Not enough data to generate the chart")
             return False
 
-        # Create the chart
-        plt.figure(figsize=(10, 6))
-        plt.plot(values_x, averages_y, color='darkblue')
+        # Draw on one reused figure; long series are decimated to its width (see charts.py)
+        figure = plt.figure("Data Analyzer", figsize=FIGURE_SIZE, clear=True)
+        draw_chart(figure, "bar", values_x, averages_y, column_x, column_y, title)
 
-        # Add labels and title
-        plt.xlabel(column_x)
-        plt.ylabel(f"Average of {column_y}")
-        plt.title(title or f"Average of {column_y} by {column_x}")
-
-        # Rotate X-axis labels if there are many
-        if len(values_x) > 5:
-            plt.xticks(rotation=45, ha='right')
-
-        # Adjust layout
-        plt.tight_layout()
-
-        # Display chart
-        plt.show()
+        # Save the chart to a file, or display it
+        if output:
+            figure.savefig(output)
+            print(f"Chart saved to {output}")
+        else:
+            plt.show()
 
         return True
 
@@ -226,7 +390,7 @@ def generate_bars_graphic(data, column_x, column_y, title=None):
         print(f"Error generating the chart: {e}")
         return False
 
-def generate_lines_graphic(data, column_x, column_y, title=None):
+def generate_lines_graphic(data, column_x, column_y, title=None, where=None, output=None):
     """
     Generate a line chart showing the average of Y values for each X value.
 
@@ -235,36 +399,30 @@ def generate_lines_graphic(data, column_x, column_y, title=None):
         column_x (str): Name of the column for the X axis.
         column_y (str): Name of the column for the Y axis.
         title (str, optional): Title of the chart. Defaults to None.
+        where (str or Expression, optional): Chart only the rows that match.
+        output (str, optional): Save the chart to this file (PNG, SVG...) instead of displaying it.
 
     Returns:
         bool: True if the chart was generated successfully, False otherwise.
     """
 
     try:
-        values_x, averages_y = calculate_group_average(data, column_x, column_y)
+        values_x, averages_y = calculate_group_average(data, column_x, column_y, where)
         
         if len(values_x) < 2:
             print("Not enough data to generate the chart")
             return False
         
-        # Create the chart
-        plt.figure(figsize=(10, 6))
-        plt.plot(values_x, averages_y, marker='o', linestyle='-', color='green')
-
-        # Add labels and title
-        plt.xlabel(column_x)
-        plt.ylabel(f"Average of {column_y}")
-        plt.title(title or f"Average of {column_y} by {column_x}")
-
-        # Rotate X-axis labels if there are many
-        if len(values_x) > 5:
-            plt.xticks(rotation=45, ha='right')
-
-        # Adjust layout
-        plt.tight_layout()
-
-        # Display chart
-        plt.show()
+        # Draw on one reused figure; long series are decimated to its width (see charts.py)
+        figure = plt.figure("Data Analyzer", figsize=FIGURE_SIZE, clear=True)
+        draw_chart(figure, "line", values_x, averages_y, column_x, column_y, title)
+
+        # Save the chart to a file, or display it
+        if output:
+            figure.savefig(output)
+            print(f"Chart saved to {output}")
+        else:
+            plt.show()
 
         return True
 
@@ -283,6 +441,13 @@ def main():
     # Request CSV file path
     file_path = input("Insert the CSV file path to analyze: ")
 
+    # Very large files are summarized chunk by chunk, with constant memory
+    if os.path.exists(file_path) and os.path.getsize(file_path) > STREAMING_THRESHOLD:
+        print(f"The file is larger than {STREAMING_THRESHOLD // (1024*1024)} MB: analyzing it in streaming mode.")
+        query = input("Filter rows (optional, e.g. `Workout Type` == \"Yoga\" and Age > 30): ").strip()
+        analyze_csv_streaming(file_path, where=query or None)
+        return
+
     # Load data
     headers, data = load_data_csv(file_path)
 
@@ -293,14 +458,20 @@ def main():
     # Display data summary
     display_data_summary(headers, data)
 
+    # Every row, kept to change or clear the filter
+    all_data = data
+
     while True:
         print("\nOptions:")
         print("1. Analyze numeric column")
         print("2. Generate bar chart")
         print("3. Generate line chart")
-        print("4. Exit")
+        print("4. Profile all numeric columns")
+        print("5. Filter rows")
+        print("6. Correlation and profiling report")
+        print("7. Exit")
 
-        option = input("\nSelect your option (1-4): ")
+        option = input("\nSelect your option (1-7): ")
         
         if option == "1":
             # Analyze a numeric column
@@ -370,6 +541,25 @@ def main():
                 print("Invalid option.")  
 
         elif option == "4":
+            # Statistics of every numeric column at once
+            display_profile(data)
+
+        elif option == "5":
+            # Filter the rows used by the other options
+            print('\nExamples: Age > 30 | `Workout Type` == "Yoga" and Age > 30 | Gender in ["Male", "Other"]')
+            query = input("Insert the filter (empty to use every row): ").strip()
+            try:
+                data = filter_data(all_data, query) if query else all_data
+                print(f"{len(data)} of {len(all_data)} rows selected.")
+            except ValueError as e:
+                print(f"Error: {e}")
+
+        elif option == "6":
+            # Statistics, correlations and frequencies of every column in one file
+            output = input("\nInsert the report file (.html or .json, default report.html): ").strip()
+            create_report(data, output or "report.html", os.path.basename(file_path))
+
+        elif option == "7":
             # Exit
             print("\nThank you for using Data Analyzer.")
             break
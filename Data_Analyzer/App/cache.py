@@ -0,0 +1,118 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+from columnar import Table, Column, CATEGORY
+
+CACHE_VERSION = 1
+META_FILE = "meta.json"
+# Bytes hashed at the start, middle and end of the source to detect changes
+# that keep the same size and modification time
+HASH_SAMPLE = 1024 * 1024
+
+
+def cache_folder(file_path):
+    """Folder of the cache of a CSV file: a hidden folder next to it."""
+
+    folder, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(folder, f".{name}.cache")
+
+
+def source_key(file_path):
+    """
+    Identify the current content of a CSV file without reading all of it:
+    size, modification time and a SHA-256 of three samples of the file.
+
+    Args:
+        file_path (str): Path to the CSV file.
+
+    Returns:
+        dict: {"size", "mtime_ns", "sha256"}.
+    """
+
+    stat = os.stat(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for offset in sorted({0, max(0, stat.st_size // 2 - HASH_SAMPLE // 2), max(0, stat.st_size - HASH_SAMPLE)}):
+            file.seek(offset)
+            digest.update(file.read(HASH_SAMPLE))
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def load_cached(file_path):
+    """
+    Open the cached columns of a CSV file if the cache matches the file.
+
+    The .npy files are memory-mapped: nothing is copied, pages are read on
+    first use and several processes opening the same dataset share them.
+
+    Args:
+        file_path (str): Path to the CSV file.
+
+    Returns:
+        Table: The cached data, or None if there is no valid cache.
+    """
+
+    folder = cache_folder(file_path)
+    meta_path = os.path.join(folder, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        if meta.get("version") != CACHE_VERSION or meta.get("source") != source_key(file_path):
+            return None
+
+        columns = {}
+        for entry in meta["columns"]:
+            values = np.load(os.path.join(folder, entry["file"]), mmap_mode='r')
+            columns[entry["name"]] = Column(entry["name"], entry["kind"], values, entry.get("categories"))
+        return Table(meta["headers"], columns, meta["rows"])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading the cache of {file_path}: {e}")
+        return None
+
+
+def save_cache(file_path, table):
+    """
+    Save the typed columns of a CSV file next to it: one .npy file per column
+    and a meta.json with the key of the source, the types and the category
+    labels. meta.json is written last, so a cache is never used half-written.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        table (Table): Its loaded data.
+
+    Returns:
+        bool: True if the cache was written.
+    """
+
+    folder = cache_folder(file_path)
+    try:
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+        os.makedirs(folder)
+
+        entries = []
+        for index, name in enumerate(table.headers):
+            column = table[name]
+            entry = {"name": name, "kind": column.kind, "file": f"column_{index:04d}.npy"}
+            if column.kind == CATEGORY:
+                entry["categories"] = column.categories
+            np.save(os.path.join(folder, entry["file"]), np.ascontiguousarray(column.values))
+            entries.append(entry)
+
+        meta = {"version": CACHE_VERSION, "source": source_key(file_path), "headers": table.headers,
+                "rows": table.rows, "columns": entries}
+        temporary = os.path.join(folder, META_FILE + ".tmp")
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(temporary, os.path.join(folder, META_FILE))
+        return True
+    except OSError as e:
+        print(f"Error writing the cache of {file_path}: {e}")
+        return False
@@ -0,0 +1,260 @@
+import os
+import re
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+# The Agg canvas renders to files without a display and without pyplot's global state
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from cache import load_cached, save_cache
+from columnar import load_table
+from parallel_csv import load_table_parallel
+from groupby import group_by
+from query import filter_table
+
+FIGURE_SIZE = (10, 6)
+DPI = 100
+FORMATS = ("png", "svg")
+KINDS = ("bar", "line")
+# Tick labels shown on the X axis at most
+MAX_TICKS = 30
+
+# Figure and table of every worker process, reused for all its charts
+_worker = {}
+
+
+def group_averages(table, column_x, column_y, where=None):
+    """
+    Average of column_y for every value of column_x, in key order.
+
+    Args:
+        table (Table): The data.
+        column_x (str): Column to group by.
+        column_y (str): Column to average.
+        where (str or Expression, optional): Use only the rows that match.
+
+    Returns:
+        tuple: (values_x, averages_y), groups without numeric Y values left out.
+    """
+
+    for name in (column_x, column_y):
+        if name not in table:
+            raise ValueError(f"Unknown column '{name}'")
+    table = filter_table(table, where, list(dict.fromkeys([column_x, column_y])))
+    groups = group_by(table, [column_x], [(column_y, "mean")])
+    averages = groups[f"mean({column_y})"]
+    values_x = [str(value_x) for value_x, average in zip(groups[column_x], averages) if average is not None]
+    averages_y = [average for average in averages if average is not None]
+    return values_x, averages_y
+
+
+def decimate(values, buckets):
+    """
+    Reduce a series to the minimum and maximum of every bucket of points, in
+    order. With one bucket per pixel the drawn chart looks the same (every
+    peak and valley is kept) but matplotlib gets at most 2 points per pixel.
+
+    Args:
+        values (array-like): Y values.
+        buckets (int): Number of buckets (the width of the plot in pixels).
+
+    Returns:
+        numpy.ndarray: Sorted indexes of the points to keep.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    count = len(values)
+    if count <= 2 * buckets:
+        return np.arange(count)
+
+    bucket = np.arange(count) * buckets // count
+    # Sorted by bucket, then by value: the first and last of every bucket are its minimum and maximum
+    order = np.lexsort((values, bucket))
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.concatenate((starts[1:], [count])) - 1
+    return np.unique(np.concatenate((order[starts], order[ends])))
+
+
+def draw_chart(figure, kind, values_x, averages_y, column_x, column_y, title=None):
+    """
+    Draw a bar or line chart of averages on a figure (cleared first, so the
+    same figure can be reused).
+
+    The points are drawn at positions 0..n-1, decimated to the pixel width
+    of the figure, with at most MAX_TICKS labels on the X axis.
+
+    Args:
+        figure (Figure): The figure to draw on.
+        kind (str): "bar" or "line".
+        values_x (list): Group labels.
+        averages_y (list): Average of every group.
+        column_x (str): Name of the X column.
+        column_y (str): Name of the Y column.
+        title (str, optional): Title of the chart.
+    """
+
+    figure.clear()
+    axes = figure.add_subplot()
+
+    width = int(figure.get_figwidth() * figure.dpi)
+    kept = decimate(averages_y, width)
+    heights = np.asarray(averages_y, dtype=np.float64)[kept]
+
+    if kind == "bar":
+        axes.bar(kept, heights, color='darkblue', width=0.8 if len(kept) == len(averages_y) else 1.0)
+    else:
+        axes.plot(kept, heights, marker='o' if len(kept) <= 100 else None, linestyle='-', color='green')
+
+    # Labels of a subset of the groups when there are many
+    ticks = kept[np.linspace(0, len(kept) - 1, min(len(kept), MAX_TICKS)).astype(int)] if len(kept) else kept
+    axes.set_xticks(ticks)
+    axes.set_xticklabels([values_x[index] for index in ticks.tolist()],
+                         rotation=45 if len(values_x) > 5 else 0, ha='right' if len(values_x) > 5 else 'center')
+
+    axes.set_xlabel(column_x)
+    axes.set_ylabel(f"Average of {column_y}")
+    axes.set_title(title or f"Average of {column_y} by {column_x}")
+    figure.tight_layout()
+
+
+def chart_file_name(chart, image_format):
+    """Default file name of a chart: <kind>_<y>_by_<x>.<format>."""
+
+    name = f"{chart['kind']}_{chart['y']}_by_{chart['x']}"
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") + f".{image_format}"
+
+
+def start_worker(file_path):
+    """Load the dataset (memory-mapped from the cache when possible) and create the figure of a worker."""
+
+    _worker["table"] = load_cached(file_path) or load_table(file_path)
+    figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+    FigureCanvasAgg(figure)
+    _worker["figure"] = figure
+
+
+def render_chart(chart, output_folder, image_format):
+    """
+    Render one chart to a file with the figure of the worker.
+
+    Returns:
+        tuple: (path, error) where error is None if the chart was written.
+    """
+
+    path = os.path.join(output_folder, chart.get("file") or chart_file_name(chart, image_format))
+    try:
+        values_x, averages_y = group_averages(_worker["table"], chart["x"], chart["y"], chart.get("where"))
+        if len(values_x) < 2:
+            return path, "Not enough data to generate the chart"
+        draw_chart(_worker["figure"], chart["kind"], values_x, averages_y, chart["x"], chart["y"], chart.get("title"))
+        _worker["figure"].savefig(path, format=os.path.splitext(path)[1][1:] or image_format)
+        return path, None
+    except Exception as e:
+        return path, str(e)
+
+
+def render_charts(file_path, charts, output_folder, image_format="png", workers=None):
+    """
+    Render many charts of one dataset to image files, without a display.
+
+    The charts are spread over a pool of processes. Every worker opens the
+    dataset once (from the memory-mapped cache, so the columns are shared
+    between the workers) and draws all its charts on one reused Agg figure.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        charts (list): Dictionaries with "kind" ("bar" or "line"), "x", "y"
+            and optionally "title", "where" (a filter, see query.py) and "file".
+        output_folder (str): Folder for the images (created if needed).
+        image_format (str, optional): "png" or "svg". Defaults to "png".
+        workers (int, optional): Processes to use. Defaults to the number of cores.
+
+    Returns:
+        list: Paths of the charts written.
+    """
+
+    if image_format not in FORMATS:
+        raise ValueError(f"Unknown format '{image_format}' (use one of {', '.join(FORMATS)})")
+    for chart in charts:
+        if chart.get("kind") not in KINDS:
+            raise ValueError(f"Unknown chart kind '{chart.get('kind')}' (use one of {', '.join(KINDS)})")
+
+    os.makedirs(output_folder, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(charts)) or 1
+
+    if workers == 1:
+        start_worker(file_path)
+        results = [render_chart(chart, output_folder, image_format) for chart in charts]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(file_path,)) as executor:
+            results = list(executor.map(render_chart, charts, [output_folder] * len(charts),
+                                        [image_format] * len(charts), chunksize=max(1, len(charts) // (workers * 4))))
+
+    written = []
+    for path, error in results:
+        if error:
+            print(f"Error generating {path}: {error}")
+        else:
+            written.append(path)
+    return written
+
+
+def charts_by_column(table, column_x, kinds=("line",)):
+    """Chart specs for the average of every numeric column (except column_x) by column_x."""
+
+    return [{"kind": kind, "x": column_x, "y": name}
+            for name in table.headers if name != column_x and table[name].is_numeric()
+            for kind in kinds]
+
+
+def main():
+    """
+    Render charts from the command line, e.g. on a server with no display:
+
+        python charts.py data.csv --spec charts.json --output charts
+        python charts.py data.csv --by Age --format svg
+    """
+
+    parser = argparse.ArgumentParser(description="Render Data Analyzer charts to image files.")
+    parser.add_argument("file", help="CSV file")
+    parser.add_argument("--spec", help="JSON file with a list of charts ({\"kind\", \"x\", \"y\", \"title\", \"where\", \"file\"})")
+    parser.add_argument("--by", help="Chart the average of every numeric column by this column")
+    parser.add_argument("--kind", choices=KINDS, default="line", help="Kind of the --by charts")
+    parser.add_argument("--where", help="Filter applied to every chart (see query.py)")
+    parser.add_argument("--output", default="charts", help="Output folder")
+    parser.add_argument("--format", choices=FORMATS, default="png", help="Image format")
+    parser.add_argument("--workers", type=int, help="Processes to use")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: The file {args.file} does not exist.")
+        sys.exit(1)
+
+    # Load once in this process to write the cache the workers memory-map
+    table = load_cached(args.file)
+    if table is None:
+        table = load_table_parallel(args.file)
+        save_cache(args.file, table)
+
+    charts = []
+    if args.spec:
+        with open(args.spec, 'r', encoding='utf-8') as file:
+            charts.extend(json.load(file))
+    if args.by:
+        charts.extend(charts_by_column(table, args.by, (args.kind,)))
+    if not charts:
+        parser.error("nothing to render: use --spec or --by")
+    if args.where:
+        for chart in charts:
+            chart.setdefault("where", args.where)
+
+    written = render_charts(args.file, charts, args.output, args.format, args.workers)
+    print(f"{len(written)} of {len(charts)} charts written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import gc
+import csv
+import math
+from array import array
+from itertools import islice
+
+import numpy as np
+
+# Rows used to guess the type of every column
+SAMPLE_ROWS = 1000
+# Rows converted at a time (the raw strings of one chunk are the only ones kept in memory)
+CHUNK_ROWS = 65536
+
+# Column types, from the most to the least specific
+INT, FLOAT, CATEGORY = "int", "float", "category"
+
+
+class Column:
+    """
+    A typed column of a table.
+
+    Numeric columns are NumPy arrays (int64 or float64, with NaN for empty cells).
+    Text columns are dictionary-encoded: an int32 array of codes that index the
+    list of distinct values.
+
+    Args:
+        name (str): Column name.
+        kind (str): "int", "float" or "category".
+        values (numpy.ndarray): Values (codes for a category column).
+        categories (list, optional): Distinct values of a category column.
+    """
+
+    def __init__(self, name, kind, values, categories=None):
+        self.name = name
+        self.kind = kind
+        self.values = values
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.values)
+
+    def is_numeric(self):
+        return self.kind in (INT, FLOAT)
+
+    def to_python(self, rows=slice(None)):
+        """
+        Return some rows of the column as Python values, exactly as the row
+        loader used to produce them (int, float, or str; empty numeric cells
+        are ""). Only the requested rows are converted.
+
+        Args:
+            rows (slice, optional): Rows to convert (all of them by default).
+
+        Returns:
+            list: One value per row.
+        """
+
+        values = self.values[rows].tolist()
+        if self.kind == CATEGORY:
+            categories = self.categories
+            return [categories[code] for code in values]
+        if self.kind == FLOAT:
+            return ["" if math.isnan(value) else value for value in values]
+        return values
+
+    def value(self, index):
+        """
+        Return the Python value of one row (see to_python).
+
+        Args:
+            index (int): Row number.
+        """
+
+        value = self.values[index].item()
+        if self.kind == CATEGORY:
+            return self.categories[value]
+        if self.kind == FLOAT and math.isnan(value):
+            return ""
+        return value
+
+    def nbytes(self):
+        return self.values.nbytes + sum(len(value) for value in (self.categories or ()))
+
+
+class Table:
+    """
+    A CSV file loaded by columns.
+
+    Args:
+        headers (list): Column names in file order.
+        columns (dict): Column objects by name.
+        rows (int): Number of rows.
+    """
+
+    def __init__(self, headers, columns, rows):
+        self.headers = headers
+        self.columns = columns
+        self.rows = rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def nbytes(self):
+        return sum(column.nbytes() for column in self.columns.values())
+
+
+class RowsView:
+    """
+    Read-only list of row dictionaries built on demand from a Table, so the
+    functions written for the row loader keep working unchanged. Only the
+    requested rows are converted (iteration goes by chunks of CHUNK_ROWS),
+    so the columns stay in their compact (or memory-mapped) arrays.
+
+    Args:
+        table (Table): The columnar data.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.rows
+
+    def __bool__(self):
+        return self.table.rows > 0
+
+    def _rows(self, rows):
+        names = self.table.headers
+        columns = [self.table.columns[name].to_python(rows) for name in names]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.table.rows)
+            # A stop of -1 (a negative step down to the first row) would mean the last row to NumPy
+            return self._rows(slice(start, stop if stop >= 0 else None, step))
+        if index < 0:
+            index += self.table.rows
+        if not 0 <= index < self.table.rows:
+            raise IndexError("row index out of range")
+        return {name: self.table.columns[name].value(index) for name in self.table.headers}
+
+    def __iter__(self):
+        for start in range(0, self.table.rows, CHUNK_ROWS):
+            yield from self._rows(slice(start, start + CHUNK_ROWS))
+
+
+def infer_kind(values):
+    """
+    Guess the type of a column from a sample of its cells. Empty cells do
+    not count, but they turn an int column into a float one (stored as NaN).
+
+    Args:
+        values (list): Sample of raw cells.
+
+    Returns:
+        str: "int", "float" or "category".
+    """
+
+    present = [value for value in values if value != ""]
+    if not present:
+        return CATEGORY
+    try:
+        for value in present:
+            int(value)
+        return INT if len(present) == len(values) else FLOAT
+    except ValueError:
+        pass
+    try:
+        for value in present:
+            float(value)
+        return FLOAT
+    except ValueError:
+        return CATEGORY
+
+
+def parse_floats(values):
+    """
+    Convert a chunk of cells to floats, with NaN for empty cells.
+
+    Raises:
+        ValueError: If a non-empty cell is not a number.
+    """
+
+    try:
+        return array("d", map(float, values))
+    except ValueError:
+        return array("d", [math.nan if value == "" else float(value) for value in values])
+
+
+class ColumnBuilder:
+    """
+    Accumulate the chunks of one column. A numeric column that meets a value
+    of another type is demoted (int -> float in place; numeric -> category
+    needs the raw text again, so it is reported to the loader).
+    """
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.data = array("q") if kind == INT else array("d") if kind == FLOAT else array("i")
+        self.mapping = {}
+
+    def add(self, values):
+        """
+        Append a chunk of raw cells.
+
+        Returns:
+            bool: False if the column must be reloaded as a category column.
+        """
+
+        if self.kind == INT:
+            try:
+                # Parsed apart first: a failed extend would keep the values read before the error
+                self.data.extend(array("q", map(int, values)))
+                return True
+            except (ValueError, OverflowError):
+                # Empty cells, decimals or huge numbers: continue as float
+                self.kind = FLOAT
+                self.data = array("d", self.data)
+        if self.kind == FLOAT:
+            try:
+                self.data.extend(parse_floats(values))
+                return True
+            except ValueError:
+                return False
+
+        mapping = self.mapping
+        self.data.extend([mapping.setdefault(value, len(mapping)) for value in values])
+        return True
+
+    def build(self):
+        if self.kind == CATEGORY:
+            return Column(self.name, CATEGORY, np.frombuffer(self.data, dtype=np.int32), list(self.mapping))
+        dtype = np.int64 if self.kind == INT else np.float64
+        return Column(self.name, self.kind, np.frombuffer(self.data, dtype=dtype))
+
+
+def read_columns(file_path, forced=None):
+    """
+    Read the CSV file by chunks of CHUNK_ROWS rows into typed columns.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        forced (dict, optional): Types that must be used for some columns.
+
+    Returns:
+        tuple: (headers, builders, rows, demoted) where demoted is the name of
+               a column that has to be read again as text (or None).
+    """
+
+    forced = forced or {}
+    with open(file_path, 'r', newline='', encoding='utf-8') as file_csv:
+        reader = csv.reader(file_csv)
+        headers = next(reader)
+        width = len(headers)
+
+        # Rows whose length does not match the header are skipped, as before
+        chunk = [row for row in islice(reader, SAMPLE_ROWS) if len(row) == width]
+        columns = list(zip(*chunk)) if chunk else [()] * width
+        builders = [ColumnBuilder(name, forced.get(name) or infer_kind(list(values)))
+                    for name, values in zip(headers, columns)]
+
+        rows, demoted = fill_builders(reader, builders, chunk)
+
+    return headers, builders, rows, demoted
+
+
+def fill_builders(reader, builders, chunk=None):
+    """
+    Feed the rows of a csv reader to the column builders, CHUNK_ROWS at a time.
+
+    Args:
+        reader (iterator): Rows (lists of cells).
+        builders (list): One ColumnBuilder per column.
+        chunk (list, optional): Rows already read from the reader.
+
+    Returns:
+        tuple: (rows, demoted) where demoted is the name of a column that has
+               to be read again as text (or None).
+    """
+
+    width = len(builders)
+    rows = 0
+    while True:
+        if chunk:
+            for builder, values in zip(builders, zip(*chunk)):
+                if not builder.add(values):
+                    return rows, builder.name
+            rows += len(chunk)
+        raw = list(islice(reader, CHUNK_ROWS))
+        if not raw:
+            return rows, None
+        # Rows whose length does not match the header are skipped, as before
+        chunk = [row for row in raw if len(row) == width]
+
+
+def load_table(file_path):
+    """
+    Load a CSV file into a columnar Table.
+
+    The type of every column is guessed from the first SAMPLE_ROWS rows. If a
+    later value does not fit, an int column becomes float on the spot and a
+    numeric column with text becomes a category column (the file is read again).
+
+    Args:
+        file_path (str): Path to the CSV file.
+
+    Returns:
+        Table: The loaded data.
+    """
+
+    forced = {}
+    # The loader creates millions of short-lived tuples and no cycles: pausing
+    # the garbage collector saves a large part of the load time
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        while True:
+            headers, builders, rows, demoted = read_columns(file_path, forced)
+            if demoted is None:
+                break
+            forced[demoted] = CATEGORY
+    finally:
+        if collecting:
+            gc.enable()
+
+    columns = {}
+    for builder in builders:
+        columns[builder.name] = builder.build()
+    return Table(headers, columns, rows)
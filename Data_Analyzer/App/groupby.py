@@ -0,0 +1,235 @@
+import numpy as np
+
+from columnar import INT, CATEGORY
+from stats import numeric_values
+
+AGGREGATES = ("mean", "sum", "count", "min", "max", "std")
+# Above this many possible key combinations the groups are found by sorting
+# instead of by direct addressing in a table of running sums
+DENSE_GROUPS_LIMIT = 1 << 22
+
+
+def label_order(labels):
+    """
+    Numeric-aware order of the distinct labels of a key: numbers first, by
+    value, then the rest alphabetically. Done once per distinct label.
+
+    Args:
+        labels (list): Distinct values of a key.
+
+    Returns:
+        numpy.ndarray: rank[i] = position of labels[i] in the order.
+    """
+
+    def sort_key(index):
+        value = labels[index]
+        try:
+            return (0, float(value), "")
+        except (TypeError, ValueError):
+            return (1, 0.0, str(value))
+
+    order = sorted(range(len(labels)), key=sort_key)
+    rank = np.empty(len(labels), dtype=np.int64)
+    rank[order] = np.arange(len(labels))
+    return rank
+
+
+def encode_key(column):
+    """
+    Turn a key column into dense integer codes whose order is the order of
+    the groups.
+
+    Category columns already have codes (only their labels are ranked). Int
+    columns with a small range use value - minimum, and the rest are encoded
+    with np.unique.
+
+    Args:
+        column (Column): Key column.
+
+    Returns:
+        tuple: (codes, labels) where labels[code] is the value of the group.
+    """
+
+    if column.kind == CATEGORY:
+        rank = label_order(column.categories)
+        labels = [None] * len(column.categories)
+        for code, position in enumerate(rank.tolist()):
+            labels[position] = column.categories[code]
+        return rank[column.values], labels
+
+    values = column.values
+    if not len(values):
+        return np.empty(0, dtype=np.int64), []
+    if column.kind == INT:
+        minimum, maximum = int(values.min()), int(values.max())
+        if maximum - minimum < DENSE_GROUPS_LIMIT:
+            # A range object: labels without building a list
+            return values - minimum, range(minimum, maximum + 1)
+
+    labels, codes = np.unique(values, return_inverse=True)
+    # Empty numeric cells were "" for the row loader
+    labels = ["" if label != label else label for label in labels.tolist()]
+    return codes.astype(np.int64), labels
+
+
+def combine_keys(encoded):
+    """
+    Combine the codes of several keys into one group id per row, in
+    lexicographic order of the keys.
+
+    Returns:
+        tuple: (ids, size) where size is the number of possible ids.
+    """
+
+    ids = np.zeros(len(encoded[0][0]), dtype=np.int64)
+    size = 1
+    for codes, labels in encoded:
+        ids = ids * len(labels) + codes
+        size *= len(labels)
+    return ids, size
+
+
+def aggregate_dense(ids, size, values, functions):
+    """
+    Aggregate with running sums and counts addressed directly by group id
+    (bincount), without sorting and without per-group lists.
+    """
+
+    valid = ~np.isnan(values)
+    ids_valid = ids[valid]
+    present = values[valid]
+    counts = np.bincount(ids_valid, minlength=size)
+    result = {}
+
+    if "sum" in functions or "mean" in functions or "std" in functions:
+        sums = np.bincount(ids_valid, present, minlength=size)
+        result["sum"] = sums
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result["mean"] = sums / counts
+    if "std" in functions:
+        # Squares of the values shifted by their mean, so large values do not lose precision
+        shifted = present - (present.mean() if len(present) else 0.0)
+        shifted_sums = np.bincount(ids_valid, shifted, minlength=size)
+        squares = np.bincount(ids_valid, shifted * shifted, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (squares - shifted_sums * shifted_sums / counts) / (counts - 1)
+        result["std"] = np.where(counts > 1, np.sqrt(np.maximum(variance, 0.0)), 0.0)
+    if "min" in functions:
+        minimum = np.full(size, np.inf)
+        np.minimum.at(minimum, ids_valid, present)
+        result["min"] = minimum
+    if "max" in functions:
+        maximum = np.full(size, -np.inf)
+        np.maximum.at(maximum, ids_valid, present)
+        result["max"] = maximum
+    result["count"] = counts
+    return result
+
+
+def aggregate_sorted(starts, order, values, functions):
+    """
+    Aggregate rows already sorted by group with np.*.reduceat, one call per
+    aggregate for all the groups (used when there are too many possible
+    groups for direct addressing).
+    """
+
+    values = values[order]
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    result = {"count": counts}
+
+    if "sum" in functions or "mean" in functions or "std" in functions:
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        result["sum"] = sums
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result["mean"] = sums / counts
+    if "std" in functions:
+        present = values[valid]
+        shifted = np.where(valid, values - (present.mean() if len(present) else 0.0), 0.0)
+        shifted_sums = np.add.reduceat(shifted, starts)
+        squares = np.add.reduceat(shifted * shifted, starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (squares - shifted_sums * shifted_sums / counts) / (counts - 1)
+        result["std"] = np.where(counts > 1, np.sqrt(np.maximum(variance, 0.0)), 0.0)
+    if "min" in functions:
+        result["min"] = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+    if "max" in functions:
+        result["max"] = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+    return result
+
+
+def aggregated_values(table, column):
+    """Numbers of a column to aggregate (all NaN if it has none)."""
+
+    values = numeric_values(table[column])
+    if values is None:
+        return np.full(table.rows, np.nan)
+    return values
+
+
+def group_by(table, keys, aggregates):
+    """
+    Group the rows of a Table by one or more key columns and aggregate other
+    columns in each group.
+
+    With few possible key combinations the aggregates are running sums and
+    counts in a table addressed by group id; with many, the rows are sorted
+    by group id once and reduced group by group.
+
+    Args:
+        table (Table): The data.
+        keys (list): Key column names.
+        aggregates (list): (column, function) pairs, function being one of
+            "mean", "sum", "count", "min", "max" or "std".
+
+    Returns:
+        dict: Column name -> list, one entry per group in key order: first the
+              key columns, then one "function(column)" column per aggregate.
+              Groups where an aggregated column has no numbers get None.
+    """
+
+    for column, function in aggregates:
+        if function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{function}' (use one of {', '.join(AGGREGATES)})")
+
+    encoded = [encode_key(table[key]) for key in keys]
+    ids, size = combine_keys(encoded)
+
+    functions = {}
+    for column, function in aggregates:
+        functions.setdefault(column, set()).add(function)
+
+    if size <= DENSE_GROUPS_LIMIT:
+        # Only the ids that appear are groups
+        groups = np.flatnonzero(np.bincount(ids, minlength=size))
+        computed = {column: aggregate_dense(ids, size, aggregated_values(table, column), names)
+                    for column, names in functions.items()}
+        computed = {column: {name: values[groups] for name, values in results.items()}
+                    for column, results in computed.items()}
+    else:
+        order = np.argsort(ids, kind='stable')
+        sorted_ids = ids[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_ids)) + 1))
+        groups = sorted_ids[starts]
+        computed = {column: aggregate_sorted(starts, order, aggregated_values(table, column), names)
+                    for column, names in functions.items()}
+
+    result = {}
+    # Split the group ids back into the code of every key
+    remaining = groups
+    key_codes = []
+    for codes, labels in reversed(encoded):
+        key_codes.append((remaining % len(labels), labels))
+        remaining = remaining // len(labels)
+    for key, (codes, labels) in zip(keys, reversed(key_codes)):
+        result[key] = [labels[code] for code in codes.tolist()]
+
+    for column, function in aggregates:
+        values = computed[column][function]
+        counts = computed[column]["count"]
+        if function == "count":
+            result[f"count({column})"] = counts.tolist()
+        else:
+            result[f"{function}({column})"] = [value if count else None
+                                               for value, count in zip(values.tolist(), counts.tolist())]
+    return result
@@ -0,0 +1,250 @@
+import io
+import os
+import csv
+import gc
+import mmap
+from itertools import islice
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from columnar import (Table, Column, ColumnBuilder, INT, FLOAT, CATEGORY, SAMPLE_ROWS,
+                      infer_kind, fill_builders, load_table)
+
+# Smaller files are loaded by a single process (starting the pool costs more than it saves)
+PARALLEL_MIN_SIZE = 32 * 1024 * 1024
+# Bytes parsed by every task: more tasks than workers balances the load and bounds the memory of each worker
+RANGE_SIZE = 64 * 1024 * 1024
+# Bytes scanned at a time when counting quotes
+SCAN_BLOCK = 16 * 1024 * 1024
+
+DTYPES = {INT: np.int64, FLOAT: np.float64, CATEGORY: np.int32}
+
+
+def record_start(data, offset, quotes_before):
+    """
+    First position at or after offset where a CSV record starts: just after
+    a newline that is not inside a quoted field.
+
+    A newline is outside quotes when the number of quote characters before it
+    is even (an escaped quote "" counts twice, so it does not change that).
+
+    Args:
+        data (mmap.mmap): The file.
+        offset (int): Candidate position.
+        quotes_before (int): Quote characters in data[:offset].
+
+    Returns:
+        int: The position (len(data) if there is no more record).
+    """
+
+    position = offset
+    quotes = quotes_before
+    while True:
+        newline = data.find(b"\n", position)
+        if newline == -1:
+            return len(data)
+        quotes += data[position:newline].count(b'"')
+        if quotes % 2 == 0:
+            return newline + 1
+        position = newline + 1
+
+
+def split_ranges(file_path, pieces):
+    """
+    Split a CSV file into byte ranges that start and end on record
+    boundaries, so every range can be parsed on its own.
+
+    Quote characters are counted once over the whole file (in C, block by
+    block); files without quotes only look for the next newline.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        pieces (int): Number of ranges wanted.
+
+    Returns:
+        tuple: (header_end, ranges) where header_end is where the first data
+               record starts and ranges is a list of (start, end).
+    """
+
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        has_quotes = data.find(b'"') != -1
+
+        # Quotes before the last candidate: every byte is counted only once
+        counted = [0, 0]
+
+        def quotes_before(offset):
+            if has_quotes:
+                for block in range(counted[0], offset, SCAN_BLOCK):
+                    counted[1] += data[block:min(block + SCAN_BLOCK, offset)].count(b'"')
+                counted[0] = offset
+            return counted[1]
+
+        header_end = record_start(data, 0, 0)
+        step = max((size - header_end) // pieces, 1)
+        boundaries = [header_end]
+        for candidate in range(header_end + step, size, step):
+            if candidate <= boundaries[-1]:
+                continue
+            boundary = record_start(data, candidate, quotes_before(candidate))
+            if boundary >= size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+        boundaries.append(size)
+
+    return header_end, list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def parse_range(file_path, start, end, headers, kinds):
+    """
+    Parse one byte range of the file into typed columns (runs in a worker
+    process).
+
+    The columns are written to a block of shared memory instead of being
+    pickled back: only the block name, the layout and the category labels
+    travel to the parent process.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        start (int): First byte of the range.
+        end (int): Byte after the range.
+        headers (list): Column names.
+        kinds (list): Type of every column.
+
+    Returns:
+        dict: {"rows", "memory", "layout", "categories"}, or {"demoted": name}
+              if a column needs to be loaded as text.
+    """
+
+    gc.disable()
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    reader = csv.reader(io.StringIO(text, newline=''))
+    builders = [ColumnBuilder(name, kind) for name, kind in zip(headers, kinds)]
+    rows, demoted = fill_builders(reader, builders)
+    del text, reader
+    if demoted is not None:
+        return {"demoted": demoted}
+
+    layout = []
+    categories = {}
+    offset = 0
+    for builder in builders:
+        nbytes = len(builder.data) * builder.data.itemsize
+        layout.append((builder.name, builder.kind, offset, len(builder.data)))
+        if builder.kind == CATEGORY:
+            categories[builder.name] = list(builder.mapping)
+        # Every column starts on an 8-byte boundary
+        offset += (nbytes + 7) // 8 * 8
+
+    memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for builder, (_, kind, position, length) in zip(builders, layout):
+        target = np.ndarray(length, dtype=DTYPES[kind], buffer=memory.buf, offset=position)
+        target[:] = np.frombuffer(builder.data, dtype=DTYPES[kind])
+        del target
+    memory.close()
+    return {"rows": rows, "memory": memory.name, "layout": layout, "categories": categories}
+
+
+def sample_kinds(file_path, header_end, headers, forced):
+    """Guess the type of every column from the first SAMPLE_ROWS records."""
+
+    with open(file_path, 'rb') as file:
+        file.seek(header_end)
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+        sample = [row for row in islice(reader, SAMPLE_ROWS) if len(row) == len(headers)]
+    columns = list(zip(*sample)) if sample else [()] * len(headers)
+    return [forced.get(name) or infer_kind(list(values)) for name, values in zip(headers, columns)]
+
+
+def concatenate(headers, results):
+    """
+    Join the column chunks of every range, in file order, into one Table and
+    release the shared memory blocks.
+
+    A column that was int in some ranges and float in others becomes float.
+    Category codes are remapped to one dictionary, in order of first
+    appearance, exactly like the single-process loader.
+    """
+
+    rows = sum(result["rows"] for result in results)
+    blocks = [shared_memory.SharedMemory(name=result["memory"]) for result in results]
+    try:
+        columns = {}
+        for index, name in enumerate(headers):
+            kinds = {result["layout"][index][1] for result in results}
+            kind = CATEGORY if CATEGORY in kinds else FLOAT if FLOAT in kinds else INT
+            values = np.empty(rows, dtype=DTYPES[kind])
+            mapping = {}
+            position = 0
+            for result, block in zip(results, blocks):
+                _, chunk_kind, offset, length = result["layout"][index]
+                chunk = np.ndarray(length, dtype=DTYPES[chunk_kind], buffer=block.buf, offset=offset)
+                if kind == CATEGORY:
+                    lookup = np.array([mapping.setdefault(label, len(mapping))
+                                       for label in result["categories"][name]], dtype=np.int32)
+                    values[position:position + length] = lookup[chunk]
+                else:
+                    values[position:position + length] = chunk
+                del chunk
+                position += length
+            columns[name] = Column(name, kind, values, list(mapping) if kind == CATEGORY else None)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return Table(headers, columns, rows)
+
+
+def load_table_parallel(file_path, workers=None):
+    """
+    Load a CSV file into a columnar Table using every core.
+
+    The file is split into byte ranges aligned on records (quote-aware), the
+    ranges are parsed by a pool of processes that return typed columns
+    through shared memory, and the chunks are concatenated in order. Small
+    files, or a single worker, use the single-process loader.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        workers (int, optional): Processes to use. Defaults to the number of cores.
+
+    Returns:
+        Table: The loaded data (the same as load_table returns).
+    """
+
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(file_path)
+    if workers < 2 or size < PARALLEL_MIN_SIZE:
+        return load_table(file_path)
+
+    with open(file_path, 'r', newline='', encoding='utf-8') as file_csv:
+        headers = next(csv.reader(file_csv))
+
+    header_end, ranges = split_ranges(file_path, max(workers, -(-size // RANGE_SIZE)))
+    forced = {}
+    # Start the resource tracker before the workers so they share it: the blocks they create are
+    # then released by the unlink in this process, without "leaked shared_memory" warnings
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            kinds = sample_kinds(file_path, header_end, headers, forced)
+            futures = [executor.submit(parse_range, file_path, start, end, headers, kinds) for start, end in ranges]
+            results = [future.result() for future in futures]
+
+            demoted = [result["demoted"] for result in results if "demoted" in result]
+            if not demoted:
+                return concatenate(headers, results)
+
+            # A numeric column has text further down: free the parsed chunks and load it as text
+            for result in results:
+                if "memory" in result:
+                    block = shared_memory.SharedMemory(name=result["memory"])
+                    block.close()
+                    block.unlink()
+            for name in demoted:
+                forced[name] = CATEGORY
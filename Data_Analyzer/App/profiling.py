@@ -0,0 +1,379 @@
+import os
+import sys
+import html
+import json
+import math
+import argparse
+
+import numpy as np
+
+from columnar import CATEGORY
+from stats import profile
+from cache import load_cached, save_cache
+from parallel_csv import load_table_parallel
+from query import filter_table
+
+METHODS = ("pearson", "spearman")
+# Rows of the numeric matrix multiplied at a time (bounds the memory: rows x columns x 8 bytes)
+CORRELATION_BLOCK = 65536
+# Most frequent values reported for every text column
+TOP_VALUES = 10
+# Strongest correlations listed in the report
+TOP_PAIRS = 10
+
+
+def column_block(table, names, start, stop):
+    """Rows start:stop of the numeric columns as a float64 matrix (NaN = empty)."""
+
+    block = np.empty((stop - start, len(names)))
+    for index, name in enumerate(names):
+        block[:, index] = table[name].values[start:stop]
+    return block
+
+
+def rank_values(values):
+    """
+    Ranks of a column (1 = smallest), ties getting the average of their
+    ranks. Stored doubled as int32 (average ranks are multiples of 0.5) with
+    -1 for empty cells, to halve the memory of float64 ranks.
+
+    Int columns with a range no larger than the column are ranked by
+    counting every value (no sort).
+
+    Args:
+        values (numpy.ndarray): Numeric column.
+
+    Returns:
+        numpy.ndarray: int32 doubled ranks.
+    """
+
+    if values.dtype.kind == 'i' and len(values):
+        minimum = int(values.min())
+        if int(values.max()) - minimum < len(values):
+            counts = np.bincount(values - minimum)
+            ends = np.cumsum(counts)
+            # The values equal to v take ranks ends - counts + 1 .. ends: doubled average = 2 * ends - counts + 1
+            return (2 * ends - counts + 1).astype(np.int32)[values - minimum]
+
+    values = values.astype(np.float64, copy=False)
+    doubled = np.full(len(values), -1, dtype=np.int32)
+    empty = np.isnan(values)
+    present = np.flatnonzero(~empty) if empty.any() else None
+    if present is not None and not len(present):
+        return doubled
+
+    # The order inside a tie does not matter (they share the average rank): no stable sort needed
+    if present is None:
+        order = np.argsort(values)
+    else:
+        order = present[np.argsort(values[present])]
+    ordered = values[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(ordered)) + 1))
+    ends = np.concatenate((starts[1:], [len(ordered)]))
+    # Ranks start+1..end of a tie average (start + 1 + end) / 2; doubled: start + 1 + end
+    doubled[order] = np.repeat(starts + 1 + ends, ends - starts)
+    return doubled
+
+
+def rank_block(ranks, start, stop):
+    """Rows start:stop of the doubled ranks as a float64 matrix of ranks (NaN = empty)."""
+
+    block = np.column_stack([rank[start:stop] for rank in ranks]).astype(np.float64)
+    block[block < 0] = np.nan
+    return block / 2
+
+
+def blocked_correlation(rows, columns, get_block, block_rows=CORRELATION_BLOCK):
+    """
+    Pearson correlation of every pair of columns, with pairwise-complete rows,
+    accumulated over blocks of rows with matrix products.
+
+    For every block the sums needed by every pair are added with a few
+    (columns x rows) @ (rows x columns) products; a block without empty cells
+    needs only one. Values are shifted by an estimate of their mean (from the
+    first block) so the sums keep their precision.
+
+    Args:
+        rows (int): Number of rows.
+        columns (int): Number of columns.
+        get_block (callable): get_block(start, stop) -> float64 matrix with NaN for empty cells.
+        block_rows (int): Rows per block.
+
+    Returns:
+        numpy.ndarray: columns x columns matrix (NaN where a pair has no variance or fewer than 2 rows).
+    """
+
+    pairs = np.zeros((columns, columns))
+    sums = np.zeros((columns, columns))
+    squares = np.zeros((columns, columns))
+    products = np.zeros((columns, columns))
+    shift = None
+
+    for start in range(0, rows, block_rows):
+        block = get_block(start, min(start + block_rows, rows))
+        if shift is None:
+            with np.errstate(invalid='ignore'):
+                shift = np.nan_to_num(np.nanmean(block, axis=0)) if len(block) else np.zeros(columns)
+        block = block - shift
+        valid = ~np.isnan(block)
+
+        if valid.all():
+            # sums[i, j] = sum of column i over the rows where i and j have values: the same for every j here
+            pairs += len(block)
+            sums += block.sum(axis=0)[:, None]
+            squares += np.einsum('ij,ij->j', block, block)[:, None]
+            products += block.T @ block
+        else:
+            present = valid.astype(np.float64)
+            filled = np.where(valid, block, 0.0)
+            pairs += present.T @ present
+            sums += filled.T @ present
+            squares += (filled * filled).T @ present
+            products += filled.T @ filled
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = products - sums * sums.T / pairs
+        variance_i = squares - sums * sums / pairs
+        variance_j = variance_i.T
+        correlation = covariance / np.sqrt(variance_i * variance_j)
+    correlation[(pairs < 2) | ~(variance_i > 0) | ~(variance_j > 0)] = np.nan
+    # Rounding can push |r| slightly above 1
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def correlation_matrix(table, columns=None, method="pearson", block_rows=CORRELATION_BLOCK):
+    """
+    Correlation matrix of the numeric columns of a Table.
+
+    Spearman is the Pearson correlation of the ranks of every column (ties
+    get their average rank). Ranks are computed once per column over all its
+    values, so with empty cells they are an approximation of re-ranking
+    every pair.
+
+    Args:
+        table (Table): The data.
+        columns (list, optional): Columns. Defaults to every numeric column.
+        method (str): "pearson" or "spearman".
+        block_rows (int): Rows multiplied at a time.
+
+    Returns:
+        tuple: (names, matrix) with matrix[i][j] the correlation of names[i] and names[j].
+    """
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}' (use one of {', '.join(METHODS)})")
+    names = columns or [name for name in table.headers if table[name].is_numeric()]
+    for name in names:
+        if name not in table or not table[name].is_numeric():
+            raise ValueError(f"Column '{name}' is not numeric")
+    if not names:
+        return names, np.empty((0, 0))
+
+    if method == "pearson":
+        matrix = blocked_correlation(table.rows, len(names),
+                                     lambda start, stop: column_block(table, names, start, stop), block_rows)
+    else:
+        ranks = [rank_values(table[name].values) for name in names]
+        matrix = blocked_correlation(table.rows, len(names),
+                                     lambda start, stop: rank_block(ranks, start, stop), block_rows)
+    return names, matrix
+
+
+def top_values(column, top=TOP_VALUES):
+    """
+    Most frequent values of a text column, counted with one bincount of its codes.
+
+    Returns:
+        dict: {"column", "distinct", "empty", "top": [{"value", "count", "share"}]}.
+    """
+
+    counts = np.bincount(column.values, minlength=len(column.categories))
+    total = int(counts.sum())
+    order = np.argsort(-counts, kind='stable')[:top]
+    empty = int(counts[column.categories.index("")]) if "" in column.categories else 0
+    return {
+        "column": column.name,
+        "distinct": int(np.count_nonzero(counts)),
+        "empty": empty,
+        "top": [{"value": column.categories[code], "count": int(counts[code]),
+                 "share": float(counts[code] / total) if total else 0.0} for code in order.tolist() if counts[code]],
+    }
+
+
+def strongest_pairs(names, matrix, top=TOP_PAIRS):
+    """The pairs of different columns with the largest absolute correlation."""
+
+    pairs = [(names[i], names[j], float(matrix[i, j]))
+             for i in range(len(names)) for j in range(i + 1, len(names)) if not math.isnan(matrix[i, j])]
+    pairs.sort(key=lambda pair: abs(pair[2]), reverse=True)
+    return [{"columns": [first, second], "correlation": value} for first, second, value in pairs[:top]]
+
+
+def build_report(table, methods=METHODS, top=TOP_VALUES, source=None):
+    """
+    Profile a whole Table: statistics of every numeric column, correlation
+    matrices and the most frequent values of every text column.
+
+    Args:
+        table (Table): The data.
+        methods (tuple): Correlation methods ("pearson", "spearman").
+        top (int): Most frequent values per text column.
+        source (str, optional): Name of the dataset, shown in the report.
+
+    Returns:
+        dict: The report (see write_report).
+    """
+
+    numeric = [name for name in table.headers if table[name].is_numeric()]
+    report = {
+        "source": source,
+        "rows": table.rows,
+        "columns": len(table.headers),
+        "statistics": profile(table, numeric),
+        "correlation": {"columns": numeric},
+        "categories": [top_values(table[name], top) for name in table.headers if table[name].kind == CATEGORY],
+    }
+    for method in methods:
+        names, matrix = correlation_matrix(table, numeric, method)
+        report["correlation"][method] = matrix
+        report["correlation"][f"{method}_strongest"] = strongest_pairs(names, matrix)
+    return report
+
+
+def json_ready(value):
+    """Convert a report to JSON types: arrays to lists, NaN and infinities to None."""
+
+    if isinstance(value, dict):
+        return {str(key): json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_ready(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return json_ready(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def cell_color(value):
+    """Background of a correlation cell: blue for positive, red for negative."""
+
+    if value is None:
+        return "#eeeeee"
+    alpha = min(abs(value), 1.0)
+    return f"rgba(33, 102, 172, {alpha:.2f})" if value >= 0 else f"rgba(178, 24, 43, {alpha:.2f})"
+
+
+def report_html(report):
+    """Render a report (already converted by json_ready) as a standalone HTML page."""
+
+    escape = html.escape
+    title = f"Profile of {report['source']}" if report.get("source") else "Data profile"
+    parts = [f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{escape(title)}</title><style>"
+             "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:2em}"
+             "th,td{border:1px solid #ccc;padding:4px 8px;text-align:right}th{background:#f4f4f4}"
+             "td.name{text-align:left}</style></head><body>",
+             f"<h1>{escape(title)}</h1><p>{report['rows']} rows, {report['columns']} columns</p>"]
+
+    def number(value):
+        return "" if value is None else f"{value:.4g}" if isinstance(value, float) else str(value)
+
+    parts.append("<h2>Numeric columns</h2><table><tr><th>Column</th><th>Count</th><th>Empty</th><th>Min</th>"
+                 "<th>Max</th><th>Average</th><th>Median</th><th>Std dev</th><th>P5</th><th>P95</th></tr>")
+    for statistic in report["statistics"]:
+        percentiles = statistic["percentiles"]
+        parts.append(f"<tr><td class='name'>{escape(statistic['column'])}</td>"
+                     + "".join(f"<td>{number(statistic[key])}</td>" for key in
+                               ("total_values", "null_values", "minimum", "maximum", "average", "median", "standard_deviation"))
+                     + f"<td>{number(percentiles.get('5'))}</td><td>{number(percentiles.get('95'))}</td></tr>")
+    parts.append("</table>")
+
+    names = report["correlation"]["columns"]
+    for method in METHODS:
+        if method not in report["correlation"]:
+            continue
+        matrix = report["correlation"][method]
+        parts.append(f"<h2>{method.capitalize()} correlation</h2><table><tr><th></th>"
+                     + "".join(f"<th>{escape(name)}</th>" for name in names) + "</tr>")
+        for name, row in zip(names, matrix):
+            parts.append(f"<tr><th>{escape(name)}</th>"
+                         + "".join(f"<td style='background:{cell_color(value)}'>{number(value)}</td>" for value in row)
+                         + "</tr>")
+        parts.append("</table><h3>Strongest pairs</h3><table><tr><th>Columns</th><th>Correlation</th></tr>")
+        for pair in report["correlation"][f"{method}_strongest"]:
+            parts.append(f"<tr><td class='name'>{escape(' / '.join(pair['columns']))}</td>"
+                         f"<td>{number(pair['correlation'])}</td></tr>")
+        parts.append("</table>")
+
+    parts.append("<h2>Text columns</h2>")
+    for category in report["categories"]:
+        parts.append(f"<h3>{escape(category['column'])}</h3><p>{category['distinct']} distinct values, "
+                     f"{category['empty']} empty</p><table><tr><th>Value</th><th>Count</th><th>Share</th></tr>")
+        for item in category["top"]:
+            parts.append(f"<tr><td class='name'>{escape(item['value'])}</td><td>{item['count']}</td>"
+                         f"<td>{item['share']:.1%}</td></tr>")
+        parts.append("</table>")
+
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def write_report(report, output):
+    """
+    Write a report as JSON or HTML, chosen by the extension of the file.
+
+    Args:
+        report (dict): Report from build_report.
+        output (str): Path of the .json or .html file.
+
+    Returns:
+        str: The path written.
+    """
+
+    extension = os.path.splitext(output)[1].lower()
+    if extension not in (".json", ".html", ".htm"):
+        raise ValueError(f"Unknown report format '{extension}' (use .json or .html)")
+
+    report = json_ready(report)
+    folder = os.path.dirname(output)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        if extension == ".json":
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        else:
+            file.write(report_html(report))
+    return output
+
+
+def main():
+    """
+    Write the profiling report of a CSV file from the command line:
+
+        python profiling.py data.csv --output report.html
+    """
+
+    parser = argparse.ArgumentParser(description="Write a profiling report (statistics, correlations, frequencies) of a CSV file.")
+    parser.add_argument("file", help="CSV file")
+    parser.add_argument("--output", default="report.html", help="Report file (.html or .json)")
+    parser.add_argument("--method", choices=METHODS, action="append", help="Correlation method (default: both)")
+    parser.add_argument("--where", help="Profile only the rows that match (see query.py)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: The file {args.file} does not exist.")
+        sys.exit(1)
+
+    table = load_cached(args.file)
+    if table is None:
+        table = load_table_parallel(args.file)
+        save_cache(args.file, table)
+    table = filter_table(table, args.where)
+
+    report = build_report(table, tuple(args.method or METHODS), source=os.path.basename(args.file))
+    print(f"Report written to {write_report(report, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+import re
+import math
+import operator
+
+import numpy as np
+
+from columnar import Table, Column, CATEGORY
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def to_number(value):
+    """Return value as a float, or None if it is not a number."""
+
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Expression:
+    """
+    Base of the filter expressions. Expressions are combined with & (and),
+    | (or) and ~ (not), and compile to a NumPy boolean mask over a Table.
+    """
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def mask(self, table):
+        raise NotImplementedError
+
+    def columns(self):
+        """Return the set of column names the expression reads."""
+
+        raise NotImplementedError
+
+
+class Comparison(Expression):
+    """
+    column <operator> value, or column in values.
+
+    On a category column the comparison is evaluated once per distinct value
+    and the rows are selected by their codes, so text is never compared row
+    by row.
+    """
+
+    def __init__(self, column, symbol, value):
+        if symbol != "in" and symbol not in OPERATORS:
+            raise ValueError(f"Unknown operator '{symbol}'")
+        self.column = column
+        self.symbol = symbol
+        self.value = value
+
+    def columns(self):
+        return {self.column}
+
+    def test(self, values):
+        """
+        Apply the comparison to an array of values (the rows of a numeric
+        column, or the distinct labels of a category column).
+        """
+
+        numeric = values.dtype != object
+        if self.symbol == "in":
+            wanted = [number for number in map(to_number, self.value) if number is not None] if numeric \
+                else [str(item) for item in self.value]
+            return np.isin(values, np.array(wanted, dtype=values.dtype))
+
+        if numeric:
+            value = to_number(self.value)
+            if value is None:
+                # Text is never equal to a number
+                if self.symbol in ("==", "!="):
+                    return np.full(len(values), self.symbol == "!=")
+                raise ValueError(f"Column '{self.column}' is numeric: '{self.value}' is not a number")
+        elif to_number(self.value) is not None and self.symbol not in ("==", "!="):
+            # Ordering a text column against a number compares the labels that are numbers
+            return self.test(np.array([math.nan if to_number(label) is None else to_number(label)
+                                       for label in values.tolist()], dtype=np.float64))
+        else:
+            value = str(self.value)
+        with np.errstate(invalid='ignore'):
+            return OPERATORS[self.symbol](values, value)
+
+    def mask(self, table):
+        if self.column not in table:
+            raise ValueError(f"Unknown column '{self.column}'")
+        column = table[self.column]
+
+        if column.kind == CATEGORY:
+            # One test per distinct label, then a lookup by code for every row
+            selected = np.zeros(len(column.categories) + 1, dtype=bool)
+            if column.categories:
+                selected[:-1] = self.test(np.array(column.categories, dtype=object))
+            return selected[column.values]
+        return self.test(column.values)
+
+    def __repr__(self):
+        return f"`{self.column}` {self.symbol} {self.value!r}"
+
+
+class And(Expression):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def columns(self):
+        return self.left.columns() | self.right.columns()
+
+    def mask(self, table):
+        return self.left.mask(table) & self.right.mask(table)
+
+    def __repr__(self):
+        return f"({self.left!r} and {self.right!r})"
+
+
+class Or(Expression):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def columns(self):
+        return self.left.columns() | self.right.columns()
+
+    def mask(self, table):
+        return self.left.mask(table) | self.right.mask(table)
+
+    def __repr__(self):
+        return f"({self.left!r} or {self.right!r})"
+
+
+class Not(Expression):
+    def __init__(self, inner):
+        self.inner = inner
+
+    def columns(self):
+        return self.inner.columns()
+
+    def mask(self, table):
+        return ~self.inner.mask(table)
+
+    def __repr__(self):
+        return f"not {self.inner!r}"
+
+
+class ColumnReference:
+    """
+    Entry point of the Python API: col("Age") > 30 builds a Comparison.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, value):
+        return Comparison(self.name, "==", value)
+
+    def __ne__(self, value):
+        return Comparison(self.name, "!=", value)
+
+    def __lt__(self, value):
+        return Comparison(self.name, "<", value)
+
+    def __le__(self, value):
+        return Comparison(self.name, "<=", value)
+
+    def __gt__(self, value):
+        return Comparison(self.name, ">", value)
+
+    def __ge__(self, value):
+        return Comparison(self.name, ">=", value)
+
+    def isin(self, values):
+        return Comparison(self.name, "in", list(values))
+
+    __hash__ = None
+
+
+def col(name):
+    """
+    Reference a column in a filter expression.
+
+    Example:
+        (col("Workout Type") == "Yoga") & (col("Age") > 30)
+    """
+
+    return ColumnReference(name)
+
+
+TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<column>`[^`]+`)
+      | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|-?\.\d+(?:[eE][-+]?\d+)?)
+      | (?P<operator>==|!=|<=|>=|<|>|=)
+      | (?P<symbol>[()\[\],])
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match:
+            raise ValueError(f"Unexpected text in query: '{text[position:]}'")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "column":
+            value = value[1:-1]
+        elif kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "number":
+            value = float(value) if any(char in value for char in ".eE") else int(value)
+        elif kind == "operator" and value == "=":
+            value = "=="
+        elif kind == "word" and value.lower() in ("and", "or", "not", "in"):
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """
+    Recursive-descent parser of the query language:
+
+        query      := or
+        or         := and ("or" and)*
+        and        := not ("and" not)*
+        not        := "not" not | "(" or ")" | comparison
+        comparison := column operator value | column "in" "[" value ("," value)* "]"
+
+    Columns are bare names (Age) or names in backticks (`Workout Type`);
+    values are numbers or quoted strings.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def found(self):
+        kind, value = self.peek()
+        return "the end of the query" if kind is None else repr(value)
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value is not None and token[1] != value):
+            expected = value or kind or "more text"
+            raise ValueError(f"Query error: expected {expected}, found {self.found()}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        expression = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Query error: unexpected {self.tokens[self.position][1]!r}")
+        return expression
+
+    def parse_or(self):
+        expression = self.parse_and()
+        while self.peek() == ("keyword", "or"):
+            self.take()
+            expression = Or(expression, self.parse_and())
+        return expression
+
+    def parse_and(self):
+        expression = self.parse_not()
+        while self.peek() == ("keyword", "and"):
+            self.take()
+            expression = And(expression, self.parse_not())
+        return expression
+
+    def parse_not(self):
+        if self.peek() == ("keyword", "not"):
+            self.take()
+            return Not(self.parse_not())
+        if self.peek() == ("symbol", "("):
+            self.take()
+            expression = self.parse_or()
+            self.take("symbol", ")")
+            return expression
+        return self.parse_comparison()
+
+    def parse_value(self):
+        kind, value = self.peek()
+        if kind not in ("string", "number", "word"):
+            raise ValueError(f"Query error: expected a value, found {self.found()}")
+        self.take()
+        return value
+
+    def parse_comparison(self):
+        kind, column = self.peek()
+        if kind not in ("column", "word"):
+            raise ValueError(f"Query error: expected a column, found {self.found()}")
+        self.take()
+        if self.peek() == ("keyword", "in"):
+            self.take()
+            self.take("symbol", "[")
+            values = [self.parse_value()]
+            while self.peek() == ("symbol", ","):
+                self.take()
+                values.append(self.parse_value())
+            self.take("symbol", "]")
+            return Comparison(column, "in", values)
+        _, symbol = self.take("operator")
+        return Comparison(column, symbol, self.parse_value())
+
+
+def parse_query(text):
+    """
+    Compile a query string into an Expression.
+
+    Example:
+        parse_query('`Workout Type` == "Yoga" and Age > 30')
+
+    Args:
+        text (str): The query.
+
+    Returns:
+        Expression: The compiled filter.
+
+    Raises:
+        ValueError: If the query is not valid.
+    """
+
+    return Parser(text).parse()
+
+
+def as_expression(where):
+    """Accept an Expression, a query string or None."""
+
+    if where is None or isinstance(where, Expression):
+        return where
+    return parse_query(where)
+
+
+def filter_table(table, where, columns=None):
+    """
+    Keep the rows of a Table that match a filter.
+
+    The mask is computed from the columns the filter reads; only the columns
+    asked for are then gathered, so on a memory-mapped (cached) table the
+    other columns are never read.
+
+    Args:
+        table (Table): The data.
+        where (Expression or str): The filter (None keeps every row).
+        columns (list, optional): Columns to keep. Defaults to all of them.
+
+    Returns:
+        Table: A new table with the matching rows.
+    """
+
+    where = as_expression(where)
+    names = columns or table.headers
+    if where is None:
+        return table if columns is None else Table(list(names), {name: table[name] for name in names}, table.rows)
+
+    mask = where.mask(table)
+    rows = np.flatnonzero(mask)
+    filtered = {}
+    for name in names:
+        column = table[name]
+        filtered[name] = Column(name, column.kind, column.values[rows], column.categories)
+    return Table(list(names), filtered, len(rows))
@@ -0,0 +1,201 @@
+import numpy as np
+
+from columnar import INT, CATEGORY
+
+# Percentiles reported for every column
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# Bins of the histogram of every column
+HISTOGRAM_BINS = 10
+# Columns stacked and sorted together by profile (bounds the memory of the matrix)
+PROFILE_BLOCK = 8
+
+
+def numeric_values(column):
+    """
+    Get the numbers of a column as a float64 array, with NaN for the cells
+    that are not numbers.
+
+    A category column keeps the behaviour of the row loader: the cells that
+    look like numbers count, the rest are ignored. Every distinct value is
+    parsed once and the codes are looked up in the result.
+
+    Args:
+        column (Column): Column of a Table.
+
+    Returns:
+        numpy.ndarray or None: The numbers, or None if the column has none.
+    """
+
+    if column.kind != CATEGORY:
+        return column.values.astype(np.float64, copy=False)
+
+    lookup = np.empty(len(column.categories), dtype=np.float64)
+    for code, value in enumerate(column.categories):
+        try:
+            lookup[code] = float(value)
+        except ValueError:
+            lookup[code] = np.nan
+    if np.isnan(lookup).all():
+        return None
+    return lookup[column.values]
+
+
+def integer_values(column):
+    """Return the int64 values of an int column, or None for any other column."""
+
+    return column.values if column.kind == INT else None
+
+
+def sorted_percentiles(sorted_values, counts, percentiles):
+    """
+    Linear-interpolated percentiles (the NumPy default) of every column of a
+    matrix sorted by columns, where column j has counts[j] valid values at the top.
+
+    Returns:
+        numpy.ndarray: One row per percentile, one column per data column.
+    """
+
+    columns = np.arange(sorted_values.shape[1])
+    result = np.empty((len(percentiles), sorted_values.shape[1]))
+    for row, percentile in enumerate(percentiles):
+        position = percentile / 100 * np.maximum(counts - 1, 0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+        fraction = position - lower
+        low_values = sorted_values[lower, columns]
+        high_values = sorted_values[upper, columns]
+        result[row] = low_values + (high_values - low_values) * fraction
+    return result
+
+
+def sorted_histogram(sorted_values, minimum, maximum, bins=HISTOGRAM_BINS):
+    """
+    Histogram of a sorted array with equal-width bins, found with a binary
+    search for every edge instead of a pass over the values.
+
+    Returns:
+        tuple: (counts, edges) as lists, like numpy.histogram.
+    """
+
+    if minimum == maximum:
+        maximum = minimum + 1
+    edges = np.linspace(minimum, maximum, bins + 1)
+    positions = np.concatenate(([0], np.searchsorted(sorted_values, edges[1:-1], side='left'), [len(sorted_values)]))
+    return np.diff(positions).tolist(), edges.tolist()
+
+
+def describe(columns, names, integers=None):
+    """
+    Statistics of several numeric columns at once.
+
+    The columns are stacked in one matrix and sorted once; minimum, maximum,
+    median and percentiles are then read from the sorted values, and sums and
+    variances are computed for all the columns in the same NumPy calls.
+
+    Args:
+        columns (list): float64 arrays of the same length (NaN = no value).
+        names (list): Column names.
+        integers (list, optional): The int64 array of every int column (None
+            for the rest), so their minimum, maximum and sum are exact ints.
+
+    Returns:
+        list: One statistics dictionary per column (None for columns without numbers).
+    """
+
+    matrix = np.column_stack(columns)
+    if len(matrix) == 0:
+        return [None] * len(names)
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+
+    # NaN sorts last, so the valid values of every column are at the top
+    sorted_matrix = np.sort(matrix, axis=0)
+    filled = np.where(valid, matrix, 0.0)
+    sums = filled.sum(axis=0)
+    safe_counts = np.maximum(counts, 1)
+    averages = sums / safe_counts
+    deviations = np.where(valid, matrix - averages, 0.0)
+    squares = np.einsum('ij,ij->j', deviations, deviations)
+    variances = np.where(counts > 1, squares / np.maximum(counts - 1, 1), 0.0)
+    percentiles = sorted_percentiles(sorted_matrix, counts, PERCENTILES)
+
+    results = []
+    for index, name in enumerate(names):
+        count = int(counts[index])
+        if count == 0:
+            results.append(None)
+            continue
+
+        values = sorted_matrix[:count, index]
+        minimum, maximum = values[0], values[-1]
+        total = sums[index]
+        if integers and integers[index] is not None:
+            # Exact integer results, as the row loader gave
+            exact = integers[index]
+            minimum, maximum, total = int(exact.min()), int(exact.max()), int(exact.sum())
+        else:
+            minimum, maximum, total = float(minimum), float(maximum), float(total)
+        counts_histogram, edges = sorted_histogram(values, values[0], values[-1])
+
+        results.append({
+            'column': name,
+            'total_values': count,
+            'null_values': len(matrix) - count,
+            'minimum': minimum,
+            'maximum': maximum,
+            'sum': total,
+            'average': float(averages[index]),
+            'median': float(percentiles[PERCENTILES.index(50), index]),
+            'variance': float(variances[index]),
+            'standard_deviation': float(np.sqrt(variances[index])),
+            'percentiles': {p: float(percentiles[row, index]) for row, p in enumerate(PERCENTILES)},
+            'histogram': {'counts': counts_histogram, 'edges': edges},
+        })
+    return results
+
+
+def column_statistics(table, column):
+    """
+    Statistics of one column of a Table.
+
+    Args:
+        table (Table): The data.
+        column (str): Column name.
+
+    Returns:
+        dict: Statistics, or None if the column has no numeric values.
+    """
+
+    values = numeric_values(table[column])
+    if values is None:
+        return None
+    return describe([values], [column], [integer_values(table[column])])[0]
+
+
+def profile(table, columns=None):
+    """
+    Statistics of every numeric column of a Table (or of the given columns).
+
+    Args:
+        table (Table): The data.
+        columns (list, optional): Column names. Defaults to every numeric column.
+
+    Returns:
+        list: Statistics dictionaries, in column order.
+    """
+
+    names = columns or [name for name in table.headers if table[name].is_numeric()]
+    statistics = []
+    for start in range(0, len(names), PROFILE_BLOCK):
+        # Only the float copies of one block of columns exist at a time
+        arrays, block = [], []
+        for name in names[start:start + PROFILE_BLOCK]:
+            values = numeric_values(table[name])
+            if values is not None:
+                arrays.append(values)
+                block.append(name)
+        if not block:
+            continue
+        results = describe(arrays, block, [integer_values(table[name]) for name in block])
+        statistics.extend(statistic for statistic in results if statistic)
+    return statistics
@@ -0,0 +1,316 @@
+import gc
+import csv
+import math
+from array import array
+from itertools import islice, compress
+
+import numpy as np
+
+from columnar import Table, Column, FLOAT, CATEGORY
+from stats import PERCENTILES
+
+# Rows read at a time: memory depends on this, not on the size of the file
+STREAM_CHUNK_ROWS = 65536
+# Compression of the t-digest: about half this many centroids are kept per column
+DIGEST_COMPRESSION = 500
+
+
+def parse_cell(value):
+    """Parse a cell like the row loader did: int, then float, else None."""
+
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+
+def parse_chunk(values):
+    """
+    Parse the cells of one column of a chunk.
+
+    The common cases (only ints, only floats) are converted in C with
+    array(); otherwise every distinct cell is parsed once, so text columns
+    with few distinct values stay cheap.
+
+    Args:
+        values (tuple): Raw cells.
+
+    Returns:
+        tuple: (numbers, integers) where numbers is a float64 array with NaN
+               for cells that are not numbers, and integers is True if every
+               number was an int.
+    """
+
+    try:
+        return np.frombuffer(array("q", map(int, values)), dtype=np.int64).astype(np.float64), True
+    except (ValueError, OverflowError):
+        pass
+    try:
+        return np.frombuffer(array("d", map(float, values)), dtype=np.float64), False
+    except ValueError:
+        pass
+
+    lookup = {value: parse_cell(value) for value in set(values)}
+    numbers = np.array([math.nan if lookup[value] is None else lookup[value] for value in values], dtype=np.float64)
+    integers = all(type(number) is int for number in lookup.values() if number is not None)
+    return numbers, integers
+
+
+class TDigest:
+    """
+    Mergeable t-digest for quantiles in constant memory.
+
+    Every update sorts the new values together with the current centroids and
+    merges neighbours whose position falls in the same unit of the arcsine
+    scale function, all with NumPy (no per-value Python loop). Centroids near
+    the tails stay small, so extreme percentiles remain accurate.
+
+    Args:
+        compression (int): About twice the number of centroids kept.
+    """
+
+    def __init__(self, compression=DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    def update(self, values, weights=None):
+        if weights is None:
+            weights = np.ones(len(values))
+        means = np.concatenate((self.means, values))
+        weights = np.concatenate((self.weights, weights))
+        if not len(means):
+            return
+
+        order = np.argsort(means, kind='stable')
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+
+        # Position of every item (its middle) on the arcsine scale: one unit per centroid
+        middle = (np.cumsum(weights) - weights / 2) / total
+        scale = self.compression / (2 * math.pi) * np.arcsin(2 * middle - 1)
+        groups = np.floor(scale - scale[0]).astype(np.int64)
+        groups = np.unique(groups, return_inverse=True)[1]
+
+        self.weights = np.bincount(groups, weights)
+        self.means = np.bincount(groups, weights * means) / self.weights
+
+    def merge(self, other):
+        self.update(other.means, other.weights)
+
+    def quantile(self, q, minimum, maximum):
+        """
+        Estimate a quantile (0-1) by interpolating between centroid centres,
+        with the exact minimum and maximum at the ends.
+        """
+
+        total = self.weights.sum()
+        if total == 0:
+            return math.nan
+        centres = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0.0], centres, [total]))
+        values = np.concatenate(([minimum], self.means, [maximum]))
+        return float(np.interp(q * total, positions, values))
+
+
+class RunningStatistics:
+    """
+    Online statistics of one column, updated chunk by chunk in constant
+    memory and mergeable with the statistics of another part of the file.
+
+    Mean and variance use Welford's method, with each chunk summarised by
+    NumPy and combined with Chan's parallel formula. Median and percentiles
+    come from a t-digest.
+
+    Args:
+        column (str): Column name.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.integer_total = 0
+        self.integers = True
+        self.digest = TDigest()
+
+    def update(self, numbers, integers):
+        """
+        Add a chunk of values.
+
+        Args:
+            numbers (numpy.ndarray): float64 values, NaN for empty cells.
+            integers (bool): True if every value of the chunk was an int.
+        """
+
+        present = numbers[~np.isnan(numbers)]
+        self.nulls += len(numbers) - len(present)
+        if not len(present):
+            return
+
+        count = len(present)
+        mean = float(present.mean())
+        m2 = float(np.dot(present - mean, present - mean))
+        self.combine(count, mean, m2)
+
+        self.minimum = min(self.minimum, float(present.min()))
+        self.maximum = max(self.maximum, float(present.max()))
+        self.total += float(present.sum())
+        self.integers = self.integers and integers
+        if self.integers:
+            self.integer_total += int(present.astype(np.int64).sum())
+        self.digest.update(present)
+
+    def combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def merge(self, other):
+        """Add the statistics of another part of the same column."""
+
+        self.nulls += other.nulls
+        if not other.count:
+            return
+        self.combine(other.count, other.mean, other.m2)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.total += other.total
+        self.integers = self.integers and other.integers
+        self.integer_total += other.integer_total
+        self.digest.merge(other.digest)
+
+    def result(self):
+        """
+        Return the statistics with the keys used by display_statistic, or None
+        if the column had no numeric values.
+        """
+
+        if not self.count:
+            return None
+
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        if self.integers:
+            minimum, maximum, total = int(self.minimum), int(self.maximum), self.integer_total
+        else:
+            minimum, maximum, total = self.minimum, self.maximum, self.total
+        percentiles = {p: self.digest.quantile(p / 100, self.minimum, self.maximum) for p in PERCENTILES}
+
+        return {
+            'column': self.column,
+            'total_values': self.count,
+            'null_values': self.nulls,
+            'minimum': minimum,
+            'maximum': maximum,
+            'sum': total,
+            'average': self.mean,
+            'median': percentiles[50],
+            'variance': variance,
+            'standard_deviation': math.sqrt(variance),
+            'percentiles': percentiles,
+        }
+
+
+def chunk_table(names, cells):
+    """
+    Type the cells of some columns of a chunk, so a filter can be evaluated
+    on it: numeric columns become float arrays and columns with text become
+    categories of the chunk.
+
+    Args:
+        names (dict): Column name -> index in cells.
+        cells (list): Raw cells of the chunk, one tuple per column.
+
+    Returns:
+        Table: The typed columns of the chunk.
+    """
+
+    columns = {}
+    for name, index in names.items():
+        values = cells[index]
+        numbers, _ = parse_chunk(values)
+        nan = np.isnan(numbers)
+        if nan.any() and any(value != "" for value in compress(values, nan.tolist())):
+            mapping = {}
+            codes = np.array([mapping.setdefault(value, len(mapping)) for value in values], dtype=np.int32)
+            columns[name] = Column(name, CATEGORY, codes, list(mapping))
+        else:
+            columns[name] = Column(name, FLOAT, numbers)
+    return Table(list(names), columns, len(cells[0]) if cells else 0)
+
+
+def stream_statistics(file_path, columns=None, chunk_rows=STREAM_CHUNK_ROWS, where=None):
+    """
+    Compute the statistics of a CSV file in one pass, without loading it.
+
+    Only one chunk of rows is in memory at a time, so the memory used does
+    not grow with the size of the file. Median and percentiles are t-digest
+    estimates; every other value is exact.
+
+    With a filter, the columns it reads are typed first and only the rows
+    that match are parsed and added to the statistics.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        columns (list, optional): Columns to analyze. Defaults to all of them.
+        chunk_rows (int): Rows read at a time.
+        where (Expression, optional): Filter of the rows (see query.py).
+
+    Returns:
+        tuple: (rows, statistics) where statistics is a list of dictionaries
+               for the columns that have numeric values.
+    """
+
+    rows = 0
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with open(file_path, 'r', newline='', encoding='utf-8') as file_csv:
+            reader = csv.reader(file_csv)
+            headers = next(reader)
+            width = len(headers)
+            selected = [(index, name) for index, name in enumerate(headers) if not columns or name in columns]
+            accumulators = {name: RunningStatistics(name) for _, name in selected}
+            filtered = {}
+            if where is not None:
+                for name in where.columns():
+                    if name not in headers:
+                        raise ValueError(f"Unknown column '{name}'")
+                    filtered[name] = headers.index(name)
+
+            while True:
+                raw = list(islice(reader, chunk_rows))
+                if not raw:
+                    break
+                # Rows whose length does not match the header are skipped, as in load_data_csv
+                chunk = [row for row in raw if len(row) == width]
+                del raw
+                if chunk and filtered:
+                    # Only the filter columns are typed; the other cells of rows that do not match are never parsed
+                    predicate = chunk_table({name: position for position, name in enumerate(filtered)},
+                                            [tuple(row[index] for row in chunk) for index in filtered.values()])
+                    chunk = list(compress(chunk, where.mask(predicate).tolist()))
+                if not chunk:
+                    continue
+                rows += len(chunk)
+                cells = list(zip(*chunk))
+                del chunk
+                for index, name in selected:
+                    accumulators[name].update(*parse_chunk(cells[index]))
+    finally:
+        if collecting:
+            gc.enable()
+
+    statistics = [accumulator.result() for accumulator in accumulators.values()]
+    return rows, [statistic for statistic in statistics if statistic]
@@ -1,6 +1,22 @@
 import os
+import time
+import shutil
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 
+from manifest import Manifest, MANIFEST_FILE, conversion_target, content_hash
+from transforms import parse_variants, pillow_format, prepare_for_format, render_variants
+
+#Processes used to convert a folder (Pillow decodes and encodes in C, but each image keeps one core busy)
+WORKERS = os.cpu_count() or 1
+#Chunks of images waiting in the pool for every worker: enough to keep the workers busy, without
+#submitting thousands of tasks at once
+PENDING_PER_WORKER = 2
+#Slowest images listed in the summary
+SLOWEST_SHOWN = 5
+
+FORMATS = ["jpg" , "jpeg", "png", "gif", "bmp", "tiff", "webp"]
+
 def display_compatible_formats():
     formats = ["JPG" , "JPEG", "PNG", "GIF", "BMP", "TIFF", "WEBP"]
     print ("Available formats:")
@@ -8,36 +24,62 @@ def display_compatible_formats():
         print (f"- {format}")
     return formats
 
-def convert_image(image_path, output_format, destination_folder=None):
-    try:
-        if not os.path.exists(image_path):
-            print(f"Error: Image '{image_path}' does not exist.")
-            return None
+#Path of the converted file: the name of the image with the extension of the format, in destination_folder
+#(or next to the image)
+def destination_for(image_path, output_format, destination_folder=None):
+    # Obtener información del archivo original
+    file_name = os.path.basename(image_path)
+    base_name = os.path.splitext(file_name)[0]
+
+    # Carpeta de destino
+    if destination_folder is None:
+        destination_folder = os.path.dirname(image_path)
 
-        image = Image.open(image_path)
+    # Ruta final del archivo
+    return os.path.join(destination_folder, f"{base_name}.{output_format.strip().lower()}")
 
-        # Obtener información del archivo original
-        file_name = os.path.basename(image_path)
-        base_name = os.path.splitext(file_name)[0]
+#Paths of the converted files: one per variant (the name of the image with the name of the variant, e.g.
+#photo_400x400.jpg), or the single path of destination_for without variants
+def destinations_for(image_path, output_format, destination_folder=None, variants=None):
+    destination_path = destination_for(image_path, output_format, destination_folder)
+    if not variants:
+        return [destination_path]
+    base_name, extension = os.path.splitext(destination_path)
+    return [f"{base_name}_{variant['name']}{extension}" for variant in variants]
 
-        # Carpeta de destino
-        if destination_folder is None:
-            destination_folder = os.path.dirname(image_path)
+#Convert one image and return the paths of the new files. options are passed to Pillow's save (e.g. {"quality": 85}).
+#variants (see transforms.py) save several resized versions of the image from a single decode.
+#Errors are raised to the caller
+def save_converted(image_path, output_format, destination_folder=None, options=None, variants=None):
+    destination_paths = destinations_for(image_path, output_format, destination_folder, variants)
 
-        if not os.path.exists(destination_folder):
-            os.makedirs(destination_folder)
+    # exist_ok: several workers can create the same folder at the same time
+    os.makedirs(os.path.dirname(destination_paths[0]) or ".", exist_ok=True)
 
-        # Limpiar y normalizar el formato de salida
-        output_format = output_format.strip().upper()
+    if variants:
+        return render_variants(image_path, output_format, variants, destination_paths, options)
 
-        # Ruta final del archivo
-        destination_path = os.path.join(destination_folder, f"{base_name}.{output_format.lower()}")
+    with Image.open(image_path) as image:
+        # Limpiar y normalizar el formato de salida (JPG -> JPEG)
+        output_format = pillow_format(output_format)
 
         # Guardar la imagen en el nuevo formato
-        image.save(destination_path, format=output_format)
-        print(f"✅ Image converted and saved in: {destination_path}")
+        prepare_for_format(image, output_format).save(destination_paths[0], format=output_format, **(options or {}))
+
+    return destination_paths
+
+#Convert one image and return the path of the new file (the list of paths with variants)
+def convert_image(image_path, output_format, destination_folder=None, variants=None):
+    try:
+        if not os.path.exists(image_path):
+            print(f"Error: Image '{image_path}' does not exist.")
+            return None
 
-        return destination_path
+        destination_paths = save_converted(image_path, output_format, destination_folder, variants=variants)
+        for destination_path in destination_paths:
+            print(f"✅ Image converted and saved in: {destination_path}")
+
+        return destination_paths if variants else destination_paths[0]
 
     except Exception as e:
         print(f"Error when converting the image: {e}")
@@ -45,27 +87,221 @@ def convert_image(image_path, output_format, destination_folder=None):
 
 
 
-def convert_multiple_images(image_path, output_format, destination_folder=None):
+#List the images of a folder (files with one of the compatible extensions), sorted by name
+def list_images(image_path):
+    images = []
+    for file in sorted(os.listdir(image_path)):
+        file_path = os.path.join(image_path, file)
+
+        if os.path.isfile(file_path) and any(file.lower().endswith(ext) for ext in FORMATS):
+            images.append(file_path)
+    return images
+
+#Convert a chunk of images in a worker process. For every image returns (image_path, destination_paths, seconds, error),
+#with destination_paths None and the error message if it failed
+def convert_chunk(image_paths, output_format, destination_folder=None, options=None, variants=None):
+    results = []
+    for image_path in image_paths:
+        start = time.perf_counter()
+        try:
+            destination_paths = save_converted(image_path, output_format, destination_folder, options, variants)
+            results.append((image_path, destination_paths, time.perf_counter() - start, None))
+        except Exception as e:
+            results.append((image_path, None, time.perf_counter() - start, str(e)))
+    return results
+
+#Print the result of one image as soon as it is known
+def print_result(result):
+    image_path, destination_paths, seconds, error = result
+    if error:
+        print (f"Error when converting the image {image_path}: {error}")
+    else:
+        print (f"✅ Image converted and saved in: {', '.join(destination_paths)} ({seconds:.2f} s)")
+
+#Print the totals of a batch: converted, copied, skipped and failed images, time, images per second and the
+#slowest images
+def print_summary(results, elapsed, workers, skipped=0, copied=0):
+    converted = [result for result in results if not result[3]]
+    total = len(results) + skipped + copied
+    print ("\n=== SUMMARY ===")
+    print (f"Converted: {len(converted)}  Failed: {len(results) - len(converted)}  Workers: {workers}")
+    print (f"Up to date (skipped): {skipped}  Same content (copied): {copied}")
+    print (f"Total time: {elapsed:.2f} s  ({total / elapsed if elapsed > 0 else 0:.1f} images/s)")
+    if converted:
+        seconds = [result[2] for result in converted]
+        print (f"Per image: average {sum(seconds) / len(seconds):.3f} s, slowest {max(seconds):.3f} s")
+        print ("Slowest images:")
+        for image_path, _, image_seconds, _ in sorted(converted, key=lambda result: result[2], reverse=True)[:SLOWEST_SHOWN]:
+            print (f"  {image_seconds:.3f} s  {image_path}")
+
+#Decide what to do with every image using the manifest. Returns (to_encode, skipped, reused, followers, sources):
+#  skipped: [(image, outputs)] whose outputs of a previous run are still valid
+#  reused: [(image, outputs)] whose content was already converted to this target (the outputs are copied)
+#  followers: {image: [images with the same content]} that get a copy of the outputs of image once it is encoded
+#  sources: {image: (stat, sha256)} to record the new conversions
+def plan_conversions(images, output_format, destination_folder, options, manifest, variants=None):
+    target = conversion_target(output_format, options, variants)
+    to_encode, skipped, reused = [], [], []
+    followers, sources, leaders = {}, {}, {}
+
+    for image in images:
+        try:
+            stat = os.stat(image)
+            output = manifest.valid_output(image, stat, target)
+            if output:
+                skipped.append((image, output))
+                continue
+            content = content_hash(image)
+        except OSError as e:
+            #Let the conversion report the error
+            print (f"Error reading '{image}': {e}")
+            to_encode.append(image)
+            continue
+
+        sources[image] = (stat, content)
+        output = manifest.output_for_content(content, target)
+        if output:
+            reused.append((image, output))
+        elif content in leaders:
+            followers[leaders[content]].append(image)
+        else:
+            leaders[content] = image
+            followers[image] = []
+            to_encode.append(image)
+
+    return to_encode, skipped, reused, followers, sources
+
+#Copy the outputs already encoded from the same content to the destinations of image_path (one per variant).
+#Returns the destinations
+def copy_output(outputs, image_path, output_format, destination_folder=None, variants=None):
+    destination_paths = destinations_for(image_path, output_format, destination_folder, variants)
+    for output, destination_path in zip(outputs, destination_paths):
+        if os.path.abspath(destination_path) != os.path.abspath(output):
+            os.makedirs(os.path.dirname(destination_path) or ".", exist_ok=True)
+            shutil.copyfile(output, destination_path)
+    return destination_paths
+
+#Convert every image of a folder. The images are split in chunks that a pool of workers processes converts in parallel;
+#only a few chunks per worker are submitted at a time and the results are printed as every chunk finishes.
+#With use_manifest, a manifest in the destination folder remembers every conversion: images whose output is still up
+#to date are skipped and images with the same content are encoded only once.
+#variants (see transforms.py) save several resized versions of every image, each decoded only once.
+#Returns the number of images whose output is up to date
+def convert_multiple_images(image_path, output_format, destination_folder=None, workers=WORKERS, chunk_size=None,
+                            options=None, use_manifest=True, variants=None):
     if not os.path.exists(image_path):
         print (f"Error: The folder {image_path} do not exist")
         return 0
 
-    formats = ["jpg" , "jpeg", "png", "gif", "bmp", "tiff", "webp"]
+    #Images already in the output format and folder would be overwritten by themselves
+    images = [image for image in list_images(image_path)
+              if os.path.abspath(image) not in (os.path.abspath(path) for path in
+                                                destinations_for(image, output_format, destination_folder, variants))]
+    if not images:
+        print (f"No images to convert in {image_path}")
+        return 0
 
-    #Cont for files converted
-    cont = 0
+    start = time.perf_counter()
+    manifest = Manifest(os.path.join(destination_folder or image_path, MANIFEST_FILE)) if use_manifest else None
+    target = conversion_target(output_format, options, variants)
+    skipped, copied = [], []
+    followers, sources = {}, {}
 
-    #Iterate through the files in the folder
-    for file in os.listdir(image_path):
-        file_path = os.path.join(image_path, file)
+    if manifest:
+        images, skipped, reused, followers, sources = plan_conversions(images, output_format, destination_folder,
+                                                                       options, manifest, variants)
+        for image, outputs in reused:
+            try:
+                destination_paths = copy_output(outputs, image, output_format, destination_folder, variants)
+                manifest.record(image, sources[image][0], target, sources[image][1], destination_paths)
+                copied.append(image)
+                print (f"✅ Same content already converted, copied to: {', '.join(destination_paths)}")
+            except OSError as e:
+                print (f"Error copying '{outputs[0]}': {e}")
+                images.append(image)
+                followers[image] = []
+
+    results = []
+
+    #Record a converted image and give a copy of its output to the images with the same content (or report them as
+    #failed if it could not be converted)
+    def finish(result):
+        print_result(result)
+        results.append(result)
+        image, destination_paths, _, error = result
+        if error:
+            #The images with the same content fail the same way: report them instead of dropping them
+            for follower in followers.get(image, []):
+                follower_result = (follower, None, 0.0, f"same content as {os.path.basename(image)}: {error}")
+                print_result(follower_result)
+                results.append(follower_result)
+            return
+        if not manifest or image not in sources:
+            return
+        manifest.record(image, sources[image][0], target, sources[image][1], destination_paths)
+        for follower in followers.get(image, []):
+            try:
+                follower_paths = copy_output(destination_paths, follower, output_format, destination_folder, variants)
+                manifest.record(follower, sources[follower][0], target, sources[follower][1], follower_paths)
+                copied.append(follower)
+                print (f"✅ Same content as {os.path.basename(image)}, copied to: {', '.join(follower_paths)}")
+            except OSError as e:
+                print (f"Error copying '{destination_paths[0]}': {e}")
+                results.append((follower, None, 0.0, f"copying '{destination_paths[0]}': {e}"))
+
+    workers = max(1, min(workers or WORKERS, len(images) or 1))
+    #Small chunks balance the load between workers, large ones send fewer messages between processes
+    chunk_size = chunk_size or max(1, min(16, len(images) // (workers * 4)))
+    chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]
 
-        if os.path.isfile(file_path) and any(file.lower().endswith(ext) for ext in formats):
-            #Converting image
-            if convert_image(file_path, output_format, destination_folder):
-                cont = cont + 1
-            
+    try:
+        if workers == 1:
+            #One worker: convert in this process, without starting a pool
+            for chunk in chunks:
+                for result in convert_chunk(chunk, output_format, destination_folder, options, variants):
+                    finish(result)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = set()
+                next_chunk = 0
+                while next_chunk < len(chunks) or pending:
+                    #Keep a few chunks per worker in the pool
+                    while next_chunk < len(chunks) and len(pending) < workers * PENDING_PER_WORKER:
+                        pending.add(executor.submit(convert_chunk, chunks[next_chunk], output_format,
+                                                    destination_folder, options, variants))
+                        next_chunk = next_chunk + 1
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for result in future.result():
+                            finish(result)
+    finally:
+        #Saved even after an interruption, so the images already converted are not converted again
+        if manifest:
+            try:
+                manifest.save()
+            except OSError as e:
+                print (f"Error writing the manifest '{manifest.path}': {e}")
+
+    print_summary(results, time.perf_counter() - start, workers, len(skipped), len(copied))
+
+    #Cont for files converted
+    cont = len(skipped) + len(copied)
+    for result in results:
+        if not result[3]:
+            cont = cont + 1
     return cont
 
+#Ask for the variants to generate (see transforms.py). Returns None to keep the original size, or False if the text is
+#not valid
+def ask_variants():
+    text = input ("Insert the sizes to generate, separated by ';' (ej: large: thumbnail=1600x1600 + strip; small: thumbnail=400x400), leave it empty to keep the original size: ")
+    try:
+        return parse_variants(text) or None
+    except ValueError as e:
+        print (f"Error: {e}")
+        return False
+
 def main():
     print ("===IMAGES CONVERTER ===")
 
@@ -85,7 +321,11 @@ def main():
         if not destination_folder:
             destination_folder = None
 
-        convert_image(image_path, output_format, destination_folder)
+        variants = ask_variants()
+        if variants is False:
+            return
+
+        convert_image(image_path, output_format, destination_folder, variants)
     
     elif option == "2":
         image_path = input ("Insert the path of the image you want to convert: ")
@@ -95,7 +335,15 @@ def main():
         if not destination_folder:
             destination_folder = None
 
-        num_images_convert = convert_multiple_images(image_path, output_format, destination_folder)
+        workers = input (f"Insert the number of parallel workers (leave it empty to use all the {WORKERS} cores): ")
+        workers = int(workers) if workers.strip().isdigit() else WORKERS
+
+        variants = ask_variants()
+        if variants is False:
+            return
+
+        num_images_convert = convert_multiple_images(image_path, output_format, destination_folder, workers,
+                                                     variants=variants)
         print (f"\n It converted {num_images_convert} images successfully!")
 
     else:
@@ -0,0 +1,107 @@
+#Conversion manifest of a folder. For every converted image it remembers the source (size and mtime), the target
+#(format, encode options and variants), the SHA-256 of the source and the outputs it produced, with their size and mtime.
+#Converting the folder again only encodes the images that changed or whose output was removed or modified, and a
+#source whose content was already converted to the same target gets a copy of that output instead of a new encode.
+
+import os
+import json
+import hashlib
+
+MANIFEST_FILE = ".converter_manifest.json"
+READ_BLOCK = 1024 * 1024
+
+#Target of a conversion: the output format, the encode options and the variants (see transforms.py), as one
+#comparable string
+def conversion_target(output_format, options=None, variants=None):
+    target = [output_format.strip().upper(), options or {}]
+    if variants:
+        target.append(variants)
+    return json.dumps(target, sort_keys=True)
+
+#SHA-256 of the whole file
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+#True if a file still has the size and mtime that were recorded for it
+def unchanged(path, size, mtime_ns):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+#Paths of the outputs of an entry if all of them are still as they were written, or None
+def valid_outputs(entry):
+    outputs = entry.get("outputs")
+    if not outputs or not all(unchanged(path, size, mtime_ns) for path, size, mtime_ns in outputs):
+        return None
+    return [path for path, _, _ in outputs]
+
+class Manifest:
+    def __init__(self, manifest_path=MANIFEST_FILE):
+        self.path = manifest_path
+        self.entries = {}
+        self.changed = False
+        if manifest_path and os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                print (f"Error: the manifest '{manifest_path}' could not be read, starting a new one")
+
+        #(source hash, target) -> key of an entry, to find an output of the same content
+        self.by_hash = {}
+        for key, entry in self.entries.items():
+            self.by_hash[(entry["sha256"], entry["target"])] = key
+
+    @staticmethod
+    def key(image_path, target):
+        return f"{os.path.abspath(image_path)}|{target}"
+
+    #Paths of the outputs of a previous conversion of this source to this target if they are still valid: the source
+    #has the same size and mtime, and the outputs exist and were not modified since. None if the image must be converted
+    def valid_output(self, image_path, stat, target):
+        entry = self.entries.get(self.key(image_path, target))
+        if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return None
+        return valid_outputs(entry)
+
+    #Valid outputs of any source with this content converted to this target, or None
+    def output_for_content(self, content, target):
+        entry = self.entries.get(self.by_hash.get((content, target)))
+        return valid_outputs(entry) if entry else None
+
+    #Record a conversion and its output paths. stat is the stat of the source taken before it was converted, so a
+    #source modified during the conversion is converted again next time
+    def record(self, image_path, stat, target, content, output_paths):
+        outputs = []
+        for output_path in output_paths:
+            output_stat = os.stat(output_path)
+            outputs.append([os.path.abspath(output_path), output_stat.st_size, output_stat.st_mtime_ns])
+        key = self.key(image_path, target)
+        self.entries[key] = {
+            "target": target,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": content,
+            "outputs": outputs,
+        }
+        self.by_hash[(content, target)] = key
+        self.changed = True
+
+    #Written to a temporary file and renamed, so a crash never leaves a half-written manifest
+    def save(self):
+        if not self.path or not self.changed:
+            return
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file)
+        os.replace(temporary, self.path)
+        self.changed = False
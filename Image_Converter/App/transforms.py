@@ -0,0 +1,191 @@
+#Transform pipeline: several variants of an image (e.g. web sizes) from a single decode. Every variant is a chain of
+#steps (resize, thumbnail, crop, strip). Before decoding, the smallest resolution that still gives every variant its
+#full quality is computed, and the image is decoded at that scale: JPEGs with draft() (the decoder itself skips the
+#detail, 1/2, 1/4 or 1/8 of the size), other formats with reduce() (a fast box filter) right after loading.
+
+import math
+from PIL import Image, ImageOps
+
+STEPS = ("resize", "thumbnail", "crop", "strip")
+#The image is decoded/reduced to at least this many times the size of the largest variant; the last step from there
+#uses a high quality filter (the same trade-off as Pillow's thumbnail)
+REDUCING_GAP = 2.0
+#Names of the formats for Pillow
+FORMAT_ALIASES = {"JPG": "JPEG", "TIF": "TIFF"}
+#Modes JPEG can store; other images are converted to RGB (transparency over a white background)
+JPEG_MODES = ("1", "L", "RGB", "CMYK")
+ORIENTATION = 0x0112
+#Metadata removed by the strip step (some formats, like PNG, save what is left in image.info)
+METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "comment")
+
+#Name of a format for Pillow (JPG -> JPEG)
+def pillow_format(output_format):
+    output_format = output_format.strip().upper()
+    return FORMAT_ALIASES.get(output_format, output_format)
+
+#Parse a text description of variants. Variants are separated by ";", the steps of a variant by "+", and a variant can
+#start with "name:" (the suffix of its files). Example:
+#   "large: thumbnail=1600x1600 + strip; square: crop=0,0,736,736 + resize=200x200"
+#Returns a list of {"name": str, "steps": [[step, arguments...]]}
+def parse_variants(text):
+    variants = []
+    for index, part in enumerate(piece.strip() for piece in text.split(";")):
+        if not part:
+            continue
+        name = None
+        if ":" in part:
+            name, part = (value.strip() for value in part.split(":", 1))
+
+        steps = []
+        for step in (value.strip() for value in part.split("+")):
+            operation, _, arguments = (value.strip() for value in step.partition("="))
+            operation = operation.lower()
+            if operation in ("resize", "thumbnail"):
+                try:
+                    width, height = (int(value) for value in arguments.lower().split("x"))
+                except ValueError:
+                    raise ValueError(f"'{step}' needs a size like {operation}=800x600")
+                steps.append([operation, width, height])
+            elif operation == "crop":
+                try:
+                    left, top, right, bottom = (int(value) for value in arguments.split(","))
+                except ValueError:
+                    raise ValueError(f"'{step}' needs a box like crop=left,top,right,bottom")
+                steps.append([operation, left, top, right, bottom])
+            elif operation == "strip":
+                steps.append([operation])
+            else:
+                raise ValueError(f"Unknown step '{operation}' (use one of {', '.join(STEPS)})")
+
+        variants.append({"name": name or variant_name(steps, index), "steps": steps})
+    check_variants(variants)
+    return variants
+
+#Default name of a variant: the size of its last resize/thumbnail step, or its position
+def variant_name(steps, index):
+    for step in reversed(steps):
+        if step[0] in ("resize", "thumbnail"):
+            return f"{step[1]}x{step[2]}"
+    return f"v{index + 1}"
+
+#Raise ValueError if a list of variants is not valid
+def check_variants(variants):
+    names = set()
+    for variant in variants:
+        if variant["name"] in names:
+            raise ValueError(f"Two variants are called '{variant['name']}'")
+        names.add(variant["name"])
+        for step in variant["steps"]:
+            if step[0] not in STEPS:
+                raise ValueError(f"Unknown step '{step[0]}' (use one of {', '.join(STEPS)})")
+            if step[0] in ("resize", "thumbnail") and (step[1] < 1 or step[2] < 1):
+                raise ValueError(f"Invalid size {step[1]}x{step[2]}")
+            if step[0] == "crop" and (step[3] <= step[1] or step[4] <= step[2]):
+                raise ValueError(f"Invalid crop box {tuple(step[1:])}")
+
+#Output pixels per source pixel a variant needs (1 = full resolution), simulating its steps on the size of the image
+def required_scale(size, steps):
+    width, height = size
+    scale_x = scale_y = 1.0
+    for step in steps:
+        if step[0] == "crop":
+            width = max(1, min(step[3], width) - max(step[1], 0))
+            height = max(1, min(step[4], height) - max(step[2], 0))
+        elif step[0] == "resize":
+            scale_x, scale_y = scale_x * step[1] / width, scale_y * step[2] / height
+            width, height = step[1], step[2]
+        elif step[0] == "thumbnail":
+            factor = min(1.0, step[1] / width, step[2] / height)
+            scale_x, scale_y = scale_x * factor, scale_y * factor
+            width, height = max(1, round(width * factor)), max(1, round(height * factor))
+    return min(1.0, max(scale_x, scale_y))
+
+#Open an image decoded at the smallest resolution that the variants allow, upright (EXIF orientation applied).
+#Returns (image, ratio, info) where ratio is decoded pixels per original pixel and info is the metadata of the file
+def open_reduced(image_path, variants):
+    image = Image.open(image_path)
+    info = dict(image.info)
+    exif = image.getexif()
+    width, height = image.size
+    # Orientations 5-8 swap width and height once the image is upright
+    upright = (height, width) if exif.get(ORIENTATION, 1) in (5, 6, 7, 8) else (width, height)
+    scale = max((required_scale(upright, variant["steps"]) for variant in variants), default=1.0)
+
+    if scale < 1.0:
+        wanted = (math.ceil(width * scale * REDUCING_GAP), math.ceil(height * scale * REDUCING_GAP))
+        # Only JPEG (and PCD) decoders support it: the rest ignore it
+        image.draft(image.mode if image.mode in JPEG_MODES else None, wanted)
+        image.load()
+        factor = int(min(image.size[0] / wanted[0], image.size[1] / wanted[1]))
+        if factor >= 2:
+            image = image.reduce(factor)
+    else:
+        image.load()
+
+    image = ImageOps.exif_transpose(image)
+    ratio = image.size[0] / upright[0]
+    return image, ratio, {**info, "exif": exif}
+
+#Apply the steps of a variant to the decoded image. Until the first resize/thumbnail, sizes and crop boxes are in
+#pixels of the original image (the decoded image has ratio pixels per original pixel); after it, in output pixels.
+#Returns (image, strip)
+def apply_steps(image, steps, ratio):
+    strip = False
+    for step in steps:
+        if step[0] == "crop":
+            box = tuple(round(value * ratio) for value in step[1:])
+            box = (max(box[0], 0), max(box[1], 0), min(box[2], image.size[0]), min(box[3], image.size[1]))
+            image = image.crop(box)
+        elif step[0] == "resize":
+            image = image.resize((step[1], step[2]), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+            ratio = 1.0
+        elif step[0] == "thumbnail":
+            # The size a full decode would give, whatever the scale it was decoded at
+            width, height = image.size[0] / ratio, image.size[1] / ratio
+            factor = min(1.0, step[1] / width, step[2] / height)
+            size = (max(1, round(width * factor)), max(1, round(height * factor)))
+            if size != image.size:
+                image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+            ratio = 1.0
+        elif step[0] == "strip":
+            strip = True
+    return image, strip
+
+#Convert an image to a mode the format can store
+def prepare_for_format(image, output_format):
+    if output_format == "JPEG" and image.mode not in JPEG_MODES:
+        if "A" in image.getbands() or "transparency" in image.info:
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            return background
+        return image.convert("RGB")
+    return image
+
+#Save every variant of an image to its destination path from a single decode. Metadata (EXIF without the orientation,
+#which is already applied, and the ICC profile) is kept unless the variant has a strip step. options are passed to
+#Pillow's save. Returns the destination paths
+def render_variants(image_path, output_format, variants, destination_paths, options=None):
+    output_format = pillow_format(output_format)
+    image, ratio, info = open_reduced(image_path, variants)
+    try:
+        for variant, destination_path in zip(variants, destination_paths):
+            result, strip = apply_steps(image, variant["steps"], ratio)
+            result = prepare_for_format(result, output_format)
+
+            metadata = {}
+            if not strip:
+                exif = info["exif"]
+                if ORIENTATION in exif:
+                    del exif[ORIENTATION]
+                if len(exif):
+                    metadata["exif"] = exif.tobytes()
+                if info.get("icc_profile"):
+                    metadata["icc_profile"] = info["icc_profile"]
+            else:
+                result.info = {key: value for key, value in result.info.items() if key not in METADATA_KEYS}
+
+            result.save(destination_path, format=output_format, **metadata, **(options or {}))
+    finally:
+        image.close()
+    return destination_paths